@@ -0,0 +1,191 @@
+"""Fleet utilization and revenue analytics, computed with NumPy.
+
+The reservations overlapping a date range are streamed in ``fetchmany``
+batches and turned, batch by batch, into four NumPy columns: the car's
+position in the fleet, its first and last day inside the range and the
+revenue earned inside it.  Every figure is then a whole-array operation
+(``bincount``, ``cumsum``, ``reduceat``) rather than a loop over rows:
+
+* ``utilization``       - booked car-days / available car-days and revenue
+                          per available car-day, per car, model, office or
+                          for the whole fleet;
+* ``occupancy_heatmap`` - share of each group's cars out on every day (or
+                          every ``bucket_days`` days).
+
+Days are half-open: a rental from the 1st to the 4th occupies the 1st, 2nd
+and 3rd.  The revenue of a rental crossing the range edges is counted pro
+rata to its days inside the range, archived ones included.  The app
+schema has no offices, so all its cars are in the office "All".
+
+    python analytics.py --from 2024-01-01 --to 2025-01-01 --by model
+"""
+import argparse
+from datetime import date, timedelta
+
+import numpy as np
+
+import db
+from migrations import migrate
+from exporter import stream_rows
+
+ANALYTICS_BATCH = 50000  # reservations per fetchmany
+GROUPINGS = ("fleet", "office", "model", "car")
+
+FLEET_QUERIES = {
+    "app": ("SELECT id, name, 'All' FROM cars ORDER BY id",
+            "SELECT car_id, pick_up, return_time, payment FROM all_reservations "
+            "WHERE pick_up < %s AND return_time > %s AND return_time > pick_up"),  # not cancelled
+    "rental": ("SELECT c.CarID, c.Model, o.OfficeName FROM Car c "
+               "JOIN Office o ON o.OfficeID = c.OfficeID ORDER BY c.CarID",
+               "SELECT CarID, StartDate, EndDate, TotalCost FROM AllReservations "
+               "WHERE Status <> 'cancelled' AND StartDate < %s AND EndDate > %s"),
+}
+
+
+class FleetData:
+    """Columnar snapshot of the fleet and its reservations over ``[start, end)``.
+
+    ``car_ids``/``models``/``offices`` describe the cars (sorted by id);
+    ``car``, ``first``, ``last`` and ``revenue`` hold one entry per
+    reservation: the car's position in ``car_ids``, its days inside the
+    range as offsets from ``start`` and the revenue earned in them.
+    """
+
+    def __init__(self, start, end, car_ids, models, offices, car, first, last, revenue):
+        self.start = start
+        self.end = end
+        self.days = (end - start).days
+        self.car_ids = car_ids
+        self.models = models
+        self.offices = offices
+        self.car = car
+        self.first = first
+        self.last = last
+        self.revenue = revenue
+
+    def __len__(self):
+        return len(self.car)
+
+
+def _columns(rows, car_ids, origin, days):
+    """Turn one batch of ``(car id, pick-up, return, revenue)`` rows into clipped columns."""
+    car, pick_up, return_time, revenue = zip(*rows)
+    car = np.array(car, dtype=np.int64)
+    # datetime64[D] parses ISO text, dates and datetimes alike, dropping the time of day
+    first = (np.array(pick_up, dtype="datetime64[D]") - origin).astype(np.int64)
+    last = (np.array(return_time, dtype="datetime64[D]") - origin).astype(np.int64)
+    revenue = np.array(revenue, dtype=np.float64)
+
+    position = np.searchsorted(car_ids, car)
+    known = position < len(car_ids)
+    known[known] = car_ids[position[known]] == car[known]  # reservations of deleted cars are ignored
+    inside_first, inside_last = np.clip(first, 0, days), np.clip(last, 0, days)
+    keep = known & (inside_last > inside_first)
+    share = revenue * (inside_last - inside_first) / np.maximum(last - first, 1)
+    return (position[keep].astype(np.int32), inside_first[keep].astype(np.int32),
+            inside_last[keep].astype(np.int32), share[keep])
+
+
+def load_fleet(start, end, schema="app", batch_size=ANALYTICS_BATCH):
+    """Load the cars and the reservations overlapping ``[start, end)`` into a ``FleetData``."""
+    if end <= start:
+        raise ValueError("The end of the range must be after its start")
+    cars_query, reservations_query = FLEET_QUERIES[schema]
+    cars = db.fetch_all(cars_query)
+    car_ids = np.array([row[0] for row in cars], dtype=np.int64)
+    models = np.array([str(row[1]) for row in cars])
+    offices = np.array([str(row[2]) for row in cars])
+    origin, days = np.datetime64(start, "D"), (end - start).days
+
+    parts = []
+    if len(car_ids):
+        batches = stream_rows(reservations_query, (end.isoformat(), start.isoformat()), batch_size)
+        next(batches)  # column names
+        parts = [_columns(rows, car_ids, origin, days) for rows in batches]
+    if parts:
+        car, first, last, revenue = (np.concatenate(column) for column in zip(*parts))
+    else:
+        car = first = last = np.zeros(0, dtype=np.int32)
+        revenue = np.zeros(0)
+    return FleetData(start, end, car_ids, models, offices, car, first, last, revenue)
+
+
+def _groups(data, by):
+    """Return the group labels and the group index of every car."""
+    if by == "fleet":
+        return np.array(["Fleet"]), np.zeros(len(data.car_ids), dtype=np.int64)
+    if by == "car":
+        return data.car_ids, np.arange(len(data.car_ids))
+    if by in ("model", "office"):
+        return np.unique(data.models if by == "model" else data.offices, return_inverse=True)
+    raise ValueError(f"Unknown grouping {by!r} (expected one of: {', '.join(GROUPINGS)})")
+
+
+def utilization(data, by="car"):
+    """Utilization and revenue per group, busiest first.
+
+    Returns ``(label, cars, booked car-days, utilization, revenue, revenue
+    per available car-day)`` tuples; utilization is between 0 and 1.
+    """
+    labels, group = _groups(data, by)
+    count = len(labels)
+    reservation_group = group[data.car]
+    booked = np.bincount(reservation_group, weights=data.last - data.first, minlength=count)
+    revenue = np.bincount(reservation_group, weights=data.revenue, minlength=count)
+    cars = np.bincount(group, minlength=count)
+    available = cars * data.days
+    share = np.divide(booked, available, out=np.zeros(count), where=available > 0)
+    per_car_day = np.divide(revenue, available, out=np.zeros(count), where=available > 0)
+    order = np.argsort(-share, kind="stable")
+    return list(zip(labels[order].tolist(), cars[order].tolist(), booked[order].astype(np.int64).tolist(),
+                    share[order].tolist(), revenue[order].tolist(), per_car_day[order].tolist()))
+
+
+def occupancy_heatmap(data, by="office", bucket_days=1):
+    """Share of each group's cars that are out, per day or per ``bucket_days`` bucket.
+
+    Returns ``(labels, bucket start dates, matrix)``; the matrix has one row
+    per label and one column per bucket.
+    """
+    labels, group = _groups(data, by)
+    count, days = len(labels), data.days
+    # +1 on a rental's first day and -1 after its last, summed over the days
+    width = days + 1
+    reservation_group = group[data.car].astype(np.int64) * width
+    changes = (np.bincount(reservation_group + data.first, minlength=count * width)
+               - np.bincount(reservation_group + data.last, minlength=count * width))
+    out = np.cumsum(changes.reshape(count, width), axis=1)[:, :days]
+
+    starts = np.arange(0, days, bucket_days)
+    lengths = np.diff(np.append(starts, days))
+    out = np.add.reduceat(out, starts, axis=1) if days else out
+    capacity = np.bincount(group, minlength=count)[:, None] * lengths[None, :]
+    matrix = np.divide(out, capacity, out=np.zeros(out.shape), where=capacity > 0)
+    return labels.tolist(), [data.start + timedelta(days=int(offset)) for offset in starts], matrix
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Fleet utilization and revenue over a date range.")
+    parser.add_argument("--from", dest="start", type=date.fromisoformat, required=True)
+    parser.add_argument("--to", dest="end", type=date.fromisoformat, required=True, help="exclusive")
+    parser.add_argument("--by", choices=GROUPINGS, default="model")
+    parser.add_argument("--top", type=int, default=20, help="rows to print")
+    parser.add_argument("--target", choices=("sqlite", "mysql"), default="sqlite")
+    parser.add_argument("--db", default="car_rental.db", help="SQLite file (ignored for MySQL)")
+    parser.add_argument("--schema", choices=("app", "rental"),
+                        help="tables to read (default: app on SQLite, rental on MySQL)")
+    args = parser.parse_args()
+    schema = args.schema or ("app" if args.target == "sqlite" else "rental")
+
+    db.use_backend(db.make_backend(args.target, args.db), size=1, prepare=False)
+    with db.connection() as conn:
+        migrate(conn, schema)  # the views over hot and archived reservations
+    data = load_fleet(args.start, args.end, schema)
+    print(f"{len(data):,} reservations, {len(data.car_ids):,} cars, {data.days} days")
+    print(f"{args.by:<24}{'cars':>8}{'booked days':>14}{'utilization':>13}{'revenue':>14}{'per car-day':>13}")
+    for label, cars, booked, share, revenue, per_car_day in utilization(data, args.by)[:args.top]:
+        print(f"{str(label):<24}{cars:>8,}{booked:>14,}{share:>12.1%}{revenue:>14,.2f}{per_car_day:>13,.2f}")
+
+
+if __name__ == "__main__":
+    main()
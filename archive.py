@@ -0,0 +1,184 @@
+"""Archival of finished reservations into cold tables.
+
+Finished reservations stay in the hot tables forever otherwise, and every
+booking check, status lookup and index load walks past them.  This job
+moves the ones that ended more than ``--days`` days ago to archive tables
+of the same shape (created by migration: ``reservations_archive``,
+``payments_archive`` and ``car_reservation_status_archive``, or
+``ReservationArchive`` and ``PaymentArchive`` on the rental schema):
+
+* app schema    - reservations whose return time has passed (an early
+                  return moves it forward) with their payment, and the
+                  ``returned`` status rows;
+* rental schema - completed or cancelled reservations with their payment.
+
+Each batch copies and deletes its rows in one transaction, so the job can
+be stopped at any time and run again to carry on; it pauses between
+batches so bookings keep going.  Reports read the ``all_reservations``
+(``AllReservations``/``AllPayments``) views, which see both sides.
+
+    python archive.py --days 365
+    python archive.py --target mysql --schema rental --days 180 --dry-run
+"""
+import argparse
+import time
+from datetime import date, timedelta
+
+import db
+from availability import record_archived
+from counters import bump, ensure_counters
+from journal import ensure_journal, record_change
+from migrations import migrate
+
+ARCHIVE_AFTER_DAYS = 365
+ARCHIVE_BATCH = 2000  # rows per transaction
+ARCHIVE_PAUSE = 0.05  # seconds between batches
+
+# What is archived, parents first.  ``finished`` selects rows that ended
+# before the ``%s`` cutoff; ``children`` move along with their parent rows.
+ARCHIVE_PLANS = {
+    "app": [
+        {"table": "reservations", "archive": "reservations_archive", "key": "id",
+         "finished": "return_time < %s", "counter": "reservations",
+         "children": (("payments", "payments_archive", "reservation_id"),)},
+        {"table": "car_reservation_status", "archive": "car_reservation_status_archive", "key": "id",
+         "finished": "status = 'returned' AND return_date < %s", "counter": None, "children": ()},
+    ],
+    "rental": [
+        {"table": "Reservation", "archive": "ReservationArchive", "key": "ReservationID",
+         "finished": "Status IN ('completed', 'cancelled') AND EndDate < %s", "counter": None,
+         "children": (("Payment", "PaymentArchive", "ReservationID"),)},
+    ],
+}
+# Columns copied to the archive tables, named so the copy does not depend on column order
+ARCHIVE_COLUMNS = {
+    "reservations": "id, car_id, customer_id, duration, pick_up, return_time, payment",
+    "payments": ("id, reservation_id, amount, payment_date, payment_method, status, attempts, next_attempt_at, "
+                 "settled_at, gateway_reference"),
+    "car_reservation_status": "id, car_id, customer_id, status, reservation_date, return_date",
+    "Reservation": ("ReservationID, CustomerID, CarID, StartDate, EndDate, PickupOfficeID, ReturnOfficeID, "
+                    "Status, TotalCost, ReservationDate"),
+    "Payment": ("PaymentID, ReservationID, Amount, PaymentDate, PaymentMethod, Status, Attempts, NextAttemptAt, "
+                "SettledAt, GatewayReference"),
+}
+# Reservations read by the shared availability index
+INDEXED_TABLES = ("reservations",)
+
+
+class ArchiveReport:
+    """Rows moved per table."""
+
+    def __init__(self, cutoff):
+        self.cutoff = cutoff
+        self.moved = {}
+        self.batches = 0
+        self.started = time.perf_counter()
+
+    def add(self, table, count):
+        self.moved[table] = self.moved.get(table, 0) + count
+
+    def summary(self):
+        moved = ", ".join(f"{count:,} {table}" for table, count in self.moved.items()) or "nothing"
+        return (f"Archived {moved} finished before {self.cutoff} "
+                f"in {self.batches} batches, {time.perf_counter() - self.started:.1f}s")
+
+
+def cutoff_date(days=ARCHIVE_AFTER_DAYS, today=None):
+    """Rows that ended before this date are archived."""
+    return (today or date.today()) - timedelta(days=days)
+
+
+def count_finished(schema="app", cutoff=None):
+    """Return ``{table: rows that would be archived}`` without moving anything."""
+    cutoff = (cutoff or cutoff_date()).isoformat()
+    return {plan["table"]: db.fetch_all(f"SELECT COUNT(*) FROM {plan['table']} WHERE {plan['finished']}",
+                                        (cutoff,))[0][0]
+            for plan in ARCHIVE_PLANS[schema]}
+
+
+def _move(cursor, table, archive, column, ids):
+    marks = ", ".join(["%s"] * len(ids))
+    columns = ARCHIVE_COLUMNS[table]
+    cursor.execute(f"INSERT INTO {archive} ({columns}) SELECT {columns} FROM {table} WHERE {column} IN ({marks})",
+                   ids)
+    cursor.execute(f"DELETE FROM {table} WHERE {column} IN ({marks})", ids)
+
+
+def archive_batch(conn, plan, cutoff, batch_size=ARCHIVE_BATCH):
+    """Move up to ``batch_size`` finished rows of one plan; return their keys."""
+    cursor = conn.cursor()
+    db.begin_write(conn)
+    cursor.execute(f"SELECT {plan['key']} FROM {plan['table']} WHERE {plan['finished']} "
+                   f"ORDER BY {plan['key']} LIMIT %s FOR UPDATE", (cutoff, batch_size))
+    ids = [row[0] for row in cursor.fetchall()]
+    if not ids:
+        conn.rollback()
+        return ids
+    for table, archive, column in plan["children"]:
+        _move(cursor, table, archive, column, ids)
+    _move(cursor, plan["table"], plan["archive"], plan["key"], ids)
+    if plan["counter"]:
+        bump(cursor, plan["counter"], -len(ids))
+        record_change(cursor, plan["table"], None, "bulk")
+    conn.commit()
+    return ids
+
+
+def archive_finished(schema="app", cutoff=None, batch_size=ARCHIVE_BATCH, pause=ARCHIVE_PAUSE, progress=None):
+    """Archive every row that finished before ``cutoff`` (default: a year ago).
+
+    ``progress(report)`` is called after each batch.  Returns an ``ArchiveReport``.
+    """
+    cutoff = cutoff or cutoff_date()
+    report = ArchiveReport(cutoff)
+    for plan in ARCHIVE_PLANS[schema]:
+        while True:
+            with db.connection() as conn:
+                if plan["counter"]:
+                    ensure_counters(conn)
+                    ensure_journal(conn)
+                ids = archive_batch(conn, plan, cutoff.isoformat(), batch_size)
+            if not ids:
+                break
+            if plan["table"] in INDEXED_TABLES:
+                record_archived(ids)
+            report.add(plan["table"], len(ids))
+            report.batches += 1
+            if progress is not None:
+                progress(report)
+            time.sleep(pause)
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Move finished reservations to the archive tables.")
+    parser.add_argument("--days", type=int, default=ARCHIVE_AFTER_DAYS,
+                        help="archive what ended more than this many days ago")
+    parser.add_argument("--target", choices=("sqlite", "mysql"), default="sqlite")
+    parser.add_argument("--db", default="car_rental.db", help="SQLite file (ignored for MySQL)")
+    parser.add_argument("--schema", choices=("app", "rental"),
+                        help="tables to archive (default: app on SQLite, rental on MySQL)")
+    parser.add_argument("--batch-size", type=int, default=ARCHIVE_BATCH, help="rows per transaction")
+    parser.add_argument("--pause", type=float, default=ARCHIVE_PAUSE, help="seconds between batches")
+    parser.add_argument("--dry-run", action="store_true", help="only count what would be archived")
+    args = parser.parse_args()
+    schema = args.schema or ("app" if args.target == "sqlite" else "rental")
+    cutoff = cutoff_date(args.days)
+
+    db.use_backend(db.make_backend(args.target, args.db), size=1, prepare=False)
+    with db.connection() as conn:
+        migrate(conn, schema)  # the archive tables and views come by migration
+    if args.dry_run:
+        for table, count in count_finished(schema, cutoff).items():
+            print(f"{table}: {count:,} rows finished before {cutoff}")
+        return
+
+    def progress(report):
+        if report.batches % 10 == 0:
+            print(f"  {sum(report.moved.values()):,} rows")
+
+    print(archive_finished(schema, cutoff, args.batch_size, args.pause, progress).summary())
+
+
+if __name__ == "__main__":
+    main()
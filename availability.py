@@ -0,0 +1,291 @@
+"""Per-car interval index answering "which cars are free between two dates".
+
+Reservations are kept per car as lists sorted by pick-up time, so checking
+one car is a binary search plus a short scan instead of a pass over the whole
+reservations table.  Intervals are half-open, ``[pick_up, return)``, so a car
+returned on a given day can be picked up again that same day.
+
+The index is built once from the database (``get_index()``) and then kept in
+step by the write paths through ``record_reservation``, ``record_return`` and
+``record_cancellation``, and with other processes' writes by ``refresh_reservations``.
+"""
+import threading
+from bisect import bisect_left, bisect_right
+from datetime import date, datetime
+
+from db import connection, fetch_all, on_configure
+
+
+def to_datetime(value):
+    """Normalise a date, datetime or ``YYYY-MM-DD[ HH:MM[:SS]]`` string to a datetime."""
+    if isinstance(value, datetime):
+        return value
+    if isinstance(value, date):
+        return datetime(value.year, value.month, value.day)
+    try:
+        return datetime.fromisoformat(str(value).strip())
+    except ValueError:
+        raise ValueError(f"Invalid date: {value!r} (expected YYYY-MM-DD)") from None
+
+
+def date_text(value):
+    """Canonical text of a date: ``YYYY-MM-DD``, or ``YYYY-MM-DD HH:MM:SS`` with a time.
+
+    Text in this one form sorts like the dates it holds, which the SQL
+    range comparisons on ``pick_up``/``return_time`` rely on.
+    """
+    moment = to_datetime(value)
+    if moment.hour or moment.minute or moment.second or moment.microsecond:
+        return moment.isoformat(sep=" ")
+    return moment.date().isoformat()
+
+
+def _key(value):
+    """Seconds since 0001-01-01; plain ints compare much faster than datetimes."""
+    moment = to_datetime(value)
+    return (moment.toordinal() * 86400 + moment.hour * 3600
+            + moment.minute * 60 + moment.second)
+
+
+class _CarSchedule:
+    """Reservations of one car, sorted by start (times as ``_key`` ints)."""
+
+    __slots__ = ("starts", "entries", "longest")
+
+    def __init__(self):
+        self.starts = []     # pick-up keys, sorted, parallel to entries
+        self.entries = []    # (start, end, reservation_id)
+        self.longest = 0     # upper bound on any interval length
+
+    def add(self, start, end, reservation_id):
+        i = bisect_right(self.starts, start)
+        self.starts.insert(i, start)
+        self.entries.insert(i, (start, end, reservation_id))
+        if end - start > self.longest:
+            self.longest = end - start
+
+    def remove_at(self, i):
+        del self.starts[i]
+        del self.entries[i]
+
+    def busy(self, start, end):
+        """True if any reservation overlaps ``[start, end)``."""
+        # Only intervals starting in [start - longest, end) can reach into the window.
+        hi = bisect_left(self.starts, end)
+        lo = bisect_left(self.starts, start - self.longest, 0, hi)
+        entries = self.entries
+        for i in range(hi - 1, lo - 1, -1):
+            if entries[i][1] > start:
+                return True
+        return False
+
+
+class AvailabilityIndex:
+    """In-memory availability index over cars and their reservations."""
+
+    def __init__(self):
+        self._schedules = {}      # car_id -> _CarSchedule
+        self._car_office = {}     # car_id -> office_id (None when unknown)
+        self._office_cars = {}    # office_id -> set of car ids
+        self._unavailable = set()  # cars that cannot be rented at all (e.g. out of service)
+        self._by_reservation = {}  # reservation_id -> car_id
+        self._lock = threading.RLock()
+
+    def add_car(self, car_id, office_id=None, status="active"):
+        """Register a car (or move it to another office / change its status)."""
+        with self._lock:
+            old_office = self._car_office.get(car_id)
+            if car_id in self._car_office and old_office != office_id:
+                self._office_cars[old_office].discard(car_id)
+            self._car_office[car_id] = office_id
+            self._office_cars.setdefault(office_id, set()).add(car_id)
+            self._schedules.setdefault(car_id, _CarSchedule())
+            if status == "out_of_service":
+                self._unavailable.add(car_id)
+            else:
+                self._unavailable.discard(car_id)
+
+    def add(self, car_id, start, end, reservation_id=None):
+        """Record a reservation of ``car_id`` for ``[start, end)``."""
+        start, end = _key(start), _key(end)
+        if end <= start:
+            raise ValueError("Return date must be after pick-up date")
+        with self._lock:
+            if car_id not in self._car_office:
+                self.add_car(car_id)
+            self._schedules[car_id].add(start, end, reservation_id)
+            if reservation_id is not None:
+                self._by_reservation[reservation_id] = car_id
+
+    def remove(self, reservation_id):
+        """Forget a reservation (cancelled or archived).  Returns True if found."""
+        with self._lock:
+            car_id = self._by_reservation.pop(reservation_id, None)
+            if car_id is None:
+                return False
+            schedule = self._schedules[car_id]
+            for i, entry in enumerate(schedule.entries):
+                if entry[2] == reservation_id:
+                    schedule.remove_at(i)
+                    return True
+            return False
+
+    def replace(self, reservation_id, car_id, start, end):
+        """Record a reservation again with new dates, e.g. after an early return or an edit elsewhere."""
+        with self._lock:
+            self.remove(reservation_id)
+            self.add(car_id, start, end, reservation_id)
+
+    def knows(self, reservation_id):
+        """True if the reservation is indexed here, with its dates as of an early return."""
+        with self._lock:
+            return reservation_id in self._by_reservation
+
+    def is_free(self, car_id, start, end):
+        """True when ``car_id`` is rentable and has no reservation in ``[start, end)``."""
+        start, end = _key(start), _key(end)
+        with self._lock:
+            if car_id in self._unavailable:
+                return False
+            schedule = self._schedules.get(car_id)
+            return schedule is None or not schedule.busy(start, end)
+
+    def free_cars(self, start, end, office_id=None):
+        """Return the sorted ids of cars free for the whole of ``[start, end)``.
+
+        ``office_id=None`` searches every office.
+        """
+        start, end = _key(start), _key(end)
+        if end <= start:
+            raise ValueError("Return date must be after pick-up date")
+        with self._lock:
+            if office_id is None:
+                candidates = self._schedules.keys()
+            else:
+                candidates = self._office_cars.get(office_id, ())
+            schedules, unavailable = self._schedules, self._unavailable
+            free = [car_id for car_id in candidates
+                    if car_id not in unavailable and not schedules[car_id].busy(start, end)]
+        free.sort()
+        return free
+
+    def __len__(self):
+        return len(self._schedules)
+
+
+def load_app_schema(cursor, index=None):
+    """Build an index from the ``cars``/``reservations`` tables used by the GUI."""
+    index = AvailabilityIndex() if index is None else index
+    cursor.execute("SELECT id FROM cars")
+    for (car_id,) in cursor.fetchall():
+        index.add_car(car_id)
+    cursor.execute("SELECT id, car_id, pick_up, return_time FROM reservations")
+    for reservation_id, car_id, pick_up, return_time in cursor.fetchall():
+        try:
+            index.add(car_id, pick_up, return_time, reservation_id)
+        except ValueError:
+            continue  # cancelled (empty) rows and legacy ones with unparseable or inverted dates block nothing
+    return index
+
+
+def load_rental_schema(cursor, index=None):
+    """Build an index from the ``Car``/``Reservation`` tables in ``database.txt``."""
+    index = AvailabilityIndex() if index is None else index
+    cursor.execute("SELECT CarID, OfficeID, Status FROM Car")
+    for car_id, office_id, status in cursor.fetchall():
+        index.add_car(car_id, office_id, status)
+    cursor.execute("SELECT ReservationID, CarID, StartDate, EndDate FROM Reservation "
+                   "WHERE Status = 'confirmed'")
+    for reservation_id, car_id, start, end in cursor.fetchall():
+        try:
+            index.add(car_id, start, end, reservation_id)
+        except ValueError:
+            continue
+    return index
+
+
+_index = None
+_index_lock = threading.Lock()
+
+
+def get_index(cursor=None):
+    """Return the shared index, loading it from the database on first use.
+
+    Pass ``cursor`` to load through a connection the caller already holds;
+    otherwise one is borrowed from the shared pool.
+    """
+    global _index
+    with _index_lock:
+        if _index is None and cursor is not None:
+            _index = load_app_schema(cursor)
+        elif _index is None:
+            with connection() as conn:
+                cursor = conn.cursor()
+                try:
+                    _index = load_app_schema(cursor)
+                finally:
+                    cursor.close()
+        return _index
+
+
+def set_index(index):
+    """Install ``index`` as the shared index (``None`` forces a reload on next use)."""
+    global _index
+    with _index_lock:
+        _index = index
+
+
+on_configure(lambda: set_index(None))  # another database: reload on next use
+
+
+def record_reservation(car_id, pick_up, return_time, reservation_id=None):
+    """Keep the shared index in step after a reservation insert.
+
+    Does nothing until the index has been loaded; the first load reads the
+    committed row anyway.
+    """
+    if _index is not None:
+        _index.add(car_id, pick_up, return_time, reservation_id)
+
+
+def refresh_reservations(reservation_ids):
+    """Bring the shared index in step with reservations another process changed.
+
+    ``reservation_ids`` come from the change journal; ``None`` (a bulk
+    change) drops the index so it reloads on next use.  Rows no longer in
+    the table (archived) or emptied by a cancellation are forgotten.
+    """
+    index = _index
+    if index is None or not reservation_ids:
+        if reservation_ids is None:
+            set_index(None)
+        return
+    ids = sorted(reservation_ids)
+    rows = fetch_all("SELECT id, car_id, pick_up, return_time FROM reservations WHERE id IN ({})".format(
+        ", ".join(["%s"] * len(ids))), ids)
+    for reservation_id, car_id, pick_up, return_time in rows:
+        try:
+            index.replace(reservation_id, car_id, pick_up, return_time)
+        except ValueError:
+            index.remove(reservation_id)  # cancelled (empty) or unparseable: blocks nothing, as on load
+    for reservation_id in set(ids) - {row[0] for row in rows}:
+        index.remove(reservation_id)
+
+
+def record_archived(reservation_ids):
+    """Drop archived reservations from the shared index; they ended long ago."""
+    if _index is not None:
+        for reservation_id in reservation_ids:
+            _index.remove(reservation_id)
+
+
+def record_return(reservation_id, car_id, pick_up, returned_at):
+    """Keep the shared index in step after a booking ended early: the car is free from ``returned_at``."""
+    if _index is not None:
+        _index.replace(reservation_id, car_id, pick_up, returned_at)
+
+
+def record_cancellation(reservation_id):
+    """Keep the shared index in step after a booking was cancelled (emptied: return time = pick-up)."""
+    if _index is not None:
+        _index.remove(reservation_id)
@@ -0,0 +1,109 @@
+"""Benchmark the NumPy fleet analytics against a plain row loop.
+
+Fills a SQLite file with ``datagen`` (millions of reservations by default),
+then computes per-car and per-model utilization and revenue plus a daily
+per-model occupancy heatmap over the whole generated history (by default
+the last two years and the year ahead): once with ``analytics`` and once
+by looping over the same rows in Python.  The two answers are compared.
+
+    python benchmarks/bench_analytics.py --reservations 2000000
+    python benchmarks/bench_analytics.py --db bench.db --from 2024-01-01 --to 2025-01-01
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+from collections import defaultdict
+from datetime import date, timedelta
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import analytics  # noqa: E402
+import db  # noqa: E402
+from datagen import fill_app_schema  # noqa: E402
+from exporter import stream_rows  # noqa: E402
+from migrations import migrate  # noqa: E402
+from schema import create_schema  # noqa: E402
+
+
+def timed(label, func, *args):
+    started = time.perf_counter()
+    result = func(*args)
+    print(f"{label:<40}{time.perf_counter() - started:9.3f}s")
+    return result
+
+
+def row_loop(start, end):
+    """The same figures, one reservation at a time."""
+    models = {car_id: name for car_id, name, _ in db.fetch_all(analytics.FLEET_QUERIES["app"][0])}
+    days = (end - start).days
+    booked, revenue = defaultdict(int), defaultdict(float)
+    heatmap = defaultdict(lambda: [0] * days)
+    batches = stream_rows(analytics.FLEET_QUERIES["app"][1], (end.isoformat(), start.isoformat()))
+    next(batches)
+    for rows in batches:
+        for car_id, pick_up, return_time, payment in rows:
+            if car_id not in models:
+                continue
+            first = (date.fromisoformat(str(pick_up)[:10]) - start).days
+            last = (date.fromisoformat(str(return_time)[:10]) - start).days
+            inside_first, inside_last = max(0, min(first, days)), max(0, min(last, days))
+            if inside_last <= inside_first:
+                continue
+            booked[car_id] += inside_last - inside_first
+            revenue[car_id] += payment * (inside_last - inside_first) / max(last - first, 1)
+            row = heatmap[models[car_id]]
+            for day in range(inside_first, inside_last):
+                row[day] += 1
+    return booked, revenue, heatmap
+
+
+def vectorized(start, end):
+    data = analytics.load_fleet(start, end)
+    return data, analytics.utilization(data, "car"), analytics.utilization(data, "model"), \
+        analytics.occupancy_heatmap(data, "model")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--db", help="existing app-schema SQLite file (default: generate one)")
+    parser.add_argument("--reservations", type=int, default=2000000)
+    parser.add_argument("--cars", type=int, default=20000)
+    parser.add_argument("--from", dest="start", type=date.fromisoformat,
+                        default=date.today() - timedelta(days=730))
+    parser.add_argument("--to", dest="end", type=date.fromisoformat, default=date.today() + timedelta(days=365))
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as folder:
+        path = args.db
+        if path is None:
+            path = os.path.join(folder, "analytics.db")
+            conn = db.sqlite_connect(path)
+            create_schema(conn, "app", "sqlite")
+            fill_app_schema(conn, max(1000, args.reservations // 20), args.cars, args.reservations)
+            migrate(conn, "app", pause=0)
+            conn.close()
+        db.use_backend(db.SQLiteBackend(path), size=1, prepare=False)
+
+        data, by_car, by_model, (labels, _, matrix) = timed("numpy: load + utilization + heatmap",
+                                                            vectorized, args.start, args.end)
+        print(f"  {len(data):,} reservations in range, {len(data.car_ids):,} cars")
+        timed("numpy: load only", analytics.load_fleet, args.start, args.end)
+        timed("numpy: utilization by car", analytics.utilization, data, "car")
+        timed("numpy: daily heatmap by model", analytics.occupancy_heatmap, data, "model")
+        booked, revenue, heatmap = timed("python row loop", row_loop, args.start, args.end)
+
+    mismatches = sum(1 for car_id, _, days, _, _, _ in by_car if days != booked.get(car_id, 0))
+    cars_per_model = {label: cars for label, cars, _, _, _, _ in by_model}
+    heatmap_error = max((np.abs(matrix[labels.index(model)] - np.array(counts) / cars_per_model[model]).max()
+                         for model, counts in heatmap.items()), default=0.0)
+    revenue_error = max((abs(value - revenue.get(car_id, 0.0)) for car_id, _, _, _, value, _ in by_car), default=0.0)
+    print(f"booked-day mismatches: {mismatches}, max revenue difference: {revenue_error:.6f}, "
+          f"max heatmap difference: {heatmap_error:.6f}")
+
+
+if __name__ == "__main__":
+    main()
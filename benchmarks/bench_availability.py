@@ -0,0 +1,115 @@
+"""Benchmark the availability index against a plain SQL overlap query.
+
+Builds an in-memory SQLite database with the given number of cars and
+reservations, then answers the same random "free cars in office X between
+A and B" questions both ways and checks that the answers agree.  SQL is
+timed twice: on the tables as shipped (primary keys only, like
+``car_rental.db``) and with a composite ``(car_id, pick_up, return_time)``
+index.
+
+    python benchmarks/bench_availability.py --reservations 200000
+"""
+import argparse
+import os
+import random
+import sqlite3
+import sys
+import time
+from datetime import date, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from availability import AvailabilityIndex  # noqa: E402
+
+OVERLAP_QUERY = """
+    SELECT c.id FROM cars c
+    WHERE c.office_id = ?
+      AND NOT EXISTS (SELECT 1 FROM reservations r
+                      WHERE r.car_id = c.id AND r.pick_up < ? AND r.return_time > ?)
+    ORDER BY c.id
+"""
+
+
+def build_database(cars, reservations, offices, seed):
+    rng = random.Random(seed)
+    conn = sqlite3.connect(":memory:")
+    conn.executescript("""
+        CREATE TABLE cars (id INTEGER PRIMARY KEY, office_id INTEGER NOT NULL);
+        CREATE TABLE reservations (
+            id INTEGER PRIMARY KEY, car_id INTEGER NOT NULL,
+            pick_up TEXT NOT NULL, return_time TEXT NOT NULL);
+    """)
+    conn.executemany("INSERT INTO cars VALUES (?, ?)",
+                     ((car_id, rng.randrange(offices)) for car_id in range(1, cars + 1)))
+    first_day = date(2024, 1, 1)
+    rows = []
+    for reservation_id in range(1, reservations + 1):
+        start = first_day + timedelta(days=rng.randrange(730))
+        end = start + timedelta(days=rng.randint(1, 14))
+        rows.append((reservation_id, rng.randint(1, cars), start.isoformat(), end.isoformat()))
+    conn.executemany("INSERT INTO reservations VALUES (?, ?, ?, ?)", rows)
+    conn.commit()
+    return conn
+
+
+def time_sql(conn, queries):
+    started = time.perf_counter()
+    answers = [[row[0] for row in conn.execute(OVERLAP_QUERY, (office, end.isoformat(), start.isoformat()))]
+               for office, start, end in queries]
+    return answers, (time.perf_counter() - started) / len(queries)
+
+
+def random_queries(count, offices, seed):
+    rng = random.Random(seed + 1)
+    first_day = date(2024, 1, 1)
+    for _ in range(count):
+        start = first_day + timedelta(days=rng.randrange(730))
+        yield rng.randrange(offices), start, start + timedelta(days=rng.randint(1, 10))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--cars", type=int, default=5000)
+    parser.add_argument("--reservations", type=int, default=120000)
+    parser.add_argument("--offices", type=int, default=50)
+    parser.add_argument("--queries", type=int, default=500)
+    parser.add_argument("--plain-queries", type=int, default=10,
+                        help="queries to time against the unindexed tables (they are slow)")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    conn = build_database(args.cars, args.reservations, args.offices, args.seed)
+    queries = list(random_queries(args.queries, args.offices, args.seed))
+
+    started = time.perf_counter()
+    index = AvailabilityIndex()
+    for car_id, office_id in conn.execute("SELECT id, office_id FROM cars"):
+        index.add_car(car_id, office_id)
+    for reservation_id, car_id, pick_up, return_time in conn.execute("SELECT * FROM reservations"):
+        index.add(car_id, pick_up, return_time, reservation_id)
+    build_time = time.perf_counter() - started
+
+    plain_answers, plain_time = time_sql(conn, queries[:args.plain_queries])
+    # Give SQL its best shot: a composite index covering the overlap predicate.
+    conn.execute("CREATE INDEX idx_res_car_dates ON reservations(car_id, pick_up, return_time)")
+    conn.execute("CREATE INDEX idx_cars_office ON cars(office_id)")
+    sql_answers, sql_time = time_sql(conn, queries)
+
+    started = time.perf_counter()
+    index_answers = [index.free_cars(start, end, office) for office, start, end in queries]
+    index_time = (time.perf_counter() - started) / len(queries)
+
+    if sql_answers != index_answers or plain_answers != index_answers[:args.plain_queries]:
+        sys.exit("Mismatch between SQL and index answers")
+
+    print(f"cars={args.cars} reservations={args.reservations} offices={args.offices} queries={args.queries}")
+    print(f"index build:               {build_time * 1000:10.1f} ms")
+    print(f"SQL overlap, no index:     {plain_time * 1000:10.3f} ms/query")
+    print(f"SQL overlap, composite:    {sql_time * 1000:10.3f} ms/query")
+    print(f"interval index:            {index_time * 1000:10.3f} ms/query")
+    print(f"speed-up vs shipped schema:{plain_time / index_time:10.1f}x")
+    print(f"speed-up vs composite:     {sql_time / index_time:10.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+"""Compare storage backends on the hot operations of ``benchmarks/run.py``.
+
+Fills one SQLite file with ``datagen`` and runs the same seeded workload on
+copies of it: once with SQLite's stock settings (rollback journal, full
+sync, default statement cache) and once with ``db.SQLiteBackend``'s tuned
+ones.  With ``--mysql-database`` the same data also goes into that MySQL
+database (a scratch one: its app tables are emptied first) and is measured
+too.
+
+    python benchmarks/bench_backends.py --reservations 200000
+    python benchmarks/bench_backends.py --mysql-database car_rental_bench
+"""
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+BENCHMARKS = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(BENCHMARKS))
+sys.path.insert(0, BENCHMARKS)
+
+import availability  # noqa: E402
+import db  # noqa: E402
+import run as bench  # noqa: E402
+from counters import reconcile  # noqa: E402
+from datagen import fill_app_schema  # noqa: E402
+from schema import create_schema  # noqa: E402
+
+STOCK_SQLITE = {"journal_mode": "DELETE", "synchronous": "FULL"}  # what a fresh sqlite3 connection gets
+
+
+def fill(conn, engine, args):
+    create_schema(conn, "app", engine)
+    fill_app_schema(conn, args.customers, args.cars, args.reservations, args.seed)
+    reconcile(conn)
+    conn.close()
+
+
+def measure(backend, args):
+    """Run the workload on ``backend``; return the per-operation results."""
+    print(f"\n== {backend}")
+    db.use_backend(backend)
+    started = time.perf_counter()
+    workload = bench.Workload(args.seed)
+    availability.get_index()
+    print(f"start-up (workload + availability index): {time.perf_counter() - started:.2f}s")
+    print(f"{'operation':<24}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'ops/s':>12}{'errors':>8}")
+    results = bench.run(workload, bench.OPERATIONS, args.iterations, args.warmup)
+    db.get_pool().close()
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--customers", type=int, default=20000)
+    parser.add_argument("--cars", type=int, default=2000)
+    parser.add_argument("--reservations", type=int, default=100000)
+    parser.add_argument("--iterations", type=int, default=200)
+    parser.add_argument("--warmup", type=int, default=10)
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--mysql-database", help="scratch MySQL database to include in the comparison")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as folder:
+        source = os.path.join(folder, "source.db")
+        print(f"Filling {args.customers:,} customers, {args.cars:,} cars, {args.reservations:,} reservations...")
+        fill(db.sqlite_connect(source), "sqlite", args)
+
+        backends = []
+        for label, pragmas, statement_cache in (("stock", STOCK_SQLITE, 128),
+                                                ("tuned", None, db.SQLITE_STATEMENT_CACHE)):
+            path = os.path.join(folder, f"{label}.db")
+            shutil.copyfile(source, path)
+            backends.append((f"sqlite {label}", db.SQLiteBackend(path, pragmas, statement_cache)))
+        if args.mysql_database:
+            backend = db.MySQLBackend(database=args.mysql_database)
+            conn = backend.connect()
+            cursor = conn.cursor()
+            for table in ("reservations", "customers", "cars", "overview_counters"):
+                cursor.execute(f"DROP TABLE IF EXISTS {table}")
+            fill(conn, "mysql", args)
+            backends.append(("mysql", backend))
+
+        results = {label: measure(backend, args) for label, backend in backends}
+
+    labels = list(results)
+    print(f"\n{'ops/s':<24}" + "".join(f"{label:>14}" for label in labels))
+    for name in bench.OPERATIONS:
+        print(f"{name:<24}" + "".join(f"{results[label][name]['ops_per_s']:>14,.1f}" for label in labels))
+
+
+if __name__ == "__main__":
+    main()
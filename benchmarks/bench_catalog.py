@@ -0,0 +1,139 @@
+"""Benchmark fleet search: the columnar catalog against the equivalent SQL.
+
+Builds an in-memory SQLite database with the given number of cars and
+reservations, then answers the same random multi-attribute searches
+(model substring, year range, color, rate range, office, status and a
+free date range) both ways and checks that the answers agree.  SQL gets
+single-column indexes on every filtered attribute and a composite
+``(car_id, pick_up, return_time)`` index for the overlap check.
+
+    python benchmarks/bench_catalog.py --cars 100000 --reservations 300000
+"""
+import argparse
+import os
+import random
+import sqlite3
+import sys
+import time
+from datetime import date, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from availability import AvailabilityIndex  # noqa: E402
+from catalog import CarCatalog  # noqa: E402
+from datagen import MODELS, COLORS  # noqa: E402
+
+SEARCH_QUERY = """
+    SELECT c.id FROM cars c
+    WHERE lower(c.model) LIKE ? AND c.year BETWEEN ? AND ? AND lower(c.color) = ?
+      AND c.rate BETWEEN ? AND ? AND c.office_id = ? AND c.status = ?
+      AND NOT EXISTS (SELECT 1 FROM reservations r
+                      WHERE r.car_id = c.id AND r.pick_up < ? AND r.return_time > ?)
+    ORDER BY c.id
+"""
+
+
+def build_database(cars, reservations, offices, seed):
+    rng = random.Random(seed)
+    conn = sqlite3.connect(":memory:")
+    conn.executescript("""
+        CREATE TABLE cars (id INTEGER PRIMARY KEY, model TEXT NOT NULL, year INTEGER NOT NULL,
+                           color TEXT NOT NULL, office_id INTEGER NOT NULL, status TEXT NOT NULL,
+                           rate REAL NOT NULL);
+        CREATE TABLE reservations (
+            id INTEGER PRIMARY KEY, car_id INTEGER NOT NULL,
+            pick_up TEXT NOT NULL, return_time TEXT NOT NULL);
+    """)
+    rows = []
+    for car_id in range(1, cars + 1):
+        model, rate = rng.choice(MODELS)
+        rows.append((car_id, model, rng.randint(2010, 2025), rng.choice(COLORS), rng.randrange(offices),
+                     "out_of_service" if rng.random() < 0.03 else "active",
+                     round(rate * rng.uniform(0.8, 1.2), 2)))
+    conn.executemany("INSERT INTO cars VALUES (?, ?, ?, ?, ?, ?, ?)", rows)
+    first_day = date(2024, 1, 1)
+    conn.executemany("INSERT INTO reservations VALUES (?, ?, ?, ?)", (
+        (reservation_id, rng.randint(1, cars), start.isoformat(),
+         (start + timedelta(days=rng.randint(1, 14))).isoformat())
+        for reservation_id, start in ((i, first_day + timedelta(days=rng.randrange(730)))
+                                      for i in range(1, reservations + 1))))
+    conn.commit()
+    return conn
+
+
+def random_searches(count, offices, seed):
+    rng = random.Random(seed + 1)
+    first_day = date(2024, 1, 1)
+    for _ in range(count):
+        model, rate = rng.choice(MODELS)
+        word = rng.choice(model.split())
+        start = rng.randrange(max(1, len(word) - 2))
+        year = rng.randint(2010, 2022)
+        pick_up = first_day + timedelta(days=rng.randrange(730))
+        yield {"model": word[start:start + 3], "year_from": year, "year_to": year + rng.randint(0, 5),
+               "color": rng.choice(COLORS), "rate_min": rate * 0.9, "rate_max": rate * 1.5,
+               "office": rng.randrange(offices), "status": "active",
+               "pick_up": pick_up.isoformat(), "return_time": (pick_up + timedelta(days=rng.randint(1, 10))).isoformat()}
+
+
+def time_sql(conn, searches):
+    started = time.perf_counter()
+    answers = [[row[0] for row in conn.execute(SEARCH_QUERY, (
+        f"%{s['model'].lower()}%", s["year_from"], s["year_to"], s["color"].lower(), s["rate_min"], s["rate_max"],
+        s["office"], s["status"], s["return_time"], s["pick_up"]))] for s in searches]
+    return answers, (time.perf_counter() - started) / len(searches)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--cars", type=int, default=100000)
+    parser.add_argument("--reservations", type=int, default=300000)
+    parser.add_argument("--offices", type=int, default=50)
+    parser.add_argument("--searches", type=int, default=200)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    conn = build_database(args.cars, args.reservations, args.offices, args.seed)
+    searches = list(random_searches(args.searches, args.offices, args.seed))
+
+    started = time.perf_counter()
+    catalog = CarCatalog()
+    catalog.extend(conn.execute("SELECT id, model, year, color, office_id, status, rate FROM cars"))
+    catalog_time = time.perf_counter() - started
+    started = time.perf_counter()
+    index = AvailabilityIndex()
+    for car_id, office_id in conn.execute("SELECT id, office_id FROM cars"):
+        index.add_car(car_id, office_id)
+    for reservation_id, car_id, pick_up, return_time in conn.execute("SELECT * FROM reservations"):
+        index.add(car_id, pick_up, return_time, reservation_id)
+    index_time = time.perf_counter() - started
+
+    for column in ("model", "year", "color", "office_id", "status", "rate"):
+        conn.execute(f"CREATE INDEX idx_cars_{column} ON cars({column})")
+    conn.execute("CREATE INDEX idx_res_car_dates ON reservations(car_id, pick_up, return_time)")
+    sql_answers, sql_time = time_sql(conn, searches)
+
+    started = time.perf_counter()
+    catalog_answers = [[row[0] for row in catalog.search(index=index, limit=None, **search)[0]]
+                       for search in searches]
+    search_time = (time.perf_counter() - started) / len(searches)
+
+    started = time.perf_counter()
+    for search in searches:
+        catalog.matches(model=search["model"], rate_min=search["rate_min"], rate_max=search["rate_max"])
+    broad_time = (time.perf_counter() - started) / len(searches)
+
+    if sql_answers != catalog_answers:
+        sys.exit("Mismatch between SQL and catalog answers")
+
+    print(f"cars={args.cars} reservations={args.reservations} offices={args.offices} searches={args.searches}")
+    print(f"catalog load:              {catalog_time * 1000:10.1f} ms")
+    print(f"availability index load:   {index_time * 1000:10.1f} ms")
+    print(f"SQL, indexed:              {sql_time * 1000:10.3f} ms/search")
+    print(f"catalog + index:           {search_time * 1000:10.3f} ms/search")
+    print(f"catalog, model + rate only:{broad_time * 1000:10.3f} ms/search")
+    print(f"speed-up vs SQL:           {sql_time / search_time:10.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+"""Benchmark search-as-you-type customer lookup at a million customers.
+
+Indexes ``datagen`` customers, then replays clerks typing names, phones
+and licence numbers one keystroke at a time and times the lookup after
+every keystroke (percentiles over all of them).  The same keystrokes are
+answered, for comparison, by the ``LIKE 'prefix%'`` queries a plain SQL
+lookup would run against an in-memory SQLite copy with an index on each
+column.  Registering customers one by one into the loaded index is timed
+too.
+
+    python benchmarks/bench_customer_lookup.py --customers 1000000
+"""
+import argparse
+import gc
+import os
+import random
+import sqlite3
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from customer_index import CustomerIndex  # noqa: E402
+from datagen import generate_customers  # noqa: E402
+from run import percentile  # noqa: E402
+
+SQL_LOOKUP = """
+    SELECT id, name, phone, licence FROM customers
+    WHERE name LIKE ?1 OR name LIKE '% ' || ?1 OR phone LIKE ?1 OR licence LIKE ?1
+    ORDER BY name LIMIT 20
+"""
+
+
+def typed(customers, count, seed):
+    """What clerks type, keystroke by keystroke: part of a name, a phone or a licence."""
+    rng = random.Random(seed)
+    for _ in range(count):
+        name, phone, licence = rng.choice(customers)[1:]
+        text = rng.choice((name, name.split()[-1], phone[1:], licence))
+        for length in range(1, min(len(text), 10) + 1):
+            yield text[:length]
+
+
+def report(label, timings):
+    timings = sorted(timings)
+    print(f"{label:<22}p50 {percentile(timings, 0.5) * 1000:8.3f} ms  p95 {percentile(timings, 0.95) * 1000:8.3f} ms  "
+          f"max {timings[-1] * 1000:8.3f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--customers", type=int, default=1000000)
+    parser.add_argument("--lookups", type=int, default=300, help="values typed")
+    parser.add_argument("--sql-lookups", type=int, default=30, help="values typed against SQLite")
+    parser.add_argument("--inserts", type=int, default=1000)
+    parser.add_argument("--seed", type=int, default=5)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    customers = [(row[0], f"{row[1]} {row[2]}", row[4], row[7])
+                 for row in generate_customers(args.customers, rng)]
+    started = time.perf_counter()
+    index = CustomerIndex()
+    index.load(customers)
+    print(f"{args.customers:,} customers indexed in {time.perf_counter() - started:.2f}s")
+    gc.collect()  # the one full collection over the freshly loaded index, not a lookup's cost
+
+    timings = []
+    for text in typed(customers, args.lookups, args.seed):
+        started = time.perf_counter()
+        index.search(text)
+        timings.append(time.perf_counter() - started)
+    report(f"index ({len(timings):,} keys)", timings)
+
+    conn = sqlite3.connect(":memory:")
+    conn.execute("PRAGMA case_sensitive_like = OFF")
+    conn.execute("CREATE TABLE customers (id INTEGER PRIMARY KEY, name TEXT COLLATE NOCASE, "
+                 "phone TEXT COLLATE NOCASE, licence TEXT COLLATE NOCASE)")
+    conn.executemany("INSERT INTO customers VALUES (?, ?, ?, ?)", customers)
+    for column in ("name", "phone", "licence"):
+        conn.execute(f"CREATE INDEX idx_customers_{column} ON customers({column})")
+    timings = []
+    for text in typed(customers, args.sql_lookups, args.seed):
+        started = time.perf_counter()
+        conn.execute(SQL_LOOKUP, (text + "%",)).fetchall()
+        timings.append(time.perf_counter() - started)
+    report(f"SQL LIKE ({len(timings):,} keys)", timings)
+
+    timings = []
+    for customer_id in range(args.customers + 1, args.customers + args.inserts + 1):
+        started = time.perf_counter()
+        index.add(customer_id, f"{rng.choice(customers)[1]}", f"+3{customer_id:010d}", f"DL{customer_id:08d}")
+        timings.append(time.perf_counter() - started)
+    report(f"insert ({args.inserts:,})", timings)
+
+
+if __name__ == "__main__":
+    main()
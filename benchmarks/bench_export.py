@@ -0,0 +1,83 @@
+"""Benchmark the streaming export: throughput and memory against ``fetchall``.
+
+Fills SQLite files of growing size with ``datagen`` and exports each one
+twice: the old way (``fetchall`` the joined query, then write it) and
+through ``exporter``.  Peak Python memory is taken with ``tracemalloc``; the
+streaming export's should stay flat while the ``fetchall`` one grows with
+the row count.
+
+    python benchmarks/bench_export.py --reservations 50000 200000 500000
+"""
+import argparse
+import csv
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import db  # noqa: E402
+import exporter  # noqa: E402
+from datagen import fill_app_schema  # noqa: E402
+from migrations import migrate  # noqa: E402
+from schema import create_schema  # noqa: E402
+
+
+def fetchall_export(path):
+    query, params = exporter.build_query()
+    with db.connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute(query, params)
+        rows = cursor.fetchall()
+        columns = [column[0] for column in cursor.description]
+    with open(path, "w", newline="", encoding="utf-8") as handle:
+        writer = csv.writer(handle)
+        writer.writerow(columns)
+        writer.writerows(rows)
+    return len(rows)
+
+
+def traced(func, *args):
+    """Run ``func``; return its result, the seconds taken and the peak traced MB."""
+    tracemalloc.start()
+    started = time.perf_counter()
+    result = func(*args)
+    elapsed = time.perf_counter() - started
+    peak = tracemalloc.get_traced_memory()[1] / 1e6
+    tracemalloc.stop()
+    return result, elapsed, peak
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--reservations", type=int, nargs="+", default=[50000, 200000])
+    parser.add_argument("--gzip", action="store_true", help="also time a compressed export")
+    args = parser.parse_args()
+
+    print(f"{'rows':>10}  {'method':<18}{'seconds':>9}{'rows/s':>12}{'peak MB':>10}")
+    with tempfile.TemporaryDirectory() as folder:
+        for count in args.reservations:
+            path = os.path.join(folder, f"export-{count}.db")
+            conn = db.sqlite_connect(path)
+            create_schema(conn, "app", "sqlite")
+            fill_app_schema(conn, max(1000, count // 10), max(100, count // 100), count)
+            migrate(conn, "app", pause=0)
+            conn.close()
+            db.use_backend(db.SQLiteBackend(path), size=1, prepare=False)
+
+            methods = [("fetchall + csv", lambda: fetchall_export(os.path.join(folder, "old.csv"))),
+                       ("stream csv", lambda: exporter.export_reservations(os.path.join(folder, "new.csv")).rows),
+                       ("stream jsonl", lambda: exporter.export_reservations(os.path.join(folder, "new.jsonl")).rows)]
+            if args.gzip:
+                methods.append(("stream csv.gz",
+                                lambda: exporter.export_reservations(os.path.join(folder, "new.csv.gz")).rows))
+            for label, func in methods:
+                rows, elapsed, peak = traced(func)
+                print(f"{count:>10,}  {label:<18}{elapsed:9.2f}{rows / elapsed:12,.0f}{peak:10.1f}")
+            db.get_pool().close()
+
+
+if __name__ == "__main__":
+    main()
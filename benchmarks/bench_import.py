@@ -0,0 +1,90 @@
+"""Benchmark the bulk importer against registering rows one at a time.
+
+Creates a fresh SQLite database with the app schema, then adds the same
+number of customers and reservations twice: through ``rentals`` one row
+per call, as the forms do, and through ``importer`` in chunked batches.
+
+    python benchmarks/bench_import.py --rows 20000
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+from datetime import date, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import db  # noqa: E402
+import importer  # noqa: E402
+import rentals  # noqa: E402
+
+
+def customer_rows(count, tag):
+    for i in range(count):
+        yield i + 1, {"name": f"Customer {tag}{i}", "phone": f"+{tag}{i:09d}",
+                      "email": f"{tag}{i}@example.com", "country": "Egypt"}
+
+
+def _day(year, offset):
+    return (date(year, 1, 1) + timedelta(days=offset)).isoformat()
+
+
+def timed(label, count, func):
+    started = time.perf_counter()
+    func()
+    elapsed = time.perf_counter() - started
+    print(f"{label:<34}{elapsed:8.2f}s {count / elapsed:12,.0f} rows/s")
+    return elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=20000)
+    parser.add_argument("--cars", type=int, default=500)
+    args = parser.parse_args()
+    if args.cars < 2:
+        parser.error("--cars must be at least 2")
+
+    with tempfile.TemporaryDirectory() as folder:
+        path = os.path.join(folder, "import.db")
+        db.use_backend(db.SQLiteBackend(path), size=1)
+        with db.connection() as conn:
+            conn.cursor().executemany("INSERT INTO cars (name, model_year, color) VALUES (%s, %s, %s)",
+                                      [("Toyota Camry", 2022, "Red")] * args.cars)
+            conn.commit()
+
+        def one_by_one_customers():
+            for _, row in customer_rows(args.rows, "a"):
+                rentals.add_customer(row["name"], row["phone"],
+                                     rentals.validate_and_hash_email(row["email"]), row["country"])
+
+        def one_by_one_reservations():
+            for i in range(args.rows):
+                rentals.reserve_car("Toyota Camry", 2022, "Red", 3, _day(2030, i * 4), _day(2030, i * 4 + 3),
+                                    100, i + 1)
+
+        def batched(kind, rows):
+            report = importer.IMPORTERS[kind](rows)
+            if report.failures:
+                sys.exit(f"{kind}: {len(report.failures)} rows failed, first: {report.failures[0]}")
+
+        loop_time = timed("customers, one per call", args.rows, one_by_one_customers)
+        bulk_time = timed("customers, importer", args.rows,
+                          lambda: batched("customers", customer_rows(args.rows, "b")))
+        print(f"{'speed-up':<34}{loop_time / bulk_time:8.1f}x")
+
+        # reserve_car always picks car 1 (the first with these details), so the
+        # loop books it back to back; the importer spreads over the other cars.
+        loop_time = timed("reservations, one per call", args.rows, one_by_one_reservations)
+        others = args.cars - 1
+        rows = ((line, {"car_id": (line - 1) % others + 2, "customer_id": line,
+                        "pick_up": _day(2030, (line - 1) // others * 7),
+                        "return_time": _day(2030, (line - 1) // others * 7 + 3), "payment": "100"})
+                for line in range(1, args.rows + 1))
+        bulk_time = timed("reservations, importer", args.rows, lambda: batched("reservations", rows))
+        print(f"{'speed-up':<34}{loop_time / bulk_time:8.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,101 @@
+"""Benchmark payment settlement against the simulated gateway.
+
+Fills an app-schema SQLite file with ``datagen`` reservations, queues a
+pending payment for each, then:
+
+* backlog - settles the queue one payment per gateway call (the shape of
+  charging each booking as it is made) for ``--baseline-seconds``, then
+  drains the rest with ``PaymentPipeline``: concurrent batched calls and
+  batched status writes;
+* steady  - queues ``--rate`` new payments a minute while the pipeline
+  runs, and reports the settlement lag (queued to settled) percentiles.
+
+    python benchmarks/bench_payments.py --reservations 50000 --rate 6000 --latency-ms 50
+"""
+import argparse
+import os
+import sys
+import tempfile
+import threading
+import time
+from datetime import date
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import db  # noqa: E402
+import payments  # noqa: E402
+from datagen import fill_app_schema  # noqa: E402
+from migrations import migrate  # noqa: E402
+from schema import create_schema  # noqa: E402
+
+
+def report(label, summary):
+    print(f"{label:<12}{summary['settled_per_minute']:>12,.0f}/min  "
+          f"{summary['completed']:>8,} completed {summary['failed']:>6,} failed {summary['retried']:>6,} retried  "
+          f"{summary['batches']:>6,} calls {summary['writes']:>6,} writes  "
+          f"lag p50/p95/p99 {summary['lag_p50_s']:.2f} / {summary['lag_p95_s']:.2f} / {summary['lag_p99_s']:.2f} s")
+
+
+def produce(rate, seconds, first_reservation, stop):
+    """Queue ``rate`` payments a minute, in small batches, until ``stop`` is set."""
+    interval = 0.1
+    per_tick = rate / 60 * interval
+    reservation_id, owed = first_reservation, 0.0
+    deadline = time.monotonic() + seconds
+    while not stop.is_set() and time.monotonic() < deadline:
+        owed += per_tick
+        with db.connection() as conn:
+            cursor = conn.cursor()
+            for _ in range(int(owed)):
+                payments.enqueue_payment(cursor, reservation_id, 100)
+                reservation_id += 1
+            conn.commit()
+        owed -= int(owed)
+        time.sleep(interval)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--reservations", type=int, default=50000, help="payments in the backlog")
+    parser.add_argument("--latency-ms", type=float, default=50.0, help="gateway round trip")
+    parser.add_argument("--workers", type=int, default=payments.SETTLE_WORKERS)
+    parser.add_argument("--batch-size", type=int, default=payments.SETTLE_BATCH)
+    parser.add_argument("--baseline-seconds", type=float, default=5.0)
+    parser.add_argument("--rate", type=float, default=6000.0, help="steady phase: payments queued a minute")
+    parser.add_argument("--seconds", type=float, default=30.0, help="length of the steady phase")
+    parser.add_argument("--seed", type=int, default=3)
+    args = parser.parse_args()
+
+    def gateway():
+        return payments.SimulatedGateway(latency=args.latency_ms / 1000, seed=args.seed)
+
+    with tempfile.TemporaryDirectory() as folder:
+        path = os.path.join(folder, "payments.db")
+        conn = db.sqlite_connect(path)
+        create_schema(conn, "app", "sqlite")
+        fill_app_schema(conn, 1000, 200, args.reservations, args.seed)
+        migrate(conn, "app", pause=0)
+        conn.close()
+        db.use_backend(db.SQLiteBackend(path), size=4)
+        queued = payments.enqueue_unpaid("app", since=date(1900, 1, 1))
+        print(f"{queued:,} payments queued, gateway round trip {args.latency_ms:.0f} ms")
+
+        baseline = payments.PaymentPipeline(gateway(), batch_size=1, workers=1)
+        report("one by one", baseline.run(args.baseline_seconds))
+        report("pipeline", payments.PaymentPipeline(gateway(), batch_size=args.batch_size,
+                                                   workers=args.workers).run())
+
+        stop = threading.Event()
+        producer = threading.Thread(target=produce, args=(args.rate, args.seconds, 10 ** 9, stop))
+        producer.start()
+        try:
+            pipeline = payments.PaymentPipeline(gateway(), batch_size=args.batch_size, workers=args.workers)
+            report("steady", pipeline.run(args.seconds))
+        finally:
+            stop.set()
+            producer.join()
+        print(payments.settlement_status("app"))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+"""Benchmark pricing every free car of a search.
+
+Fills a rental-schema SQLite file with ``datagen``, then runs random
+searches (dates, office, sometimes a one-way return) and prices every free
+car two ways: one rate query and one day-by-day factor loop per car, and
+``pricing.search_quotes`` (cached rate table, memoized running sums, one
+span per search).  The totals are checked to agree.
+
+    python benchmarks/bench_pricing.py --cars 20000 --searches 200
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+from datetime import date, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import db  # noqa: E402
+import pricing  # noqa: E402
+from availability import load_rental_schema  # noqa: E402
+from datagen import fill_rental_schema  # noqa: E402
+from schema import create_schema  # noqa: E402
+
+
+def per_car(index, rules, pick_up, return_time, office_id, return_office):
+    """Price the free cars one at a time, without precomputed tables."""
+    start, days = pricing.rental_span(pick_up, return_time)
+    quotes = []
+    with db.connection() as conn:
+        cursor = conn.cursor()
+        for car_id in index.free_cars(pick_up, return_time, office_id):
+            cursor.execute("SELECT DailyRentalRate, OfficeID FROM Car WHERE CarID = %s", (car_id,))
+            rate, car_office = cursor.fetchone()
+            factors = sum(rules.day_factor(start + timedelta(days=i)) for i in range(days))
+            one_way = rules.one_way(car_office, car_office if return_office is None else return_office)
+            quotes.append((car_id, round(float(rate) * factors + one_way, 2)))
+    return quotes
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--offices", type=int, default=20)
+    parser.add_argument("--cars", type=int, default=20000)
+    parser.add_argument("--reservations", type=int, default=200000)
+    parser.add_argument("--searches", type=int, default=200)
+    parser.add_argument("--seed", type=int, default=3)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as folder:
+        path = os.path.join(folder, "pricing.db")
+        conn = db.sqlite_connect(path)
+        create_schema(conn, "rental", "sqlite")
+        fill_rental_schema(conn, args.offices, max(1000, args.cars // 2), args.cars, args.reservations, args.seed)
+        conn.close()
+        db.use_backend(db.SQLiteBackend(path), size=1, prepare=False)
+        with db.connection() as conn:
+            index = load_rental_schema(conn.cursor())
+
+        rng = random.Random(args.seed)
+        searches = []
+        for _ in range(args.searches):
+            start = date.today() + timedelta(days=rng.randint(0, 400))
+            end = start + timedelta(days=rng.randint(1, 21))
+            office = rng.randint(1, args.offices) if rng.random() < 0.7 else None
+            return_office = rng.randint(1, args.offices) if rng.random() < 0.2 else None
+            searches.append((start.isoformat(), end.isoformat(), office, return_office))
+
+        rules = pricing.get_engine().rules
+        timings = {"per car": [], "engine": []}
+        priced = mismatches = 0
+        for pick_up, return_time, office, return_office in searches:
+            started = time.perf_counter()
+            slow = per_car(index, rules, pick_up, return_time, office, return_office)
+            timings["per car"].append(time.perf_counter() - started)
+            started = time.perf_counter()
+            fast = pricing.search_quotes(pick_up, return_time, office, return_office, "rental", index)
+            timings["engine"].append(time.perf_counter() - started)
+            priced += len(fast)
+            fast_totals = {quote.car_id: quote.total for quote in fast}
+            mismatches += sum(1 for car_id, total in slow if abs(fast_totals.get(car_id, -1) - total) > 0.011)
+
+    print(f"{args.searches} searches, {priced / args.searches:,.0f} free cars priced per search on average")
+    for label, samples in timings.items():
+        samples.sort()
+        print(f"{label:<10} p50 {statistics.median(samples) * 1000:8.2f} ms   "
+              f"p95 {samples[int(len(samples) * 0.95)] * 1000:8.2f} ms   "
+              f"{priced / sum(samples):12,.0f} quotes/s")
+    print(f"total mismatches: {mismatches}")
+
+
+if __name__ == "__main__":
+    main()
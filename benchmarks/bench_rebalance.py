@@ -0,0 +1,86 @@
+"""Benchmark the rebalancing planner on a synthetic office network.
+
+Every car is rented back to back over the horizon, starting from its
+office; a share of the rentals are one-way, and one-way returns favour a
+few "holiday" offices, so the others drain.  The planner is timed on the
+whole network (projection, shortages and transfers), best of ``--runs``.
+With ``--db`` the rental schema of a SQLite file is loaded and planned
+instead.
+
+    python benchmarks/bench_rebalance.py --offices 300 --cars 5000 --days 90
+    python benchmarks/bench_rebalance.py --db rental.db
+"""
+import argparse
+import os
+import random
+import sys
+import time
+from datetime import date
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import db  # noqa: E402
+import rebalance  # noqa: E402
+
+
+def synthetic_network(offices, cars, days, one_way, seed):
+    rng = random.Random(seed)
+    magnets = rng.sample(range(offices), max(1, offices // 20))
+    pickup, dropoff, start, end = [], [], [], []
+    based = np.zeros(offices, dtype=np.int64)
+    for _ in range(cars):
+        office = rng.randrange(offices)
+        based[office] += 1
+        day = rng.randint(-3, 5)
+        while day < days:
+            length = rng.randint(1, 7)
+            target = office
+            if rng.random() < one_way:
+                target = rng.choice(magnets) if rng.random() < 0.6 else rng.randrange(offices)
+            pickup.append(office)
+            dropoff.append(target)
+            start.append(day)
+            end.append(day + length)
+            office = target
+            day += length + rng.randint(0, 3)
+    columns = (np.array(column, dtype=np.int64) for column in (pickup, dropoff, start, end))
+    return rebalance.Network(date.today(), days, np.arange(1, offices + 1), [f"Office {i}" for i in range(1, offices + 1)],
+                             based, *columns)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--offices", type=int, default=300)
+    parser.add_argument("--cars", type=int, default=5000)
+    parser.add_argument("--days", type=int, default=rebalance.REBALANCE_HORIZON)
+    parser.add_argument("--one-way", type=float, default=0.15, help="share of one-way rentals")
+    parser.add_argument("--min-stock", type=int, default=rebalance.MIN_STOCK)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--db", help="plan the rental schema of this SQLite file instead")
+    parser.add_argument("--seed", type=int, default=9)
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    if args.db:
+        db.use_backend(db.SQLiteBackend(args.db), size=1, prepare=False)
+        network = rebalance.load_network(days=args.days)
+    else:
+        network = synthetic_network(args.offices, args.cars, args.days, args.one_way, args.seed)
+    print(f"{len(network.office_ids):,} offices, {int(network.based.sum()):,} cars, {len(network):,} rentals, "
+          f"{args.days} days (built in {time.perf_counter() - started:.2f}s)")
+
+    timings = []
+    for _ in range(args.runs):
+        result = rebalance.plan(network, args.min_stock)
+        timings.append(result.seconds)
+    short_after = len(rebalance.find_shortages(result.after, args.min_stock))
+    print(f"plan: best {min(timings) * 1000:.1f} ms, worst {max(timings) * 1000:.1f} ms")
+    print(f"{len(result.shortages)} offices short, {result.moves():,} cars moved in {len(result.transfers):,} "
+          f"transfers, {short_after} offices still short, "
+          f"{sum(cars for _, _, cars in result.unresolved):,} car-shortfalls unresolved")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,172 @@
+"""Benchmark customer registration: check-then-insert against the single insert.
+
+Fills an app-schema SQLite file with ``datagen`` customers, then registers
+a stream of customers of which ``--duplicates`` reuse a registered email or
+phone, half each, two ways:
+
+* before - ``SELECT`` by email, then ``INSERT`` (the old ``add_customer``);
+  a reused phone only fails at the insert, as a raw database error;
+* after  - ``rentals.add_customer``: the Bloom filter answers for new
+  customers, the unique keys decide, duplicates become ``RentalError``.
+
+Then times the duplicate check alone: a lookup per key against the filter.
+Both are run on the local file and again with ``--round-trip-ms`` added to
+every statement and commit, as a database server across a network costs.
+
+    python benchmarks/bench_registration.py --customers 200000 --registrations 5000
+"""
+import argparse
+import hashlib
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import db  # noqa: E402
+import rentals  # noqa: E402
+from counters import bump, ensure_counters  # noqa: E402
+from datagen import fill_app_schema  # noqa: E402
+from journal import ensure_journal, record_change  # noqa: E402
+from migrations import migrate  # noqa: E402
+from schema import create_schema  # noqa: E402
+
+
+class RemoteCursor(db.SQLiteCursor):
+    def __init__(self, raw, round_trip):
+        super().__init__(raw)
+        self.round_trip = round_trip
+
+    def execute(self, query, params=()):
+        time.sleep(self.round_trip)
+        return super().execute(query, params)
+
+
+class RemoteConnection(db.SQLiteConnection):
+    """A SQLite connection that waits one round trip per statement and commit."""
+
+    def __init__(self, raw, round_trip):
+        super().__init__(raw)
+        self.round_trip = round_trip
+
+    def cursor(self):
+        return RemoteCursor(self._raw.cursor(), self.round_trip)
+
+    def commit(self):
+        time.sleep(self.round_trip)
+        self._raw.commit()
+
+
+class RemoteBackend(db.SQLiteBackend):
+    def __init__(self, path, round_trip):
+        super().__init__(path)
+        self.round_trip = round_trip
+
+    def connect(self):
+        return RemoteConnection(super().connect()._raw, self.round_trip)
+
+
+def check_then_insert(name, phone, email_hash, country):
+    """The registration path before the single insert."""
+    with db.connection() as conn:
+        ensure_counters(conn)
+        ensure_journal(conn)
+        cursor = conn.cursor()
+        cursor.execute("SELECT id FROM customers WHERE email = %s", (email_hash,))
+        if cursor.fetchone():
+            raise rentals.RentalError("Email already exists. Please use a different email.")
+        cursor.execute("INSERT INTO customers (name, phone, email, country) VALUES (%s, %s, %s, %s)",
+                       (name, phone, email_hash, country))
+        customer_id = cursor.lastrowid
+        bump(cursor, "customers")
+        record_change(cursor, "customers", customer_id, "insert")
+        conn.commit()
+        return customer_id
+
+
+def registrations(count, duplicates, existing, tag, rng):
+    stream = []
+    for i in range(count):
+        email = hashlib.md5(f"{tag}-{i}@example.com".encode()).hexdigest()
+        phone = f"+7{tag}{i:08d}"
+        if rng.random() < duplicates:
+            taken_phone, taken_email = rng.choice(existing)
+            if i % 2:
+                phone = taken_phone
+            else:
+                email = taken_email
+        stream.append((f"Bench {i}", phone, email, "Egypt"))
+    return stream
+
+
+def run(label, register, stream):
+    outcomes = {"registered": 0, "clear message": 0, "raw database error": 0}
+    started = time.perf_counter()
+    for customer in stream:
+        try:
+            register(*customer)
+            outcomes["registered"] += 1
+        except rentals.RentalError:
+            outcomes["clear message"] += 1
+        except db.database_errors():
+            outcomes["raw database error"] += 1
+    elapsed = time.perf_counter() - started
+    print(f"{label:<10}{len(stream) / elapsed:10,.0f} registrations/s   "
+          + ", ".join(f"{name}: {count:,}" for name, count in outcomes.items()))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--customers", type=int, default=200000)
+    parser.add_argument("--registrations", type=int, default=5000)
+    parser.add_argument("--duplicates", type=float, default=0.2, help="share of registrations reusing a key")
+    parser.add_argument("--round-trip-ms", type=float, default=0.3, help="simulated network round trip")
+    parser.add_argument("--seed", type=int, default=5)
+    args = parser.parse_args()
+    rng = random.Random(args.seed)
+
+    with tempfile.TemporaryDirectory() as folder:
+        path = os.path.join(folder, "registration.db")
+        conn = db.sqlite_connect(path)
+        create_schema(conn, "app", "sqlite")
+        fill_app_schema(conn, args.customers, 100, 0, args.seed)
+        migrate(conn, "app", pause=0)
+        conn.close()
+        db.use_backend(db.SQLiteBackend(path), size=2)
+        existing = db.fetch_all("SELECT phone, email FROM customers")
+
+        started = time.perf_counter()
+        bloom = rentals.customer_filter()
+        print(f"filter: {len(bloom):,} keys in {len(bloom.bits) / 1e6:.1f} MB, "
+              f"loaded in {time.perf_counter() - started:.2f}s")
+
+        for tag, round_trip in enumerate((0, args.round_trip_ms)):
+            print(f"{round_trip} ms per round trip:")
+            if round_trip:
+                db.use_backend(RemoteBackend(path, round_trip / 1000), size=2)
+                rentals.customer_filter()
+            stream = registrations(args.registrations, args.duplicates, existing, 2 * tag + 1, rng)
+            run("  before", check_then_insert, stream)
+            stream = registrations(args.registrations, args.duplicates, existing, 2 * tag + 2, rng)
+            run("  after", rentals.add_customer, stream)
+
+        db.use_backend(db.SQLiteBackend(path), size=2)
+        probes = [hashlib.md5(f"probe-{i}".encode()).hexdigest() for i in range(args.registrations)]
+        started = time.perf_counter()
+        with db.connection() as conn:
+            cursor = conn.cursor()
+            for email_hash in probes:
+                cursor.execute("SELECT 1 FROM customers WHERE email = %s LIMIT 1", (email_hash,))
+                cursor.fetchall()
+        lookups = time.perf_counter() - started
+        started = time.perf_counter()
+        maybes = sum(1 for email_hash in probes if f"email:{email_hash}" in bloom)
+        filtered = time.perf_counter() - started
+    print(f"new-email checks: database {len(probes) / lookups:10,.0f}/s, "
+          f"filter {len(probes) / filtered:10,.0f}/s ({maybes / len(probes):.2%} still looked up)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,119 @@
+"""Benchmark start-up: module import, welcome image and time to first frame.
+
+Every measurement runs in a fresh interpreter, repeated and reported as
+the median, so module caches of earlier runs do not flatter the numbers.
+
+* import      - importing the launcher, and whether the MySQL driver or
+                Pillow were loaded by it (they should not be);
+* image       - the old path (Pillow decode and scale on every launch)
+                against a cold and a warm ``startup`` cache;
+* first frame - from interpreter start to the welcome window being drawn
+                (needs a display).
+
+    python benchmarks/bench_startup.py --runs 7
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+LAUNCHERS = ["Untitled-1.py", "database project.py"]
+IMAGE = os.path.join(ROOT, "Car-symbols.jpg")
+
+LOAD_LAUNCHER = """
+import importlib.util
+spec = importlib.util.spec_from_file_location("launcher", {path!r})
+launcher = importlib.util.module_from_spec(spec)
+spec.loader.exec_module(launcher)
+"""
+
+IMPORT_PROBE = """
+import json, sys, time
+started = time.perf_counter()
+{load}
+print(json.dumps({{"seconds": time.perf_counter() - started,
+                  "mysql": "mysql.connector" in sys.modules, "pil": "PIL" in sys.modules}}))
+"""
+
+LEGACY_IMAGE_PROBE = """
+import json, time
+started = time.perf_counter()
+from PIL import Image
+image = Image.open({image!r}).resize((2000, 1000))
+image.load()
+print(json.dumps({{"seconds": time.perf_counter() - started}}))
+"""
+
+CACHED_IMAGE_PROBE = """
+import json, time
+started = time.perf_counter()
+import startup
+path = startup.prepare_image({image!r}, (2000, 1000), (600, 400))
+print(json.dumps({{"seconds": time.perf_counter() - started}}))
+"""
+
+FIRST_FRAME_PROBE = """
+import json, time
+started = time.perf_counter()
+{load}
+root = launcher.build_welcome_page()
+root.update()
+elapsed = time.perf_counter() - started
+root.destroy()
+print(json.dumps({{"seconds": elapsed}}))
+"""
+
+
+def probe(code, env):
+    """Run ``code`` in a fresh interpreter and return its JSON result, or the error text."""
+    result = subprocess.run([sys.executable, "-c", code], cwd=ROOT, env=env, capture_output=True, text=True)
+    if result.returncode:
+        lines = result.stderr.strip().splitlines()
+        return {"error": lines[-1] if lines else f"exit status {result.returncode}"}
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def measure(label, code, env, runs):
+    samples = [probe(code, env) for _ in range(runs)]
+    errors = [sample["error"] for sample in samples if "error" in sample]
+    if errors:
+        print(f"{label:<44}skipped: {errors[0]}")
+        return None
+    median = statistics.median(sample["seconds"] for sample in samples)
+    loaded = [module for module in ("mysql", "pil") if samples[0].get(module)]
+    note = f"  (imported {', '.join(loaded)})" if loaded else ""
+    print(f"{label:<44}{median * 1000:9.1f} ms{note}")
+    return median
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=5)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as cache_dir:
+        env = dict(os.environ, CAR_RENTAL_CACHE_DIR=cache_dir,
+                   PYTHONPATH=os.pathsep.join(filter(None, [ROOT, os.environ.get("PYTHONPATH")])))
+        for name in LAUNCHERS:
+            load = LOAD_LAUNCHER.format(path=os.path.join(ROOT, name))
+            measure(f"import {name}", IMPORT_PROBE.format(load=load), env, args.runs)
+
+        measure("image: Pillow decode + scale (old)", LEGACY_IMAGE_PROBE.format(image=IMAGE), env, args.runs)
+        cold = probe(CACHED_IMAGE_PROBE.format(image=IMAGE), env)  # fills the cache
+        if "error" in cold:
+            print(f"{'image: cold cache':<44}skipped: {cold['error']}")
+        else:
+            print(f"{'image: cold cache':<44}{cold['seconds'] * 1000:9.1f} ms")
+        measure("image: warm cache", CACHED_IMAGE_PROBE.format(image=IMAGE), env, args.runs)
+
+        for name in LAUNCHERS:
+            load = LOAD_LAUNCHER.format(path=os.path.join(ROOT, name))
+            measure(f"first frame {name}", FIRST_FRAME_PROBE.format(load=load), env, args.runs)
+
+
+if __name__ == "__main__":
+    main()
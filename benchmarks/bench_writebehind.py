@@ -0,0 +1,115 @@
+"""Benchmark write-behind status updates against one transaction per change.
+
+Fills an app-schema SQLite file with ``datagen`` rows and replays a shift
+change: ``--clerks`` threads log ``--changes`` status changes between them,
+spread over ``--rentals`` car/customer pairs, so some pairs are touched
+more than once (picked up, then returned).  The same changes are logged:
+
+* direct       - ``rentals.set_reservation_status``, a transaction each;
+* write-behind - ``StatusBuffer.submit`` (spool append and fsync), with the
+  buffer flushing in batches; timed until the last change is committed.
+
+With ``--durable`` SQLite syncs every commit to disk, as a MySQL server
+does by default; without it a commit is nearly free and the comparison
+flatters the direct path.
+
+Reported: changes per second, commits, flush sizes and the lag from a
+change's first submit to its commit.
+
+    python benchmarks/bench_writebehind.py --changes 5000 --clerks 8 --durable
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import db  # noqa: E402
+import rentals  # noqa: E402
+import writebehind  # noqa: E402
+from datagen import fill_app_schema  # noqa: E402
+from run import percentile  # noqa: E402
+from schema import create_schema  # noqa: E402
+
+
+def shift_change(changes, rentals_count, cars, customers, seed):
+    """Status changes in logging order: each pair is picked up first, some come back later in the shift."""
+    rng = random.Random(seed)
+    pairs = [(rng.randint(1, cars), rng.randint(1, customers)) for _ in range(rentals_count)]
+    logged = []
+    for _ in range(changes):
+        car_id, customer_id = rng.choice(pairs)
+        status = rng.choice(("rented", "rented", "late", "returned"))
+        logged.append((car_id, customer_id, status, "2026-01-15" if status == "returned" else None))
+    return logged
+
+
+def run_clerks(log, clerks, submit):
+    """Split ``log`` between ``clerks`` threads calling ``submit`` on each change; return the seconds."""
+    shares = [log[i::clerks] for i in range(clerks)]
+    threads = [threading.Thread(target=lambda share=share: [submit(*change) for change in share])
+               for share in shares]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return time.perf_counter() - started
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--changes", type=int, default=5000)
+    parser.add_argument("--rentals", type=int, default=2000, help="car/customer pairs the changes touch")
+    parser.add_argument("--clerks", type=int, default=8)
+    parser.add_argument("--flush-size", type=int, default=writebehind.FLUSH_SIZE)
+    parser.add_argument("--flush-interval", type=float, default=writebehind.FLUSH_INTERVAL)
+    parser.add_argument("--no-sync", action="store_true", help="skip the fsync of spool appends")
+    parser.add_argument("--durable", action="store_true",
+                        help="SQLite synchronous=FULL: every commit waits for the disk, as on a MySQL server")
+    parser.add_argument("--seed", type=int, default=11)
+    args = parser.parse_args()
+
+    log = shift_change(args.changes, args.rentals, 1000, 1000, args.seed)
+    with tempfile.TemporaryDirectory() as folder:
+        for mode in ("direct", "write-behind"):
+            path = os.path.join(folder, f"{mode}.db")
+            conn = db.sqlite_connect(path)
+            create_schema(conn, "app", "sqlite")
+            fill_app_schema(conn, 1000, 1000, 10000, args.seed)
+            conn.close()
+            pragmas = dict(db.SQLITE_PRAGMAS, synchronous="FULL") if args.durable else None
+            db.use_backend(db.SQLiteBackend(path, pragmas), size=args.clerks)
+
+            if mode == "direct":
+                seconds = run_clerks(log, args.clerks, rentals.set_reservation_status)
+                print(f"{mode:<13}{len(log) / seconds:>10,.0f} changes/s  {len(log):>6,} commits")
+                continue
+
+            lags = []
+
+            def writer(changes, batch):
+                rentals.apply_status_changes(changes, batch)
+                now = time.time()
+                lags.extend(now - change.first_at for change in changes)
+
+            buffer = writebehind.StatusBuffer(os.path.join(folder, "status.spool"), writer, args.flush_size,
+                                              args.flush_interval, sync=not args.no_sync)
+            started = time.perf_counter()
+            submitted = run_clerks(log, args.clerks, buffer.submit)
+            buffer.close()
+            seconds = time.perf_counter() - started
+            stats = buffer.snapshot()
+            lags.sort()
+            print(f"{mode:<13}{len(log) / seconds:>10,.0f} changes/s  {stats['flushes']:>6,} commits  "
+                  f"(submits alone {len(log) / submitted:,.0f}/s; {stats['coalesced']:,} coalesced; "
+                  f"flush mean {stats['mean_flush']:.0f}, max {stats['largest_flush']}; "
+                  f"lag p50 {percentile(lags, 0.5) * 1000:.0f} ms, p95 {percentile(lags, 0.95) * 1000:.0f} ms)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,363 @@
+"""Multi-user load test of the booking flows, without the Tk windows.
+
+Virtual users call the business logic behind the screens'
+``register_customer``, ``register_car``, ``get_car_status`` and
+``update_car_reservation_status`` (validation included) in a weighted mix,
+with an optional think time between actions.  The load ramps up in stages,
+one per ``--users`` value; each stage reports throughput, latency
+percentiles, lock waits and error rates, and the ramp stops early once a
+stage breaks ``--max-p95-ms`` or ``--max-error-rate``.
+
+Users are threads; ``--processes`` spreads them over processes, like
+clerks on separate machines (each with its own pool and availability
+index).  Lock waits are the ``BEGIN IMMEDIATE`` waits on SQLite and the
+server's InnoDB row lock waits on MySQL; pool waits and retried deadlocks
+are counted as well.  The run ends with a JSON summary, saved under
+``benchmarks/results/`` and printed with ``--json``:
+
+    python benchmarks/load_test.py --users 1 2 4 8 16 --stage-seconds 20
+    python benchmarks/load_test.py --db car_rental.db --processes 4 --users 4 8 16 32
+    python benchmarks/load_test.py --mysql --think-ms 500 --users 10 20 40 80 --json
+"""
+import argparse
+import contextlib
+import json
+import multiprocessing
+import os
+import platform
+import random
+import sys
+import tempfile
+import threading
+import time
+from datetime import date, datetime, timedelta
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import availability  # noqa: E402
+import db  # noqa: E402
+import metrics  # noqa: E402
+import rentals  # noqa: E402
+from datagen import COLORS, MODELS, fill_app_schema  # noqa: E402
+from migrations import migrate  # noqa: E402
+from run import RESULTS_DIR, percentile  # noqa: E402
+from schema import create_schema  # noqa: E402
+
+FLOWS = ("register_customer", "register_car", "get_car_status", "update_car_reservation_status")
+DEFAULT_MIX = "register_customer=1,register_car=1,get_car_status=6,update_car_reservation_status=2"
+STATUSES = ("reserved", "rented", "returned")
+LOCK_WAIT_BOUND = "0.001"  # BEGIN IMMEDIATE slower than this (seconds) counts as a wait
+
+
+def parse_mix(text):
+    """``"flow=weight,..."`` -> ``{flow: weight}``."""
+    mix = {}
+    for part in text.split(","):
+        flow, _, weight = part.partition("=")
+        if flow.strip() not in FLOWS:
+            raise argparse.ArgumentTypeError(f"unknown flow {flow.strip()!r}; choose from {', '.join(FLOWS)}")
+        mix[flow.strip()] = float(weight or 1)
+    return mix
+
+
+class VirtualUser:
+    """One clerk: registers customers and cars and works on a shared hot fleet."""
+
+    def __init__(self, seed, fleet, max_customer, think):
+        self.rng = random.Random(seed)
+        self.tag = f"{time.time_ns() % 10 ** 9}{seed:04d}"
+        self.sequence = 0
+        self.fleet = fleet
+        self.max_customer = max_customer
+        self.think = think
+        self.customers = []
+
+    def unique(self):
+        self.sequence += 1
+        return f"{self.tag}{self.sequence:06d}"
+
+    def customer_id(self):
+        if self.customers and self.rng.random() < 0.5:
+            return self.rng.choice(self.customers)
+        return self.rng.randint(1, self.max_customer)
+
+    def register_customer(self):
+        tag = self.unique()
+        email_hash = rentals.validate_and_hash_email(f"load-{tag}@example.com")
+        self.customers.append(rentals.add_customer(f"Load {tag}", f"+8{tag}", email_hash, "Egypt"))
+
+    def register_car(self):
+        name = self.rng.choice(MODELS)[0]
+        model_year, color = self.rng.randint(2000, 2024), self.rng.choice(COLORS)
+        days = self.rng.randint(1, 10)
+        pick_up = date.today() + timedelta(days=self.rng.randint(1, 90))
+        pick_up, return_time = pick_up.isoformat(), (pick_up + timedelta(days=days)).isoformat()
+        rentals.check_dates(pick_up, return_time)
+        car_id, _ = rentals.add_car_with_reservation(name, model_year, color, days, pick_up, return_time,
+                                                     "", self.customer_id())  # empty payment: quoted
+        self.fleet.append((car_id, name, model_year, color))
+
+    def get_car_status(self):
+        _, name, model_year, color = self.rng.choice(self.fleet)
+        car = rentals.find_car(name, model_year, color)
+        if car:
+            rentals.get_car_status(car[0])
+
+    def update_car_reservation_status(self):
+        car_id = self.rng.choice(self.fleet)[0]
+        status = self.rng.choice(STATUSES)
+        return_date = date.today().isoformat() if status == "returned" else None
+        rentals.set_reservation_status(car_id, self.customer_id(), status, return_date)
+
+    def run(self, flows, weights, deadline, samples):
+        while time.perf_counter() < deadline:
+            flow = self.rng.choices(flows, weights)[0]
+            started = time.perf_counter()
+            try:
+                getattr(self, flow)()
+                outcome = "ok"
+            except (rentals.RentalError, ValueError):
+                outcome = "rejected"  # shown to the clerk as a message, not a failure
+            except db.PoolExhausted:
+                outcome = "pool"
+            except db.database_errors():
+                outcome = "database"
+            except Exception:
+                outcome = "other"
+            samples.append((flow, outcome, time.perf_counter() - started))
+            if self.think:
+                time.sleep(self.rng.expovariate(1 / self.think))
+
+
+def configure(args, users):
+    metrics.configure(slow_query_ms=60000)  # waits are measured here, not logged
+    backend = db.MySQLBackend() if args.mysql else db.SQLiteBackend(args.db)
+    db.use_backend(backend, size=max(1, users))
+
+
+def lock_wait_stats():
+    """``(waits, seconds)`` spent in ``BEGIN IMMEDIATE`` by this process so far."""
+    latency = metrics.get_metrics().snapshot()["statements"].get("BEGIN IMMEDIATE")
+    if latency is None:
+        return 0, 0.0
+    latency = latency["latency"]
+    return latency["count"] - latency["buckets"][LOCK_WAIT_BOUND], latency["sum_seconds"]
+
+
+def run_users(args, users, seed, seconds):
+    """Run ``users`` virtual users in this process; return their samples and counters."""
+    fleet = [tuple(row) for row in db.fetch_all(
+        "SELECT id, name, model_year, color FROM cars ORDER BY id DESC LIMIT %s", (args.hot_cars,))]
+    if not fleet:
+        raise SystemExit("The database has no cars; fill it with datagen.py first.")
+    max_customer = db.fetch_all("SELECT MAX(id) FROM customers")[0][0] or 1
+    flows, weights = list(args.mix), list(args.mix.values())
+    think = args.think_ms / 1000
+
+    waits, wait_time = lock_wait_stats()
+    pool = db.pool_stats()
+    retries = rentals.retry_stats["retries"]
+    samples = []
+    started = time.perf_counter()
+    deadline = started + seconds
+    threads = [threading.Thread(target=VirtualUser(seed * 1000 + i, fleet, max_customer, think).run,
+                                args=(flows, weights, deadline, samples))
+               for i in range(users)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+    after_waits, after_wait_time = lock_wait_stats()
+    after_pool = db.pool_stats()
+    return {
+        "samples": samples,
+        "seconds": elapsed,
+        "lock_waits": after_waits - waits,
+        "lock_wait_s": after_wait_time - wait_time,
+        "pool_waits": after_pool["waits"] - pool["waits"],
+        "pool_wait_s": after_pool["wait_time"] - pool["wait_time"],
+        "retries": rentals.retry_stats["retries"] - retries,
+    }
+
+
+def process_main(args, users, seed, seconds, barrier, queue):
+    configure(args, users)
+    availability.get_index()  # loaded before the clock starts, as at application start-up
+    barrier.wait()
+    queue.put(run_users(args, users, seed, seconds))
+
+
+def innodb_lock_waits():
+    """``(waits, seconds)`` of row lock waits on the MySQL server, since it started.
+
+    Read on a connection of its own: the pool is closed while user processes run.
+    """
+    conn = db.MySQLBackend().connect()
+    try:
+        cursor = conn.cursor()
+        cursor.execute("SHOW GLOBAL STATUS WHERE Variable_name IN "
+                       "('Innodb_row_lock_waits', 'Innodb_row_lock_time')")
+        rows = dict(cursor.fetchall())
+    finally:
+        conn.close()
+    return int(rows.get("Innodb_row_lock_waits", 0)), int(rows.get("Innodb_row_lock_time", 0)) / 1000
+
+
+def run_stage(args, users, stage):
+    """Run one stage with ``users`` users; return the per-process results."""
+    if args.processes == 1:
+        return [run_users(args, users, stage * 100 + 1, args.stage_seconds)]
+    shares = [users // args.processes + (i < users % args.processes) for i in range(args.processes)]
+    shares = [share for share in shares if share]
+    barrier = multiprocessing.Barrier(len(shares))
+    queue = multiprocessing.Queue()
+    processes = [multiprocessing.Process(target=process_main,
+                                         args=(args, share, stage * 100 + i + 1, args.stage_seconds,
+                                               barrier, queue))
+                 for i, share in enumerate(shares)]
+    for process in processes:
+        process.start()
+    results = [queue.get() for _ in processes]
+    for process in processes:
+        process.join()
+    return results
+
+
+def summarize_stage(users, results, server_waits=None):
+    """Combine the processes' results; ``server_waits`` replaces the measured lock waits."""
+    seconds = max(result["seconds"] for result in results)
+    samples = [sample for result in results for sample in result["samples"]]
+    outcomes = {"ok": 0, "rejected": 0, "database": 0, "pool": 0, "other": 0}
+    for _, outcome, _ in samples:
+        outcomes[outcome] += 1
+    latencies = sorted(latency for _, _, latency in samples)
+    busy = sum(latencies)
+    lock_waits = sum(result["lock_waits"] for result in results)
+    lock_wait_s = sum(result["lock_wait_s"] for result in results)
+    if server_waits is not None:
+        lock_waits, lock_wait_s = server_waits
+    failures = outcomes["database"] + outcomes["pool"] + outcomes["other"]
+    flows = {}
+    for flow in FLOWS:
+        flow_latencies = sorted(latency for name, _, latency in samples if name == flow)
+        if flow_latencies:
+            flows[flow] = {
+                "count": len(flow_latencies),
+                "failures": sum(1 for name, outcome, _ in samples
+                                if name == flow and outcome not in ("ok", "rejected")),
+                "p50_ms": percentile(flow_latencies, 0.50) * 1000,
+                "p95_ms": percentile(flow_latencies, 0.95) * 1000,
+                "p99_ms": percentile(flow_latencies, 0.99) * 1000,
+            }
+    return {
+        "users": users,
+        "seconds": seconds,
+        "operations": len(samples),
+        "throughput_per_s": len(samples) / seconds,
+        "p50_ms": percentile(latencies, 0.50) * 1000,
+        "p95_ms": percentile(latencies, 0.95) * 1000,
+        "p99_ms": percentile(latencies, 0.99) * 1000,
+        "max_ms": latencies[-1] * 1000 if latencies else 0.0,
+        "outcomes": outcomes,
+        "error_rate": failures / len(samples) if samples else 0.0,
+        "rejected_rate": outcomes["rejected"] / len(samples) if samples else 0.0,
+        "lock_waits": lock_waits,
+        "lock_wait_ms": lock_wait_s * 1000,
+        "lock_wait_share": lock_wait_s / busy if busy else 0.0,
+        "pool_waits": sum(result["pool_waits"] for result in results),
+        "pool_wait_ms": sum(result["pool_wait_s"] for result in results) * 1000,
+        "retries": sum(result["retries"] for result in results),
+        "flows": flows,
+    }
+
+
+def create_database(path, args):
+    conn = db.sqlite_connect(path)
+    create_schema(conn, "app", "sqlite")
+    with contextlib.redirect_stdout(sys.stderr):  # stdout is kept for the JSON summary
+        fill_app_schema(conn, args.customers, args.cars, args.reservations, args.seed)
+    migrate(conn, "app", pause=0)
+    conn.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--db", help="SQLite file (default: a temporary one filled by datagen)")
+    parser.add_argument("--mysql", action="store_true", help="use the MySQL server in db.DB_CONFIG")
+    parser.add_argument("--users", type=int, nargs="+", default=[1, 2, 4, 8, 16], help="users per stage")
+    parser.add_argument("--stage-seconds", type=float, default=10.0)
+    parser.add_argument("--processes", type=int, default=1, help="processes the users are spread over")
+    parser.add_argument("--think-ms", type=float, default=0.0, help="mean pause between a user's actions")
+    parser.add_argument("--mix", type=parse_mix, default=DEFAULT_MIX, help=f"flow weights (default {DEFAULT_MIX})")
+    parser.add_argument("--hot-cars", type=int, default=200, help="newest cars the users look up and update")
+    parser.add_argument("--max-p95-ms", type=float, help="stop the ramp after a stage with a slower p95")
+    parser.add_argument("--max-error-rate", type=float, default=0.01, help="stop the ramp above this error rate")
+    parser.add_argument("--customers", type=int, default=20000, help="rows for the temporary database")
+    parser.add_argument("--cars", type=int, default=2000)
+    parser.add_argument("--reservations", type=int, default=50000)
+    parser.add_argument("--seed", type=int, default=11)
+    parser.add_argument("--json", action="store_true", help="print the summary as JSON at the end")
+    parser.add_argument("--no-save", action="store_true", help="do not store this run")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as folder:
+        if not args.mysql and not args.db:
+            args.db = os.path.join(folder, "load.db")
+            create_database(args.db, args)
+        configure(args, max(args.users) if args.processes == 1 else 1)
+        target = repr(db.get_backend())
+        if args.processes == 1:
+            availability.get_index()
+        else:
+            db.get_pool().close()  # the user processes open their own
+
+        print(f"{'users':>6}{'ops/s':>10}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}"
+              f"{'errors':>9}{'rejected':>10}{'lock waits':>12}{'lock ms':>10}{'retries':>9}", file=sys.stderr)
+        stages, capacity, stopped = [], None, None
+        for stage, users in enumerate(args.users, 1):
+            server = innodb_lock_waits() if args.mysql else None
+            results = run_stage(args, users, stage)
+            if server:
+                waits, seconds = innodb_lock_waits()
+                server = (waits - server[0], seconds - server[1])
+            summary = summarize_stage(users, results, server)
+            stages.append(summary)
+            print(f"{users:>6}{summary['throughput_per_s']:>10.1f}{summary['p50_ms']:>10.2f}"
+                  f"{summary['p95_ms']:>10.2f}{summary['p99_ms']:>10.2f}{summary['error_rate']:>9.2%}"
+                  f"{summary['rejected_rate']:>10.2%}{summary['lock_waits']:>12,}"
+                  f"{summary['lock_wait_ms']:>10.0f}{summary['retries']:>9,}", file=sys.stderr)
+            if summary["error_rate"] > args.max_error_rate:
+                stopped = f"error rate {summary['error_rate']:.2%} above {args.max_error_rate:.2%}"
+            elif args.max_p95_ms is not None and summary["p95_ms"] > args.max_p95_ms:
+                stopped = f"p95 {summary['p95_ms']:.1f} ms above {args.max_p95_ms:.1f} ms"
+            if stopped:
+                print(f"ramp stopped at {users} users: {stopped}", file=sys.stderr)
+                break
+            capacity = users
+
+    record = {
+        "timestamp": datetime.now().isoformat(timespec="seconds"),
+        "target": target,
+        "python": platform.python_version(),
+        "processes": args.processes,
+        "think_ms": args.think_ms,
+        "mix": args.mix,
+        "stage_seconds": args.stage_seconds,
+        "capacity_users": capacity,  # largest stage within the limits
+        "stopped": stopped,
+        "stages": stages,
+    }
+    if not args.no_save:
+        os.makedirs(RESULTS_DIR, exist_ok=True)
+        path = os.path.join(RESULTS_DIR, "load-" + datetime.now().strftime("%Y%m%d-%H%M%S") + ".json")
+        with open(path, "w") as handle:
+            json.dump(record, handle, indent=2)
+        print(f"Saved {path}", file=sys.stderr)
+    if args.json:
+        print(json.dumps(record, indent=2))
+
+
+if __name__ == "__main__":
+    main()
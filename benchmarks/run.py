@@ -0,0 +1,237 @@
+"""Repeatable benchmark of the hot operations.
+
+Times each operation through the same code the GUI uses (pooled
+connections, ``rentals``, ``paging``, ``counters``, ``availability``) and
+reports p50/p95/p99 latencies.  Every run is saved under
+``benchmarks/results/`` so a later run can be compared against it:
+
+    python datagen.py --db bench.db --customers 1000000 --cars 50000 --reservations 5000000
+    python benchmarks/run.py --db bench.db
+    python benchmarks/run.py --db bench.db --compare benchmarks/results/<earlier run>.json
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import sys
+import time
+from datetime import date, datetime, timedelta
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import availability  # noqa: E402
+import counters  # noqa: E402
+import db  # noqa: E402
+import rentals  # noqa: E402
+from paging import TABLE_VIEWS, build_page_query  # noqa: E402
+
+RESULTS_DIR = os.path.join(ROOT, "benchmarks", "results")
+REGRESSION_THRESHOLD = 0.20  # flag p95 slow-downs above 20%
+
+
+def percentile(sorted_values, fraction):
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return 0.0
+    rank = max(0, min(len(sorted_values) - 1, round(fraction * len(sorted_values) + 0.5) - 1))
+    return sorted_values[rank]
+
+
+def summarize(latencies, errors):
+    latencies = sorted(latencies)
+    total = sum(latencies)
+    return {
+        "count": len(latencies),
+        "errors": errors,
+        "mean_ms": total / len(latencies) * 1000 if latencies else 0.0,
+        "p50_ms": percentile(latencies, 0.50) * 1000,
+        "p95_ms": percentile(latencies, 0.95) * 1000,
+        "p99_ms": percentile(latencies, 0.99) * 1000,
+        "max_ms": latencies[-1] * 1000 if latencies else 0.0,
+        "ops_per_s": len(latencies) / total if total else 0.0,
+    }
+
+
+class Workload:
+    """Random but seeded inputs for the hot operations."""
+
+    def __init__(self, seed):
+        self.rng = random.Random(seed)
+        self.run_tag = f"{int(time.time())}{os.getpid()}"
+        self.sequence = 0
+        rows = db.fetch_all("SELECT MAX(id), COUNT(*) FROM reservations")
+        self.max_reservation = rows[0][0] or 1
+        self.cars = db.fetch_all("SELECT id, name, model_year, color FROM cars")
+        self.max_customer = db.fetch_all("SELECT MAX(id) FROM customers")[0][0] or 1
+        if not self.cars:
+            raise SystemExit("The database has no cars; fill it with datagen.py first.")
+
+    def random_car(self):
+        return self.rng.choice(self.cars)
+
+    def random_window(self, days_ahead=365):
+        start = date.today() + timedelta(days=self.rng.randint(0, days_ahead))
+        return start, start + timedelta(days=self.rng.randint(1, 10))
+
+    def unique(self):
+        self.sequence += 1
+        return f"{self.run_tag}{self.sequence:06d}"
+
+    # -- operations -----------------------------------------------------
+
+    def dashboard_overview(self):
+        counters.get_overview()
+
+    def dashboard_page(self):
+        after = self.rng.randint(1, self.max_reservation)
+        sql, params = build_page_query(TABLE_VIEWS["reservations"], after=(after, after))
+        db.fetch_all(sql, params)
+
+    def dashboard_sorted_page(self):
+        sql, params = build_page_query(TABLE_VIEWS["customers"], sort_index=1)
+        db.fetch_all(sql, params)
+
+    def customer_registration(self):
+        tag = self.unique()
+        rentals.add_customer(f"Bench {tag}", f"+9{tag}", f"bench-{tag}", "Egypt")
+
+    def reservation_insert(self):
+        _, name, model_year, color = self.random_car()
+        # Far in the future so most attempts find the car free
+        start = date.today() + timedelta(days=self.rng.randint(2000, 20000))
+        end = start + timedelta(days=self.rng.randint(1, 7))
+        try:
+            rentals.reserve_car(name, model_year, color, (end - start).days, start.isoformat(),
+                                end.isoformat(), 100, self.rng.randint(1, self.max_customer))
+        except rentals.RentalError:
+            pass  # an overlapping booking is a valid, timed outcome
+
+    def car_status_lookup(self):
+        # Mostly cache hits once the cars have been seen, as in a long-running GUI
+        car_id, name, model_year, color = self.random_car()
+        rentals.find_car(name, model_year, color)
+        rentals.get_car_status(car_id)
+
+    def car_status_lookup_cold(self):
+        car_id, name, model_year, color = self.random_car()
+        rentals.invalidate_car(car_id, name, model_year, color)  # both lookups go to the database
+        rentals.find_car(name, model_year, color)
+        rentals.get_car_status(car_id)
+
+    def availability_check(self):
+        start, end = self.random_window()
+        availability.get_index().is_free(self.random_car()[0], start, end)
+
+    def availability_search(self):
+        start, end = self.random_window()
+        availability.get_index().free_cars(start, end)
+
+
+OPERATIONS = [
+    "dashboard_overview",
+    "dashboard_page",
+    "dashboard_sorted_page",
+    "customer_registration",
+    "reservation_insert",
+    "car_status_lookup",
+    "car_status_lookup_cold",
+    "availability_check",
+    "availability_search",
+]
+
+
+def run(workload, operations, iterations, warmup):
+    results = {}
+    for name in operations:
+        operation = getattr(workload, name)
+        for _ in range(warmup):
+            operation()
+        latencies, errors = [], 0
+        for _ in range(iterations):
+            started = time.perf_counter()
+            try:
+                operation()
+            except Exception:
+                errors += 1
+                continue
+            latencies.append(time.perf_counter() - started)
+        results[name] = summarize(latencies, errors)
+        stats = results[name]
+        print(f"{name:<24}{stats['p50_ms']:>10.3f}{stats['p95_ms']:>10.3f}{stats['p99_ms']:>10.3f}"
+              f"{stats['ops_per_s']:>12.1f}{errors:>8}")
+    return results
+
+
+def compare(current, baseline_path, threshold=REGRESSION_THRESHOLD):
+    """Print p50/p95 changes against an earlier run; return the regressed operations."""
+    with open(baseline_path) as handle:
+        baseline = json.load(handle)["results"]
+    print(f"\nCompared with {baseline_path}:")
+    regressions = []
+    for name, stats in current.items():
+        if name not in baseline:
+            continue
+        old = baseline[name]
+        changes = []
+        for key in ("p50_ms", "p95_ms"):
+            before = old[key]
+            changes.append((stats[key] - before) / before if before else 0.0)
+        flag = ""
+        if changes[1] > threshold:
+            flag = "  REGRESSION"
+            regressions.append(name)
+        print(f"{name:<24} p50 {changes[0]:+8.1%}   p95 {changes[1]:+8.1%}{flag}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the hot database operations.")
+    parser.add_argument("--db", help="SQLite database filled by datagen.py (required without --mysql)")
+    parser.add_argument("--mysql", action="store_true", help="benchmark the MySQL server in db.DB_CONFIG instead")
+    parser.add_argument("--iterations", type=int, default=200)
+    parser.add_argument("--warmup", type=int, default=10)
+    parser.add_argument("--only", nargs="+", choices=OPERATIONS, help="run a subset of the operations")
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--compare", help="earlier results file to compare against")
+    parser.add_argument("--no-save", action="store_true", help="do not store this run")
+    args = parser.parse_args()
+    if not args.mysql and not args.db:
+        parser.error("--db is required without --mysql")
+
+    backend = db.MySQLBackend() if args.mysql else db.SQLiteBackend(args.db)
+    db.use_backend(backend)
+    target = repr(backend)
+
+    workload = Workload(args.seed)
+    started = time.perf_counter()
+    availability.get_index()  # built once at startup in the application too
+    print(f"availability index built in {time.perf_counter() - started:.2f}s")
+
+    print(f"\n{'operation':<24}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'ops/s':>12}{'errors':>8}")
+    results = run(workload, args.only or OPERATIONS, args.iterations, args.warmup)
+    counts = counters.get_overview()
+
+    record = {
+        "timestamp": datetime.now().isoformat(timespec="seconds"),
+        "target": target,
+        "python": platform.python_version(),
+        "iterations": args.iterations,
+        "rows": counts,
+        "pool": db.pool_stats(),
+        "caches": rentals.cache_stats(),
+        "results": results,
+    }
+    if not args.no_save:
+        os.makedirs(RESULTS_DIR, exist_ok=True)
+        path = os.path.join(RESULTS_DIR, datetime.now().strftime("%Y%m%d-%H%M%S") + ".json")
+        with open(path, "w") as handle:
+            json.dump(record, handle, indent=2)
+        print(f"\nSaved {path}")
+    if args.compare and compare(results, args.compare):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
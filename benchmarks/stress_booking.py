@@ -0,0 +1,153 @@
+"""Stress test of concurrent booking: many clerks, few cars, no double-bookings.
+
+Starts several processes (separate availability indexes, like clerks on
+different machines), each running several threads that keep booking random
+short windows on a small fleet through ``rentals.reserve_car``.  Most
+attempts collide, which is the point.  Afterwards every pair of reservations
+of the same car is checked for overlap.
+
+    python benchmarks/stress_booking.py --processes 4 --threads 8 --seconds 10
+    python benchmarks/stress_booking.py --mysql
+"""
+import argparse
+import multiprocessing
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+from datetime import date, timedelta
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import availability  # noqa: E402
+import db  # noqa: E402
+import metrics  # noqa: E402
+import rentals  # noqa: E402
+
+CAR_NAME = "Stress Test"
+FIRST_DAY = date(2090, 1, 1)
+
+OVERLAPS = """
+    SELECT COUNT(*) FROM reservations a
+    JOIN reservations b ON a.car_id = b.car_id AND a.id < b.id
+     AND a.pick_up < b.return_time AND b.pick_up < a.return_time
+    JOIN cars c ON c.id = a.car_id
+    WHERE c.name = %s
+"""
+
+
+def configure(args):
+    metrics.configure(slow_query_ms=60000)  # waiting for a car's lock is expected here
+    backend = db.MySQLBackend() if args.mysql else db.SQLiteBackend(args.db)
+    db.use_backend(backend, size=args.threads)
+
+
+def setup(args):
+    """Create the test fleet and a customer; return the customer id."""
+    configure(args)
+    with db.connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute("DELETE FROM reservations WHERE car_id IN (SELECT id FROM cars WHERE name = %s)",
+                       (CAR_NAME,))
+        cursor.execute("DELETE FROM cars WHERE name = %s", (CAR_NAME,))
+        cursor.executemany("INSERT INTO cars (name, model_year, color) VALUES (%s, %s, %s)",
+                           [(CAR_NAME, 2000 + i, "Red") for i in range(args.cars)])
+        cursor.execute("INSERT INTO customers (name, phone, email, country) VALUES (%s, %s, %s, %s)",
+                       ("Stress Clerk", f"+0{time.time_ns()}", f"stress-{time.time_ns()}", "Egypt"))
+        customer_id = cursor.lastrowid
+        conn.commit()
+    return customer_id
+
+
+def clerk(args, customer_id, deadline, seed, totals, lock):
+    rng = random.Random(seed)
+    booked = rejected = failed = 0
+    latencies = []
+    while time.perf_counter() < deadline:
+        start = FIRST_DAY + timedelta(days=rng.randrange(args.days))
+        days = rng.randint(1, 4)
+        started = time.perf_counter()
+        try:
+            rentals.reserve_car(CAR_NAME, 2000 + rng.randrange(args.cars), "Red", days, start.isoformat(),
+                                (start + timedelta(days=days)).isoformat(), 100, customer_id)
+            booked += 1
+        except rentals.RentalError:
+            rejected += 1
+        except db.database_errors():
+            failed += 1
+        latencies.append(time.perf_counter() - started)
+    with lock:
+        totals["booked"] += booked
+        totals["rejected"] += rejected
+        totals["failed"] += failed
+        totals["latencies"].extend(latencies)
+
+
+def process_main(args, customer_id, deadline_in, seed, queue):
+    configure(args)
+    availability.get_index()  # loaded before the clock starts, as at application start-up
+    totals = {"booked": 0, "rejected": 0, "failed": 0, "latencies": []}
+    lock = threading.Lock()
+    deadline = time.perf_counter() + deadline_in
+    threads = [threading.Thread(target=clerk, args=(args, customer_id, deadline, seed * 1000 + i, totals, lock))
+               for i in range(args.threads)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    totals["retries"] = rentals.retry_stats["retries"]
+    queue.put(totals)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--db", help="SQLite file (default: a temporary one)")
+    parser.add_argument("--mysql", action="store_true", help="use the MySQL server in db.DB_CONFIG")
+    parser.add_argument("--processes", type=int, default=4)
+    parser.add_argument("--threads", type=int, default=8, help="clerks per process")
+    parser.add_argument("--cars", type=int, default=20)
+    parser.add_argument("--days", type=int, default=1000, help="length of the booking calendar")
+    parser.add_argument("--seconds", type=float, default=10.0)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as folder:
+        if not args.mysql and not args.db:
+            args.db = os.path.join(folder, "stress.db")
+        customer_id = setup(args)
+        db.get_pool().close()
+
+        queue = multiprocessing.Queue()
+        processes = [multiprocessing.Process(target=process_main,
+                                             args=(args, customer_id, args.seconds, seed, queue))
+                     for seed in range(1, args.processes + 1)]
+        for process in processes:
+            process.start()
+        results = [queue.get() for _ in processes]
+        for process in processes:
+            process.join()
+
+        configure(args)
+        overlaps = db.fetch_all(OVERLAPS, (CAR_NAME,))[0][0]
+
+    latencies = sorted(latency for result in results for latency in result["latencies"])
+    booked = sum(result["booked"] for result in results)
+    print(f"{args.processes} processes x {args.threads} clerks, {args.cars} cars, "
+          f"{args.days}-day calendar, {args.seconds:.0f}s")
+    print(f"bookings:      {booked:10,}  ({booked / args.seconds:,.1f}/s)")
+    print(f"rejected:      {sum(result['rejected'] for result in results):10,}  (car already taken)")
+    print(f"retries:       {sum(result['retries'] for result in results):10,}")
+    print(f"errors:        {sum(result['failed'] for result in results):10,}")
+    if latencies:
+        print(f"latency p50/p95/p99: {latencies[len(latencies) // 2] * 1000:.1f} / "
+              f"{latencies[int(len(latencies) * 0.95)] * 1000:.1f} / "
+              f"{latencies[int(len(latencies) * 0.99)] * 1000:.1f} ms")
+    print(f"double-bookings: {overlaps}")
+    if overlaps:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,361 @@
+"""In-memory columnar catalog of the fleet, for multi-attribute car search.
+
+Cars are stored column by column: the id, year and daily rate in typed
+``array`` columns, and the model, color, office and status dictionary-
+encoded (an ``array`` of small codes plus the distinct values).  Every
+attribute also has an inverted index: for each distinct value (each
+``RATE_BUCKET`` of rates), the set of cars having it, as a bitmap held in
+one Python int.  A search ORs the bitmaps of the matching values of each
+attribute and ANDs the attributes together, so filtering 100k cars costs a
+handful of big-int operations; only the cars left are checked against the
+availability index for the requested dates.
+
+The catalog is loaded once (``get_catalog()``, at start-up by
+``startup.connect_early``) and kept in step by the write paths through
+``record_car``, and with other processes' writes by ``refresh_cars``.
+
+    python catalog.py --db car_rental.db --model camry --years 2018 2022 --color Red --from 2025-07-01 --to 2025-07-05
+    python catalog.py --target mysql --schema rental --office 3 --rate 40 80
+"""
+import argparse
+import re
+import threading
+import time
+from array import array
+
+from availability import get_index, load_rental_schema
+from db import connection, fetch_all, make_backend, on_configure, use_backend
+from pricing import model_rate
+
+RATE_BUCKET = 10.0   # width of the daily-rate index buckets
+SEARCH_LIMIT = 200   # cars returned by one search
+
+CATALOG_QUERIES = {
+    "app": "SELECT id, name, model_year, color, NULL, status FROM cars ORDER BY id",
+    "rental": "SELECT CarID, Model, Year, Color, OfficeID, Status, DailyRentalRate FROM Car ORDER BY CarID",
+}
+
+# Set bit positions of every byte value, to walk bitmaps a byte at a time
+_BITS = [tuple(bit for bit in range(8) if value >> bit & 1) for value in range(256)]
+_SET_BYTES = re.compile(rb"[^\x00]")
+
+
+def positions(bitmap):
+    """Yield the set bit positions of ``bitmap``, lowest first."""
+    data = bitmap.to_bytes((bitmap.bit_length() + 7) // 8, "little")
+    for match in _SET_BYTES.finditer(data):  # skips the zero bytes of sparse bitmaps in C
+        base = match.start() * 8
+        for bit in _BITS[data[match.start()]]:
+            yield base + bit
+
+
+def _bitmap(members):
+    """Bitmap with the given positions set."""
+    if not members:
+        return 0
+    bits = bytearray(max(members) // 8 + 1)
+    for position in members:
+        bits[position >> 3] |= 1 << (position & 7)
+    return int.from_bytes(bits, "little")
+
+
+class _Attribute:
+    """A dictionary-encoded column with a bitmap per distinct value."""
+
+    __slots__ = ("values", "lookup", "codes", "bitmaps")
+
+    def __init__(self):
+        self.values = []
+        self.lookup = {}
+        self.codes = array("i")
+        self.bitmaps = []
+
+    def _code(self, value):
+        code = self.lookup.get(value)
+        if code is None:
+            code = self.lookup[value] = len(self.values)
+            self.values.append(value)
+            self.bitmaps.append(0)
+        return code
+
+    def extend(self, values, first):
+        """Append a column of values for the positions from ``first`` on."""
+        members = {}
+        for position, value in enumerate(values, first):
+            code = self._code(value)
+            self.codes.append(code)
+            members.setdefault(code, []).append(position)
+        for code, found in members.items():
+            self.bitmaps[code] |= _bitmap(found)
+
+    def set(self, position, value):
+        code = self._code(value)
+        if position < len(self.codes):
+            old = self.codes[position]
+            self.bitmaps[old] &= ~(1 << position)
+            self.codes[position] = code
+        else:
+            self.codes.append(code)
+        self.bitmaps[code] |= 1 << position
+
+    def value(self, position):
+        return self.values[self.codes[position]]
+
+    def matching(self, accept):
+        """Bitmap of the positions whose value passes ``accept(value)``."""
+        bitmap = 0
+        for value, values_bitmap in zip(self.values, self.bitmaps):
+            if accept(value):
+                bitmap |= values_bitmap
+        return bitmap
+
+
+class CarCatalog:
+    """Columnar catalog of cars; safe to share between threads."""
+
+    ATTRIBUTES = ("model", "color", "office", "status", "year", "rate")
+
+    def __init__(self):
+        self.ids = array("q")
+        self.years = array("h")
+        self.rates = array("d")
+        self.attributes = {name: _Attribute() for name in self.ATTRIBUTES}
+        self._position = {}  # car id -> position
+        self._lock = threading.RLock()
+
+    def __len__(self):
+        return len(self.ids)
+
+    def extend(self, cars):
+        """Add many ``(id, model, year, color, office, status, rate)`` cars at once."""
+        cars = list(cars)
+        if not cars:
+            return
+        with self._lock:
+            first = len(self.ids)
+            ids, models, years, colors, offices, statuses, rates = zip(*cars)
+            rates = [float(rate) for rate in rates]
+            self.ids.extend(ids)
+            self.years.extend(int(year) for year in years)
+            self.rates.extend(rates)
+            attributes = self.attributes
+            for name, column in (("model", models), ("color", colors), ("office", offices),
+                                 ("status", statuses), ("year", (int(year) for year in years)),
+                                 ("rate", (int(rate // RATE_BUCKET) for rate in rates))):
+                attributes[name].extend(column, first)
+            for position, car_id in enumerate(ids, first):
+                self._position[car_id] = position
+
+    def add(self, car_id, model, year, color, office=None, status="active", rate=None):
+        """Add a car, or update one already in the catalog."""
+        rate = float(model_rate(model) if rate is None else rate)
+        with self._lock:
+            position = self._position.get(car_id)
+            if position is None:
+                position = self._position[car_id] = len(self.ids)
+                self.ids.append(car_id)
+                self.years.append(int(year))
+                self.rates.append(rate)
+            else:
+                self.years[position] = int(year)
+                self.rates[position] = rate
+            for name, value in (("model", model), ("color", color), ("office", office), ("status", status),
+                                ("year", int(year)), ("rate", int(rate // RATE_BUCKET))):
+                self.attributes[name].set(position, value)
+
+    def row(self, position):
+        """``(id, model, year, color, rate, office, status)`` of the car at ``position``."""
+        attributes = self.attributes
+        return (self.ids[position], attributes["model"].value(position), self.years[position],
+                attributes["color"].value(position), self.rates[position],
+                attributes["office"].value(position), attributes["status"].value(position))
+
+    def _rate_filter(self, candidates, low, high):
+        """The ``candidates`` with a rate in ``[low, high]``.
+
+        Whole buckets inside the range are taken from the index; only the
+        candidates in the two edge buckets are checked car by car.
+        """
+        low = float("-inf") if low is None else low
+        high = float("inf") if high is None else high
+        rates = self.attributes["rate"]
+        inside, edges = 0, 0
+        for bucket, bucket_bitmap in zip(rates.values, rates.bitmaps):
+            bottom, top = bucket * RATE_BUCKET, (bucket + 1) * RATE_BUCKET
+            if top <= low or bottom > high:
+                continue
+            if low <= bottom and top <= high:
+                inside |= bucket_bitmap
+            else:
+                edges |= bucket_bitmap
+        edges &= candidates
+        return (inside & candidates) | _bitmap([position for position in positions(edges)
+                                                if low <= self.rates[position] <= high])
+
+    def matches(self, model=None, year_from=None, year_to=None, color=None, rate_min=None, rate_max=None,
+                office=None, status=None):
+        """Bitmap of the cars passing every given filter (``None`` means any)."""
+        attributes = self.attributes
+        with self._lock:
+            bitmap = (1 << len(self.ids)) - 1
+            if model:
+                needle = model.strip().lower()
+                bitmap &= attributes["model"].matching(lambda value: needle in str(value).lower())
+            if year_from is not None or year_to is not None:
+                low = year_from if year_from is not None else -1
+                high = year_to if year_to is not None else 10 ** 6
+                bitmap &= attributes["year"].matching(lambda value: low <= value <= high)
+            if color:
+                wanted = color.strip().lower()
+                bitmap &= attributes["color"].matching(lambda value: str(value).lower() == wanted)
+            if office is not None:
+                bitmap &= attributes["office"].matching(lambda value: value == office)
+            if status:
+                bitmap &= attributes["status"].matching(lambda value: value == status)
+            if rate_min is not None or rate_max is not None:
+                bitmap = self._rate_filter(bitmap, rate_min, rate_max)  # last: fewest cars left to check
+            return bitmap
+
+    def search(self, pick_up=None, return_time=None, index=None, limit=SEARCH_LIMIT, **filters):
+        """Cars passing ``filters`` (see ``matches``) and free for ``[pick_up, return_time)``.
+
+        Returns ``(rows, matched)``: up to ``limit`` (``None``: all) rows in id order (see
+        ``row``) and how many cars pass the filters before the dates are
+        checked.
+        """
+        bitmap = self.matches(**filters)
+        matched = bin(bitmap).count("1")
+        rows = []
+        with self._lock:
+            if pick_up and return_time:
+                index = index or get_index()
+                ids = self.ids
+                for position in positions(bitmap):
+                    if index.is_free(ids[position], pick_up, return_time):
+                        rows.append(self.row(position))
+                        if len(rows) == limit:
+                            break
+            else:
+                for position in positions(bitmap):
+                    rows.append(self.row(position))
+                    if len(rows) == limit:
+                        break
+        return rows, matched
+
+    def values(self, attribute):
+        """Distinct values of an attribute, sorted, e.g. for the search form's menus."""
+        with self._lock:
+            return sorted(value for value in self.attributes[attribute].values if value is not None)
+
+
+def load_catalog(cursor, schema="app", catalog=None):
+    """Fill a catalog from the ``cars`` (app) or ``Car`` (rental) table."""
+    catalog = CarCatalog() if catalog is None else catalog
+    cursor.execute(CATALOG_QUERIES[schema])
+    rows = cursor.fetchall()
+    if schema == "app":
+        # The app schema records no rate or office: rates come from the model's price
+        rows = [(car_id, name, year, color, office, status, model_rate(name))
+                for car_id, name, year, color, office, status in rows]
+    catalog.extend(rows)
+    return catalog
+
+
+_catalog = None
+_catalog_lock = threading.Lock()
+
+
+def get_catalog():
+    """Return the shared catalog of the app's cars, loading it on first use."""
+    global _catalog
+    with _catalog_lock:
+        if _catalog is None:
+            with connection() as conn:
+                _catalog = load_catalog(conn.cursor())
+        return _catalog
+
+
+def set_catalog(catalog):
+    """Install ``catalog`` as the shared one (``None`` forces a reload on next use)."""
+    global _catalog
+    with _catalog_lock:
+        _catalog = catalog
+
+
+on_configure(lambda: set_catalog(None))  # another database: reload on next use
+
+
+def record_car(car_id, name, model_year, color, status="active"):
+    """Keep the shared catalog in step after a car is added or changed.
+
+    Does nothing until the catalog has been loaded; the first load reads the
+    committed row anyway.
+    """
+    if _catalog is not None:
+        _catalog.add(car_id, name, model_year, color, status=status)
+
+
+def refresh_cars(car_ids):
+    """Bring the shared catalog in step with cars another process added or changed.
+
+    ``car_ids`` come from the change journal; ``None`` (a bulk change)
+    drops the catalog so it reloads on next use.
+    """
+    catalog = _catalog
+    if catalog is None or not car_ids:
+        if car_ids is None:
+            set_catalog(None)
+        return
+    ids = sorted(car_ids)
+    for car_id, name, model_year, color, status in fetch_all(
+            "SELECT id, name, model_year, color, status FROM cars WHERE id IN ({})".format(
+                ", ".join(["%s"] * len(ids))), ids):
+        catalog.add(car_id, name, model_year, color, status=status)
+
+
+def search(pick_up=None, return_time=None, limit=SEARCH_LIMIT, **filters):
+    """Search the app's fleet; see ``CarCatalog.search``."""
+    return get_catalog().search(pick_up, return_time, limit=limit, **filters)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Search the fleet by attributes and free dates.")
+    parser.add_argument("--model", help="part of the model name")
+    parser.add_argument("--years", type=int, nargs=2, metavar=("FROM", "TO"))
+    parser.add_argument("--color")
+    parser.add_argument("--rate", type=float, nargs=2, metavar=("MIN", "MAX"), help="daily rate range")
+    parser.add_argument("--office", type=int, help="office id (rental schema)")
+    parser.add_argument("--status", help="e.g. active")
+    parser.add_argument("--from", dest="pick_up", help="free from this date")
+    parser.add_argument("--to", dest="return_time", help="until this date")
+    parser.add_argument("--limit", type=int, default=20)
+    parser.add_argument("--target", choices=("sqlite", "mysql"), default="sqlite")
+    parser.add_argument("--db", help="SQLite file (required with --target sqlite)")
+    parser.add_argument("--schema", choices=("app", "rental"),
+                        help="tables to read (default: app on SQLite, rental on MySQL)")
+    args = parser.parse_args()
+    if args.target == "sqlite" and not args.db:
+        parser.error("--db is required with --target sqlite")
+    schema = args.schema or ("app" if args.target == "sqlite" else "rental")
+
+    use_backend(make_backend(args.target, args.db), size=1, prepare=False)
+    started = time.perf_counter()
+    with connection() as conn:
+        cursor = conn.cursor()
+        catalog = load_catalog(cursor, schema)
+        index = load_rental_schema(cursor) if schema == "rental" else get_index(cursor)
+    print(f"{len(catalog):,} cars loaded in {time.perf_counter() - started:.2f}s")
+
+    started = time.perf_counter()
+    rows, matched = catalog.search(
+        args.pick_up, args.return_time, index, args.limit, model=args.model,
+        year_from=args.years[0] if args.years else None, year_to=args.years[1] if args.years else None,
+        color=args.color, rate_min=args.rate[0] if args.rate else None,
+        rate_max=args.rate[1] if args.rate else None, office=args.office, status=args.status)
+    print(f"{matched:,} cars match the filters; search took {(time.perf_counter() - started) * 1000:.2f} ms")
+    for car_id, model, year, color, rate, office, status in rows:
+        print(f"{car_id:>8}  {model:<20}{year:>6}  {color:<8}{rate:>8.2f}  {office or '':<6}{status}")
+
+
+if __name__ == "__main__":
+    main()
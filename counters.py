@@ -0,0 +1,132 @@
+"""Overview counters kept up to date by the write paths.
+
+The dashboard overview used to run a ``COUNT(*)`` per table on every
+refresh.  Instead the totals live in a small ``overview_counters`` table
+that each booking operation adjusts in the same transaction as its insert,
+so reading the overview is a single primary-key read.
+
+If the counters ever drift (rows changed outside the application, a manual
+import...), rebuild them with::
+
+    python counters.py            # reconcile and report drift
+    python counters.py --check    # only report drift
+"""
+import argparse
+import threading
+
+from db import begin_write, connection, on_configure
+
+# Counter name -> query computing it from scratch
+COUNTER_QUERIES = {
+    "cars": "SELECT COUNT(*) FROM cars",
+    "customers": "SELECT COUNT(*) FROM customers",
+    "reservations": "SELECT COUNT(*) FROM reservations",
+    "open_rentals": "SELECT COUNT(*) FROM car_reservation_status WHERE status != 'returned'",
+}
+
+CREATE_TABLE = """
+    CREATE TABLE IF NOT EXISTS overview_counters (
+        name VARCHAR(32) PRIMARY KEY,
+        value BIGINT NOT NULL
+    )
+"""
+
+_ready = False
+_ready_lock = threading.Lock()
+
+
+def ensure_counters(conn):
+    """Create and seed the counters table once per process.
+
+    Run this before a write transaction starts: the DDL commits implicitly
+    on MySQL.
+    """
+    global _ready
+    if _ready:
+        return
+    with _ready_lock:
+        if _ready:
+            return
+        cursor = conn.cursor()
+        cursor.execute(CREATE_TABLE)
+        cursor.execute("SELECT name FROM overview_counters")
+        existing = {row[0] for row in cursor.fetchall()}
+        for name, query in COUNTER_QUERIES.items():
+            if name not in existing:
+                cursor.execute(query)
+                cursor.execute("INSERT INTO overview_counters (name, value) VALUES (%s, %s)",
+                               (name, cursor.fetchone()[0]))
+        conn.commit()
+        _ready = True
+
+
+@on_configure
+def _forget_ready():
+    """The pool now points at another database, which may lack the table."""
+    global _ready
+    _ready = False
+
+
+def bump(cursor, name, delta=1):
+    """Adjust a counter inside the caller's transaction."""
+    cursor.execute("UPDATE overview_counters SET value = value + %s WHERE name = %s", (delta, name))
+
+
+def read_counters(conn):
+    """Return ``{name: value}`` for every counter."""
+    ensure_counters(conn)
+    cursor = conn.cursor()
+    cursor.execute("SELECT name, value FROM overview_counters")
+    return dict(cursor.fetchall())
+
+
+def get_overview():
+    """Return the counters using a pooled connection."""
+    with connection() as conn:
+        return read_counters(conn)
+
+
+def reconcile(conn, fix=True):
+    """Recount every counter from the base tables and return the drift.
+
+    The result maps each drifted counter to ``(stored, actual)``.  With
+    ``fix`` the stored values are corrected in one transaction; the counter
+    rows are locked first so concurrent bookings wait rather than drift.
+    """
+    ensure_counters(conn)
+    begin_write(conn)  # SQLite ignores FOR UPDATE: take its write lock before the counts
+    cursor = conn.cursor()
+    cursor.execute("SELECT name, value FROM overview_counters FOR UPDATE")
+    stored = dict(cursor.fetchall())
+    drift = {}
+    for name, query in COUNTER_QUERIES.items():
+        cursor.execute(query)
+        actual = cursor.fetchone()[0]
+        if stored.get(name) != actual:
+            drift[name] = (stored.get(name), actual)
+            if fix:
+                cursor.execute("UPDATE overview_counters SET value = %s WHERE name = %s", (actual, name))
+    if fix:
+        conn.commit()
+    else:
+        conn.rollback()
+    return drift
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Rebuild the overview counters and report drift.")
+    parser.add_argument("--check", action="store_true", help="report drift without fixing it")
+    args = parser.parse_args()
+
+    with connection() as conn:
+        drift = reconcile(conn, fix=not args.check)
+    if not drift:
+        print("Counters are in sync.")
+        return
+    for name, (stored, actual) in sorted(drift.items()):
+        print(f"{name}: stored {stored}, actual {actual}, drift {(stored or 0) - actual:+d}")
+    print("Counters reconciled." if not args.check else "Run without --check to fix.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,290 @@
+"""In-memory prefix index for search-as-you-type customer lookup.
+
+Every customer contributes a few search keys: each word of the name, the
+phone number and the licence number, all lower-cased with punctuation
+dropped (``"+20 100-555"`` -> ``"20100555"``, also when typed in the box).  The keys live in one sorted
+list with the customer ids alongside, so the customers whose key starts
+with a prefix are one contiguous slice, found with two binary searches.
+
+A query of several words ("jo smi") takes the word with the fewest
+matching keys and checks its customers for the other words, stopping at
+``LOOKUP_LIMIT`` results, so a keystroke costs a handful of bisections
+however many customers there are.
+
+The index is built once from the database (``get_customer_index()``, at
+start-up by ``startup.connect_early``) and kept in step by
+``rentals.add_customer`` and the importer through ``record_customer``, and
+with other processes' writes by ``refresh_customers``.
+
+    python customer_index.py --db car_rental.db "jo smi"
+    python customer_index.py --target mysql --schema rental DL0000
+"""
+import argparse
+import re
+import threading
+import time
+from array import array
+from bisect import bisect_left, bisect_right
+from itertools import islice
+
+from db import connection, fetch_all, make_backend, on_configure, use_backend
+
+LOOKUP_LIMIT = 20    # customers returned per keystroke
+LOOKUP_SCAN = 50000  # candidates checked at most for a multi-word query
+LOOKUP_MERGE = 4096  # keys added one by one before they are merged into the main sorted list
+
+CUSTOMER_QUERIES = {
+    "app": "SELECT id, name, phone, NULL FROM customers",
+    "rental": "SELECT CustomerID, FirstName, LastName, Phone, LicenseNumber FROM Customer",
+}
+
+_PUNCTUATION = re.compile(r"[\W_]+")
+_NAME_BREAKS = re.compile(r"[\s-]+")
+_LETTERS = re.compile(r"[^\W\d_]")
+_END = "\U0010ffff"  # sorts after every key that starts with a given prefix
+
+
+def normalize(text):
+    """Search key form of one word: lower case, letters and digits only."""
+    return _PUNCTUATION.sub("", text.lower())
+
+
+def query_words(text):
+    """Search keys a query must all match; a number typed with spaces is one key."""
+    words = [text] if not _LETTERS.search(text) else _NAME_BREAKS.split(text)
+    return list({normalize(word) for word in words} - {""})
+
+
+def search_keys(name, phone=None, licence=None):
+    """The keys a customer is found by: each part of a hyphenated name too."""
+    keys = [normalize(word) for word in _NAME_BREAKS.split(name or "")]
+    keys.extend(normalize(value) for value in (phone, licence) if value)
+    return {key for key in keys if key}
+
+
+class PrefixIndex:
+    """Sorted ``(key, id)`` pairs; one entry per key a customer has.
+
+    New entries go to a small sorted tier of their own, merged into the
+    main one every ``LOOKUP_MERGE`` inserts, so registering a customer does
+    not shift millions of entries each time.
+    """
+
+    def __init__(self):
+        self.keys, self.ids = [], array("q")
+        self.recent_keys, self.recent_ids = [], array("q")
+
+    def __len__(self):
+        return len(self.keys) + len(self.recent_keys)
+
+    def build(self, entries):
+        """Replace the contents with ``(key, id)`` pairs, in any order."""
+        interned = {}
+        keys, ids = [], array("q")
+        for key, customer_id in entries:
+            keys.append(interned.setdefault(key, key))  # names repeat: keep one copy of each
+            ids.append(customer_id)
+        order = sorted(range(len(keys)), key=keys.__getitem__)
+        self.keys = [keys[i] for i in order]
+        self.ids = array("q", (ids[i] for i in order))
+        self.recent_keys, self.recent_ids = [], array("q")
+
+    def add(self, key, customer_id):
+        position = bisect_right(self.recent_keys, key)
+        self.recent_keys.insert(position, key)
+        self.recent_ids.insert(position, customer_id)
+        if len(self.recent_keys) >= LOOKUP_MERGE:
+            self._merge()
+
+    def _merge(self):
+        """Fold the recent tier into the main one: one pass, slicing between insert points."""
+        keys, ids = [], array("q")
+        done = 0
+        for key, customer_id in zip(self.recent_keys, self.recent_ids):
+            position = bisect_right(self.keys, key, done)
+            keys.extend(self.keys[done:position])
+            ids.extend(self.ids[done:position])
+            keys.append(key)
+            ids.append(customer_id)
+            done = position
+        keys.extend(self.keys[done:])
+        ids.extend(self.ids[done:])
+        self.keys, self.ids = keys, ids
+        self.recent_keys, self.recent_ids = [], array("q")
+
+    def spans(self, prefix):
+        """``(ids, start, stop)`` per tier, for the entries whose key starts with ``prefix``."""
+        return [(ids, bisect_left(keys, prefix), bisect_left(keys, prefix + _END))
+                for keys, ids in ((self.keys, self.ids), (self.recent_keys, self.recent_ids))]
+
+    def count(self, prefix):
+        return sum(stop - start for _, start, stop in self.spans(prefix))
+
+
+class CustomerIndex:
+    """Customers by name-word, phone and licence prefixes; safe to share between threads."""
+
+    def __init__(self):
+        self._prefixes = PrefixIndex()
+        self._customers = {}  # customer id -> (name, phone, licence)
+        self._lock = threading.RLock()
+
+    def __len__(self):
+        return len(self._customers)
+
+    def load(self, customers):
+        """Index many ``(id, name, phone, licence)`` customers at once."""
+        with self._lock:
+            for customer_id, name, phone, licence in customers:
+                self._customers[customer_id] = (name, phone, licence)
+            self._prefixes.build((key, customer_id) for customer_id, (name, phone, licence)
+                                 in self._customers.items() for key in search_keys(name, phone, licence))
+
+    def add(self, customer_id, name, phone=None, licence=None):
+        """Index a newly registered customer."""
+        with self._lock:
+            if customer_id in self._customers:
+                return
+            self._customers[customer_id] = (name, phone, licence)
+            for key in search_keys(name, phone, licence):
+                self._prefixes.add(key, customer_id)
+
+    def search(self, text, limit=LOOKUP_LIMIT):
+        """Customers with a key starting with each word of ``text``, as ``(id, name, phone, licence)``.
+
+        Results follow the order of the most selective word's keys, which is
+        alphabetical for names.  The other words are checked against the ids
+        of their own matches, or against the customer's keys when a word is
+        too common (a letter or two) to be worth collecting.
+        """
+        words = query_words(text)
+        if not words:
+            return []
+        prefixes = self._prefixes
+        with self._lock:
+            spans = {word: prefixes.spans(word) for word in words}
+            sizes = {word: sum(stop - start for _, start, stop in spans[word]) for word in words}
+            words.sort(key=sizes.__getitem__)  # fewest matching keys first
+            allowed, checks = None, []
+            for word in words[1:]:
+                if sizes[word] <= LOOKUP_SCAN:
+                    members = set()
+                    for ids, start, stop in spans[word]:
+                        members.update(ids[start:stop])
+                    allowed = members if allowed is None else allowed & members
+                else:
+                    checks.append(word)
+
+            found, seen = [], set()
+            candidates = (ids[position] for ids, start, stop in spans[words[0]] for position in range(start, stop))
+            for customer_id in islice(candidates, LOOKUP_SCAN):
+                if customer_id in seen or (allowed is not None and customer_id not in allowed):
+                    continue
+                seen.add(customer_id)
+                customer = self._customers[customer_id]
+                if checks:
+                    keys = search_keys(*customer)
+                    if not all(any(key.startswith(word) for key in keys) for word in checks):
+                        continue
+                found.append((customer_id, *customer))
+                if len(found) == limit:
+                    break
+            return found
+
+
+def load_customer_index(cursor, schema="app", index=None):
+    """Fill an index from the ``customers`` (app) or ``Customer`` (rental) table."""
+    index = CustomerIndex() if index is None else index
+    cursor.execute(CUSTOMER_QUERIES[schema])
+    rows = cursor.fetchall()
+    if schema == "rental":
+        rows = [(customer_id, f"{first} {last}", phone, licence)
+                for customer_id, first, last, phone, licence in rows]
+    index.load(rows)
+    return index
+
+
+_index = None
+_index_lock = threading.Lock()
+
+
+def get_customer_index():
+    """Return the shared index of the app's customers, loading it on first use."""
+    global _index
+    with _index_lock:
+        if _index is None:
+            with connection() as conn:
+                _index = load_customer_index(conn.cursor())
+        return _index
+
+
+def set_customer_index(index):
+    """Install ``index`` as the shared one (``None`` forces a reload on next use)."""
+    global _index
+    with _index_lock:
+        _index = index
+
+
+on_configure(lambda: set_customer_index(None))  # another database: reload on next use
+
+
+def record_customer(customer_id, name, phone):
+    """Keep the shared index in step after a customer is registered.
+
+    Does nothing until the index has been loaded; the first load reads the
+    committed row anyway.
+    """
+    if _index is not None:
+        _index.add(customer_id, name, phone)
+
+
+def refresh_customers(customer_ids):
+    """Index customers another process registered.
+
+    ``customer_ids`` come from the change journal; ``None`` (a bulk change)
+    drops the index so it reloads on next use.
+    """
+    index = _index
+    if index is None or not customer_ids:
+        if customer_ids is None:
+            set_customer_index(None)
+        return
+    ids = sorted(customer_ids)
+    for customer_id, name, phone in fetch_all("SELECT id, name, phone FROM customers WHERE id IN ({})".format(
+            ", ".join(["%s"] * len(ids))), ids):
+        index.add(customer_id, name, phone)
+
+
+def lookup(text, limit=LOOKUP_LIMIT):
+    """Look up the app's customers; see ``CustomerIndex.search``."""
+    return get_customer_index().search(text, limit)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Look customers up by name, phone or licence prefix.")
+    parser.add_argument("text", help='what the clerk typed, e.g. "jo smi"')
+    parser.add_argument("--limit", type=int, default=LOOKUP_LIMIT)
+    parser.add_argument("--target", choices=("sqlite", "mysql"), default="sqlite")
+    parser.add_argument("--db", help="SQLite file (required with --target sqlite)")
+    parser.add_argument("--schema", choices=("app", "rental"),
+                        help="tables to read (default: app on SQLite, rental on MySQL)")
+    args = parser.parse_args()
+    if args.target == "sqlite" and not args.db:
+        parser.error("--db is required with --target sqlite")
+    schema = args.schema or ("app" if args.target == "sqlite" else "rental")
+
+    use_backend(make_backend(args.target, args.db), size=1, prepare=False)
+    started = time.perf_counter()
+    with connection() as conn:
+        index = load_customer_index(conn.cursor(), schema)
+    print(f"{len(index):,} customers indexed in {time.perf_counter() - started:.2f}s")
+
+    started = time.perf_counter()
+    rows = index.search(args.text, args.limit)
+    print(f"{len(rows)} found in {(time.perf_counter() - started) * 1000:.3f} ms")
+    for customer_id, name, phone, licence in rows:
+        print(f"{customer_id:>9}  {name:<30}{phone or '':<18}{licence or ''}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,115 +1,639 @@
-import tkinter as tk
-from tkinter import ttk
-from tkinter.messagebox import showinfo, showerror
-import mysql.connector
-from mysql.connector import Error
-
-
-def create_connection():
-    """Create and return a connection to the MySQL database."""
-    try:
-        conn = mysql.connector.connect(
-            host="localhost",
-            user="root",
-            password="",
-            database="CarRentalSystem"
-        )
-        return conn
-    except Error as e:
-        showerror("Database Error", f"Failed to connect to database: {e}")
-        return None
-
-
-def fetch_data(query, params=()):
-    """Fetch data from the database using the given query."""
-    conn = create_connection()
-    if conn is None:
-        return []
-    try:
-        cursor = conn.cursor()
-        cursor.execute(query, params)
-        return cursor.fetchall()
-    except Error as e:
-        showerror("Database Error", f"An error occurred: {e}")
-        return []
-    finally:
-        conn.close()
-
-
-def load_overview(frame):
-    """Load overview data into the overview frame."""
-    total_cars = fetch_data("SELECT COUNT(*) FROM cars")[0][0]
-    total_customers = fetch_data("SELECT COUNT(*) FROM customers")[0][0]
-    total_reservations = fetch_data("SELECT COUNT(*) FROM reservations")[0][0]
-
-    for widget in frame.winfo_children():
-        widget.destroy()
-
-    tk.Label(frame, text="Overview", font=("Arial", 16, "bold"), bg="#282828", fg="white").pack(pady=10)
-    tk.Label(frame, text=f"Total Cars: {total_cars}", font=("Arial", 12), bg="#282828", fg="white").pack(pady=5)
-    tk.Label(frame, text=f"Total Customers: {total_customers}", font=("Arial", 12), bg="#282828", fg="white").pack(pady=5)
-    tk.Label(frame, text=f"Total Reservations: {total_reservations}", font=("Arial", 12), bg="#282828", fg="white").pack(pady=5)
-
-
-def load_table_data(table, query):
-    """Load data into the table widget."""
-    rows = fetch_data(query)
-    for row in table.get_children():
-        table.delete(row)
-    for row in rows:
-        table.insert("", "end", values=row)
-
-
-def show_dashboard():
-    """Show the dashboard window."""
-    root = tk.Tk()
-    root.title("Car Rental System Dashboard")
-    root.geometry("800x600")
-    root.configure(bg="#282828")
-
-    # Overview Frame
-    overview_frame = tk.Frame(root, bg="#282828")
-    overview_frame.pack(side="top", fill="x")
-    load_overview(overview_frame)
-
-    # Table Frame
-    table_frame = tk.Frame(root)
-    table_frame.pack(side="top", fill="both", expand=True)
-
-    table = ttk.Treeview(table_frame, columns=("ID", "Name", "Details"), show="headings")
-    table.heading("ID", text="ID")
-    table.heading("Name", text="Name")
-    table.heading("Details", text="Details")
-    table.pack(side="left", fill="both", expand=True)
-
-    scrollbar = ttk.Scrollbar(table_frame, orient="vertical", command=table.yview)
-    scrollbar.pack(side="right", fill="y")
-    table.configure(yscrollcommand=scrollbar.set)
-
-    # Button Frame
-    button_frame = tk.Frame(root, bg="#282828")
-    button_frame.pack(side="bottom", fill="x")
-
-    def load_cars():
-        load_table_data(table, "SELECT id, name, model_year FROM cars")
-
-    def load_customers():
-        load_table_data(table, "SELECT id, name, country FROM customers")
-
-    def load_reservations():
-        load_table_data(table, """
-            SELECT r.id, c.name AS customer, car.name AS car 
-            FROM reservations r
-            JOIN customers c ON r.customer_id = c.id
-            JOIN cars car ON r.car_id = car.id
-        """)
-
-    tk.Button(button_frame, text="View Cars", font=("Arial", 12), bg="#4CAF50", fg="white", command=load_cars).pack(side="left", padx=10, pady=10)
-    tk.Button(button_frame, text="View Customers", font=("Arial", 12), bg="#4CAF50", fg="white", command=load_customers).pack(side="left", padx=10, pady=10)
-    tk.Button(button_frame, text="View Reservations", font=("Arial", 12), bg="#4CAF50", fg="white", command=load_reservations).pack(side="left", padx=10, pady=10)
-
-    root.mainloop()
-
-
-if __name__ == "__main__":
-    show_dashboard()
+import logging
+import time
+import tkinter as tk
+from datetime import date, timedelta
+from tkinter import ttk
+from tkinter.messagebox import showerror
+from db import fetch_all
+from worker import get_worker, show_error
+from availability import refresh_reservations, set_index
+from catalog import refresh_cars, set_catalog
+from counters import get_overview
+from customer_index import refresh_customers, set_customer_index
+from journal import JournalReader
+from paging import TABLE_VIEWS, PAGE_SIZE, WINDOW_PAGES, build_page_query, build_rows_query
+
+JOURNAL_POLL_MS = 2000  # how often the dashboard looks for changes made elsewhere
+LOOKUP_DEBOUNCE_MS = 120  # pause in typing before the customer lookup runs
+
+log = logging.getLogger("car_rental.dashboard")
+
+
+OVERVIEW_LABELS = (("cars", "Total Cars"), ("customers", "Total Customers"),
+                   ("reservations", "Total Reservations"), ("open_rentals", "Open Rentals"))
+
+
+def show_overview(frame, totals):
+    """Show the ``totals`` counters in the overview frame, updating its labels in place."""
+    labels = getattr(frame, "overview_labels", None)
+    if labels is None:
+        tk.Label(frame, text="Overview", font=("Arial", 16, "bold"), bg="#282828", fg="white").pack(pady=10)
+        labels = frame.overview_labels = {}
+        for name, _ in OVERVIEW_LABELS:
+            labels[name] = tk.Label(frame, font=("Arial", 12), bg="#282828", fg="white")
+            labels[name].pack(pady=5)
+    for name, title in OVERVIEW_LABELS:
+        labels[name].config(text=f"{title}: {totals.get(name, 0)}")
+
+
+def load_overview(frame):
+    """Load overview data into the overview frame in the background."""
+    # One read of the counters table instead of a COUNT(*) per table
+    get_worker().submit(get_overview, on_success=lambda totals: show_overview(frame, totals),
+                        channel="overview")
+
+
+class PagedTable:
+    """Keeps a sliding window of rows in a Treeview, loading pages on scroll.
+
+    Only ``WINDOW_PAGES`` pages are ever inserted; scrolling near either edge
+    fetches the next page with a keyset query and drops one from the far end.
+    Sorting and filtering are done by the database, and every page is
+    fetched on the background worker so the window stays responsive.
+    """
+
+    def __init__(self, table, scrollbar, page_size=PAGE_SIZE, window_pages=WINDOW_PAGES, worker=None):
+        self.table = table
+        self.scrollbar = scrollbar
+        self.page_size = page_size
+        self.max_rows = page_size * window_pages
+        self.worker = worker or get_worker()
+        self.channel = f"paged-table-{id(self)}"
+        self.view = None
+        self.view_name = None
+        self.sort_index = 0
+        self.descending = False
+        self.text_filter = ""
+        self.rows = []              # rows currently in the Treeview, in display order
+        self.more_below = False
+        self.more_above = False
+        self._busy = False          # a page request is outstanding
+        table.configure(yscrollcommand=self._on_scroll)
+
+    def show(self, view_name):
+        """Switch to another view, keeping the current sort column and filter."""
+        self.view = TABLE_VIEWS[view_name]
+        self.view_name = view_name
+        self.reload()
+
+    def sort_by(self, column_index):
+        """Sort by a column; clicking the same column again reverses the order."""
+        if column_index == self.sort_index:
+            self.descending = not self.descending
+        else:
+            self.sort_index, self.descending = column_index, False
+        self.reload()
+
+    def set_filter(self, text):
+        self.text_filter = text.strip()
+        self.reload()
+
+    def reload(self):
+        """Drop the window and load the first page again (supersedes pending pages)."""
+        if self.view is None:
+            return
+
+        def on_rows(rows):
+            self.table.delete(*self.table.get_children())
+            self.rows = []
+            self.more_above = False
+            self._append(rows)
+            self.table.yview_moveto(0)
+
+        self._fetch(on_rows)
+
+    def _boundary(self, row):
+        return row[self.sort_index], row[0]
+
+    def _fetch(self, on_rows, after=None, before=None):
+        sql, params = build_page_query(self.view, self.sort_index, self.descending, self.text_filter,
+                                       after=after, before=before, limit=self.page_size)
+
+        def on_success(rows):
+            self._busy = False
+            on_rows(rows)
+
+        def on_error(e):
+            self._busy = False
+            show_error(e)
+
+        self._busy = True
+        self.worker.submit(fetch_all, sql, params, on_success=on_success, on_error=on_error,
+                           channel=self.channel)
+
+    def _append(self, rows):
+        self.more_below = len(rows) == self.page_size  # a full page, before dropping rows shown already
+        rows = [row for row in rows if not self.table.exists(row[0])]  # patched in meanwhile
+        for row in rows:
+            self.table.insert("", "end", iid=row[0], values=row)
+        self.rows.extend(rows)
+        overflow = len(self.rows) - self.max_rows
+        if overflow > 0:
+            self.table.delete(*self.table.get_children()[:overflow])
+            del self.rows[:overflow]
+            self.more_above = True
+        return max(overflow, 0)
+
+    def _prepend(self, rows):
+        self.more_above = len(rows) == self.page_size
+        rows = [row for row in reversed(rows) if not self.table.exists(row[0])]  # fetched in reverse display order
+        for position, row in enumerate(rows):
+            self.table.insert("", position, iid=row[0], values=row)
+        self.rows[:0] = rows
+        overflow = len(self.rows) - self.max_rows
+        if overflow > 0:
+            self.table.delete(*self.table.get_children()[-overflow:])
+            del self.rows[-overflow:]
+            self.more_below = True
+        return len(rows)
+
+    def apply_changes(self, keys, rows):
+        """Patch the window after the rows with ``keys`` changed; ``rows`` is what they are now.
+
+        Rows already shown are updated or dropped where they are.  New rows
+        are inserted only where they sort inside the window (ordered like
+        Python orders the values, which a case-insensitive collation may
+        not match exactly); the rest turn up when scrolled to.
+        """
+        current = {row[0]: row for row in rows}
+        for key in keys:
+            if key not in current and self.table.exists(key):
+                self.table.delete(key)
+                self.rows = [row for row in self.rows if row[0] != key]
+        for key, row in current.items():
+            if self.table.exists(key):
+                self.table.item(key, values=row)
+                self.rows = [row if shown[0] == key else shown for shown in self.rows]
+                continue
+            position = self._position(row)
+            if position is not None:
+                self.table.insert("", position, iid=key, values=row)
+                self.rows.insert(position, row)
+        overflow = len(self.rows) - self.max_rows
+        if overflow > 0:
+            self.table.delete(*self.table.get_children()[-overflow:])
+            del self.rows[-overflow:]
+            self.more_below = True
+
+    def _position(self, row):
+        """Where ``row`` goes in the window, or ``None`` if it sorts outside it."""
+        def before(a, b):  # a is displayed before b
+            return (self._boundary(a) > self._boundary(b)) if self.descending else \
+                (self._boundary(a) < self._boundary(b))
+
+        try:
+            if self.rows and ((self.more_above and before(row, self.rows[0]))
+                              or (self.more_below and before(self.rows[-1], row))):
+                return None
+            return sum(1 for shown in self.rows if before(shown, row))
+        except TypeError:  # values Python cannot compare (NULLs)
+            return None
+
+    def _top_row(self):
+        """Index (fractional) of the row at the top of the view."""
+        return self.table.yview()[0] * len(self.rows)
+
+    def _on_scroll(self, first, last):
+        self.scrollbar.set(first, last)
+        if self._busy or not self.rows:
+            return
+        first, last = float(first), float(last)
+        # Pages arrive later, so the position is re-read when they are applied
+        if last > 0.9 and self.more_below:
+            def on_rows(rows):
+                top_row = self._top_row()
+                top_row -= self._append(rows)
+                self.table.yview_moveto(top_row / len(self.rows))
+            self._fetch(on_rows, after=self._boundary(self.rows[-1]))
+        elif first < 0.1 and self.more_above:
+            def on_rows(rows):
+                top_row = self._top_row()
+                top_row += self._prepend(rows)
+                self.table.yview_moveto(top_row / len(self.rows))
+            self._fetch(on_rows, before=self._boundary(self.rows[0]))
+
+
+class LiveRefresh:
+    """Keeps the overview and the table current from the change journal.
+
+    Every ``interval_ms`` the worker reads the journal entries written since
+    the last poll; only the overview counters and the changed rows of the
+    table on show are then reread and patched in, and changed cars,
+    bookings and customers are applied to the search tabs.  Bulk changes
+    reload.
+    """
+
+    def __init__(self, root, paged_table, overview_frame, worker, interval_ms=JOURNAL_POLL_MS):
+        self.root = root
+        self.paged_table = paged_table
+        self.overview_frame = overview_frame
+        self.worker = worker
+        self.interval_ms = interval_ms
+        self.reader = JournalReader()
+        self._schedule()
+
+    def _schedule(self):
+        # The next poll is only scheduled once this one is answered: the reader is not thread-safe
+        self.root.after(self.interval_ms, self._poll)
+
+    def _poll(self):
+        self.worker.submit(self._read, self.paged_table.view_name, self.paged_table.text_filter,
+                           on_success=self._apply, on_error=self._failed)
+
+    def _failed(self, e):
+        log.warning("Reading the change journal failed, trying again: %s", e)
+        self._schedule()
+
+    def _read(self, view_name, text_filter):
+        changes = self.reader.poll()
+        keys, rows = set(), []
+        if changes.reload:
+            set_catalog(None)  # the search indexes reload on next use
+            set_index(None)
+            set_customer_index(None)
+        else:
+            refresh_cars(changes.row_ids("cars"))
+            refresh_reservations(changes.row_ids("reservations"))
+            refresh_customers(changes.row_ids("customers"))
+        if changes.reload:
+            keys = None
+        elif view_name is not None:
+            view = TABLE_VIEWS[view_name]
+            keys = changes.row_ids(view["table"])
+            if keys:
+                rows = fetch_all(*build_rows_query(view, keys, text_filter))
+        return changes, view_name, keys, rows
+
+    def _apply(self, result):
+        changes, view_name, keys, rows = result
+        try:
+            if changes:
+                load_overview(self.overview_frame)
+            if view_name is not None and view_name == self.paged_table.view_name:
+                if keys is None:
+                    self.paged_table.reload()
+                elif keys:
+                    self.paged_table.apply_changes(keys, rows)
+        finally:
+            self._schedule()
+
+
+class AnalyticsTab:
+    """Fleet utilization, revenue per car-day and an occupancy heatmap for a date range.
+
+    The figures come from ``analytics`` (NumPy), computed on the worker;
+    without NumPy the tab just says so.
+    """
+
+    COLUMNS = ("Group", "Cars", "Booked days", "Utilization", "Revenue", "Per car-day")
+    HEATMAP_ROWS = 15     # busiest groups shown
+    HEATMAP_COLUMNS = 60  # days are bucketed to fit
+    CELL_HEIGHT = 14
+
+    def __init__(self, parent, worker=None):
+        self.worker = worker or get_worker()
+        self.frame = tk.Frame(parent, bg="#282828")
+
+        controls = tk.Frame(self.frame, bg="#282828")
+        controls.pack(side="top", fill="x")
+        today = date.today()
+        self.start_var = tk.StringVar(value=(today - timedelta(days=30)).isoformat())
+        self.end_var = tk.StringVar(value=today.isoformat())
+        self.by_var = tk.StringVar(value="model")
+        for text, widget in (("From:", tk.Entry(controls, textvariable=self.start_var, width=11)),
+                             ("To:", tk.Entry(controls, textvariable=self.end_var, width=11)),
+                             ("By:", ttk.Combobox(controls, textvariable=self.by_var, width=8, state="readonly",
+                                                  values=("office", "model", "car")))):
+            tk.Label(controls, text=text, font=("Arial", 12), bg="#282828", fg="white").pack(side="left", padx=(10, 2))
+            widget.pack(side="left", pady=10)
+        tk.Button(controls, text="Refresh", font=("Arial", 12), bg="#4CAF50", fg="white",
+                  command=self.refresh).pack(side="left", padx=10)
+        self.summary = tk.Label(controls, text="Pick a range and press Refresh.", font=("Arial", 11),
+                                bg="#282828", fg="white")
+        self.summary.pack(side="left", padx=10)
+
+        self.table = ttk.Treeview(self.frame, columns=self.COLUMNS, show="headings", height=8)
+        for column in self.COLUMNS:
+            self.table.heading(column, text=column)
+            self.table.column(column, width=110, anchor="w" if column == "Group" else "e")
+        self.table.pack(side="top", fill="both", expand=True)
+
+        self.heatmap = tk.Canvas(self.frame, bg="#282828", highlightthickness=0,
+                                 height=self.CELL_HEIGHT * (self.HEATMAP_ROWS + 1) + 10)
+        self.heatmap.pack(side="top", fill="x")
+
+    def refresh(self):
+        try:
+            start = date.fromisoformat(self.start_var.get().strip())
+            end = date.fromisoformat(self.end_var.get().strip())
+        except ValueError:
+            showerror("Analytics", "Enter the dates as YYYY-MM-DD.")
+            return
+        if end <= start:
+            showerror("Analytics", "The end date must be after the start date.")
+            return
+        self.summary.config(text="Loading...")
+        self.worker.submit(self._compute, start, end, self.by_var.get(), on_success=self._show,
+                           on_error=self._on_error, channel="analytics")
+
+    def _compute(self, start, end, by):
+        """Runs on the worker: load the range and compute everything the tab shows."""
+        import analytics  # needs NumPy, which the rest of the dashboard does not
+
+        data = analytics.load_fleet(start, end)
+        bucket_days = max(1, -(-data.days // self.HEATMAP_COLUMNS))
+        return (analytics.utilization(data, "fleet")[0], analytics.utilization(data, by),
+                analytics.occupancy_heatmap(data, by, bucket_days))
+
+    def _on_error(self, e):
+        if isinstance(e, ImportError):
+            self.summary.config(text="Analytics needs NumPy (pip install numpy).")
+        else:
+            self.summary.config(text="")
+            show_error(e)
+
+    def _show(self, result):
+        fleet, rows, (labels, bucket_starts, matrix) = result
+        _, cars, booked, share, revenue, per_car_day = fleet
+        self.summary.config(text=f"{cars} cars, {share:.1%} utilized, revenue {revenue:,.2f}, "
+                                 f"{per_car_day:,.2f} per car-day")
+        self.table.delete(*self.table.get_children())
+        for label, cars, booked, share, revenue, per_car_day in rows:
+            self.table.insert("", "end", values=(label, cars, booked, f"{share:.1%}", f"{revenue:,.2f}",
+                                                 f"{per_car_day:,.2f}"))
+        self._draw_heatmap([row[0] for row in rows[:self.HEATMAP_ROWS]], labels, bucket_starts, matrix)
+
+    def _draw_heatmap(self, shown, labels, bucket_starts, matrix):
+        canvas = self.heatmap
+        canvas.delete("all")
+        position = {label: index for index, label in enumerate(labels)}
+        left = 130
+        width = max(1, (canvas.winfo_width() - left - 10) // max(1, len(bucket_starts)))
+        for row, label in enumerate(shown):
+            y = row * self.CELL_HEIGHT
+            canvas.create_text(left - 5, y + self.CELL_HEIGHT // 2, text=str(label)[:18], anchor="e",
+                               fill="white", font=("Arial", 8))
+            for column, value in enumerate(matrix[position[label]].tolist()):
+                cool = int(255 * (1 - min(value, 1.0)))  # white when idle, red when every car is out
+                canvas.create_rectangle(left + column * width, y, left + (column + 1) * width, y + self.CELL_HEIGHT,
+                                        fill=f"#ff{cool:02x}{cool:02x}", width=0)
+        if bucket_starts:
+            y = len(shown) * self.CELL_HEIGHT + 2
+            canvas.create_text(left, y, text=bucket_starts[0].isoformat(), anchor="nw", fill="#aaaaaa",
+                               font=("Arial", 8))
+            canvas.create_text(left + len(bucket_starts) * width, y, text=bucket_starts[-1].isoformat(),
+                               anchor="ne", fill="#aaaaaa", font=("Arial", 8))
+
+
+class FleetSearchTab:
+    """Search the fleet by model, year, color, daily rate, office and status, optionally free for given dates.
+
+    Searches run on the worker against the in-memory ``catalog``; each new
+    search supersedes one still running.
+    """
+
+    COLUMNS = ("ID", "Model", "Year", "Color", "Daily rate", "Office", "Status")
+
+    def __init__(self, parent, worker=None):
+        self.worker = worker or get_worker()
+        self.frame = tk.Frame(parent, bg="#282828")
+
+        self.vars = {name: tk.StringVar() for name in ("model", "year_from", "year_to", "color", "rate_min",
+                                                       "rate_max", "office", "status", "pick_up",
+                                                       "return_time")}
+        self.vars["status"].set("active")
+        rows = ((("Model:", "model", 14), ("Years:", "year_from", 6), ("to", "year_to", 6), ("Color:", "color", 9)),
+                (("Rate:", "rate_min", 7), ("to", "rate_max", 7), ("Free from:", "pick_up", 11),
+                 ("to", "return_time", 11)))
+        for fields in rows:
+            controls = tk.Frame(self.frame, bg="#282828")
+            controls.pack(side="top", fill="x")
+            for text, name, width in fields:
+                tk.Label(controls, text=text, font=("Arial", 12), bg="#282828", fg="white").pack(side="left",
+                                                                                                   padx=(10, 2))
+                entry = tk.Entry(controls, textvariable=self.vars[name], width=width)
+                entry.pack(side="left", pady=5)
+                entry.bind("<Return>", lambda event: self.search())
+        tk.Label(controls, text="Office:", font=("Arial", 12), bg="#282828", fg="white").pack(side="left",
+                                                                                             padx=(10, 2))
+        # Filled with the offices the catalog knows after each search; none on the app schema
+        self.offices = ttk.Combobox(controls, textvariable=self.vars["office"], width=6, state="readonly",
+                                    values=("",))
+        self.offices.pack(side="left")
+        tk.Label(controls, text="Status:", font=("Arial", 12), bg="#282828", fg="white").pack(side="left",
+                                                                                             padx=(10, 2))
+        ttk.Combobox(controls, textvariable=self.vars["status"], width=14, state="readonly",
+                     values=("", "active", "out_of_service")).pack(side="left")
+        tk.Button(controls, text="Search", font=("Arial", 12), bg="#4CAF50", fg="white",
+                  command=self.search).pack(side="left", padx=10)
+        self.summary = tk.Label(self.frame, text="Fill in any of the filters and press Search.", font=("Arial", 11),
+                                bg="#282828", fg="white", anchor="w")
+        self.summary.pack(side="top", fill="x", padx=10)
+
+        self.table = ttk.Treeview(self.frame, columns=self.COLUMNS, show="headings")
+        for column in self.COLUMNS:
+            self.table.heading(column, text=column)
+            self.table.column(column, width=110, anchor="w" if column in ("Model", "Color", "Status") else "e")
+        self.table.pack(side="top", fill="both", expand=True)
+
+    def _filters(self):
+        """The form as ``catalog.search`` arguments; raises ValueError on a bad field."""
+        text = {name: var.get().strip() for name, var in self.vars.items()}
+        filters = {"model": text["model"], "color": text["color"], "status": text["status"] or None,
+                   "office": int(text["office"]) if text["office"] else None}
+        for name in ("year_from", "year_to"):
+            filters[name] = int(text[name]) if text[name] else None
+        for name in ("rate_min", "rate_max"):
+            filters[name] = float(text[name]) if text[name] else None
+        for name in ("pick_up", "return_time"):
+            filters[name] = date.fromisoformat(text[name]).isoformat() if text[name] else None
+        if bool(filters["pick_up"]) != bool(filters["return_time"]):
+            raise ValueError("Enter both dates, or neither.")
+        if filters["pick_up"] and filters["return_time"] <= filters["pick_up"]:
+            raise ValueError("The end date must be after the start date.")
+        return filters
+
+    def search(self):
+        try:
+            filters = self._filters()
+        except ValueError as e:
+            showerror("Fleet search", f"{e}\nYears are whole numbers, rates amounts, dates YYYY-MM-DD.")
+            return
+        self.summary.config(text="Searching...")
+        self.worker.submit(self._search, filters, on_success=self._show, on_error=self._on_error,
+                           channel="fleet-search")
+
+    @staticmethod
+    def _search(filters):
+        """Runs on the worker: the first load of the catalog reads the whole fleet."""
+        import catalog
+
+        started = time.perf_counter()
+        rows, matched = catalog.search(**filters)
+        return rows, matched, time.perf_counter() - started, catalog.get_catalog().values("office")
+
+    def _on_error(self, e):
+        self.summary.config(text="")
+        show_error(e)
+
+    def _show(self, result):
+        rows, matched, seconds, offices = result
+        self.offices.config(values=("", *offices))
+        free = " free on those dates" if self.vars["pick_up"].get().strip() else ""
+        self.summary.config(text=f"{matched:,} cars match the filters; showing {len(rows)}{free} "
+                                 f"({seconds * 1000:.1f} ms)")
+        self.table.delete(*self.table.get_children())
+        for car_id, model, year, color, rate, office, status in rows:
+            self.table.insert("", "end", values=(car_id, model, year, color, f"{rate:,.2f}",
+                                                 "" if office is None else office, status))
+
+
+class CustomerLookupTab:
+    """Find customers by the start of a name, phone or licence number as the clerk types.
+
+    Lookups wait for a short pause in typing, then run on the worker
+    against the in-memory ``customer_index``; a newer one cancels the last.
+    """
+
+    COLUMNS = ("ID", "Name", "Phone", "Licence")
+
+    def __init__(self, parent, worker=None):
+        self.worker = worker or get_worker()
+        self.frame = tk.Frame(parent, bg="#282828")
+        self._pending = None
+
+        controls = tk.Frame(self.frame, bg="#282828")
+        controls.pack(side="top", fill="x")
+        tk.Label(controls, text="Find customer:", font=("Arial", 12), bg="#282828", fg="white").pack(
+            side="left", padx=(10, 2))
+        self.text_var = tk.StringVar()
+        entry = tk.Entry(controls, textvariable=self.text_var, width=40)
+        entry.pack(side="left", pady=10)
+        entry.bind("<KeyRelease>", self._typed)
+        self.summary = tk.Label(controls, text="Type part of a name, a phone or a licence number.",
+                                font=("Arial", 11), bg="#282828", fg="white")
+        self.summary.pack(side="left", padx=10)
+
+        self.table = ttk.Treeview(self.frame, columns=self.COLUMNS, show="headings")
+        for column in self.COLUMNS:
+            self.table.heading(column, text=column)
+            self.table.column(column, width=80 if column == "ID" else 180, anchor="e" if column == "ID" else "w")
+        self.table.pack(side="top", fill="both", expand=True)
+
+    def _typed(self, event=None):
+        if self._pending is not None:
+            self.frame.after_cancel(self._pending)
+        self._pending = self.frame.after(LOOKUP_DEBOUNCE_MS, self.lookup)
+
+    def lookup(self):
+        self._pending = None
+        text = self.text_var.get().strip()
+        if not text:
+            self.worker.cancel("customer-lookup")
+            self.table.delete(*self.table.get_children())
+            self.summary.config(text="")
+            return
+        self.worker.submit(self._lookup, text, on_success=self._show, on_error=self._on_error,
+                           channel="customer-lookup")
+
+    @staticmethod
+    def _lookup(text):
+        """Runs on the worker: the first lookup loads the index of every customer."""
+        import customer_index
+
+        started = time.perf_counter()
+        rows = customer_index.lookup(text)
+        return rows, time.perf_counter() - started
+
+    def _on_error(self, e):
+        self.summary.config(text="")
+        show_error(e)
+
+    def _show(self, result):
+        rows, seconds = result
+        self.summary.config(text=f"{len(rows)} found ({seconds * 1000:.2f} ms)")
+        self.table.delete(*self.table.get_children())
+        for customer_id, name, phone, licence in rows:
+            self.table.insert("", "end", values=(customer_id, name, phone or "", licence or ""))
+
+
+def show_dashboard():
+    """Show the dashboard window."""
+    root = tk.Tk()
+    root.title("Car Rental System Dashboard")
+    root.geometry("800x600")
+    root.configure(bg="#282828")
+    worker = get_worker()
+    worker.attach(root)  # Deliver background query results to this window
+
+    # Overview Frame
+    overview_frame = tk.Frame(root, bg="#282828")
+    overview_frame.pack(side="top", fill="x")
+    load_overview(overview_frame)
+
+    notebook = ttk.Notebook(root)
+    notebook.pack(side="top", fill="both", expand=True)
+    tables_tab = tk.Frame(notebook, bg="#282828")
+    notebook.add(tables_tab, text="Tables")
+    analytics_tab = AnalyticsTab(notebook, worker)
+    notebook.add(analytics_tab.frame, text="Analytics")
+    search_tab = FleetSearchTab(notebook, worker)
+    notebook.add(search_tab.frame, text="Fleet search")
+    lookup_tab = CustomerLookupTab(notebook, worker)
+    notebook.add(lookup_tab.frame, text="Customers")
+
+    # Table Frame
+    table_frame = tk.Frame(tables_tab)
+    table_frame.pack(side="top", fill="both", expand=True)
+
+    table = ttk.Treeview(table_frame, columns=("ID", "Name", "Details"), show="headings")
+    table.pack(side="left", fill="both", expand=True)
+
+    scrollbar = ttk.Scrollbar(table_frame, orient="vertical", command=table.yview)
+    scrollbar.pack(side="right", fill="y")
+
+    # Rows are loaded a page at a time as the scrollbar moves
+    paged_table = PagedTable(table, scrollbar)
+    for index, heading in enumerate(("ID", "Name", "Details")):
+        table.heading(heading, text=heading, command=lambda index=index: paged_table.sort_by(index))
+
+    # Button Frame
+    button_frame = tk.Frame(tables_tab, bg="#282828")
+    button_frame.pack(side="bottom", fill="x")
+
+    def load_cars():
+        paged_table.show("cars")
+
+    def load_customers():
+        paged_table.show("customers")
+
+    def load_reservations():
+        paged_table.show("reservations")
+
+    filter_var = tk.StringVar()
+    filter_entry = tk.Entry(button_frame, textvariable=filter_var, font=("Arial", 12), width=15)
+    filter_entry.pack(side="right", padx=10, pady=10)
+    filter_entry.bind("<Return>", lambda event: paged_table.set_filter(filter_var.get()))
+    tk.Label(button_frame, text="Filter:", font=("Arial", 12), bg="#282828", fg="white").pack(side="right")
+
+    tk.Button(button_frame, text="View Cars", font=("Arial", 12), bg="#4CAF50", fg="white", command=load_cars).pack(side="left", padx=10, pady=10)
+    tk.Button(button_frame, text="View Customers", font=("Arial", 12), bg="#4CAF50", fg="white", command=load_customers).pack(side="left", padx=10, pady=10)
+    tk.Button(button_frame, text="View Reservations", font=("Arial", 12), bg="#4CAF50", fg="white", command=load_reservations).pack(side="left", padx=10, pady=10)
+
+    # Background queue depth and latency of the last answered query
+    worker_label = tk.Label(button_frame, font=("Arial", 10), bg="#282828", fg="#aaaaaa")
+    worker_label.pack(side="left", padx=10)
+
+    def refresh_worker_stats():
+        stats = worker.stats()
+        worker_label.config(text=f"Queue: {stats['queue_depth']}  Last query: {stats['last_latency'] * 1000:.0f} ms")
+        root.after(1000, refresh_worker_stats)
+
+    refresh_worker_stats()
+    LiveRefresh(root, paged_table, overview_frame, worker)  # changes made elsewhere show up by themselves
+
+    root.mainloop()
+
+
+if __name__ == "__main__":
+    show_dashboard()
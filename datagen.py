@@ -0,0 +1,283 @@
+"""Synthetic car rental data at production scale.
+
+Fills either schema the project uses:
+
+* ``app``    - the ``cars``/``customers``/``reservations`` tables the GUI
+               works on (``car_rental.db`` and its MySQL twin);
+* ``rental`` - the ``Office``/``Customer``/``Car``/``Reservation``/``Payment``
+               schema of ``database.txt`` (the MySQL ``CarRentalSystem``).
+
+Reservations follow each car along its own timeline, so a car is never
+double-booked: rental lengths are log-normal (mostly 2-5 days, a long tail
+up to a month), idle gaps shrink in the summer and December peaks, pick-ups
+happen during office hours and about one rental in seven is one-way.
+
+    python datagen.py --db bench.db --customers 1000000 --cars 50000 --reservations 5000000
+    python datagen.py --target mysql --schema rental --reservations 2000000
+"""
+import argparse
+import hashlib
+import random
+import time
+from datetime import date, datetime, timedelta
+
+from db import mysql_connect, sqlite_connect
+from pricing import MODEL_RATES
+from schema import create_schema
+
+CHUNK_SIZE = 10000
+
+# (model, daily rate) - rates roughly follow the samples in database.txt
+MODELS = list(MODEL_RATES.items())
+COLORS = ['Red', 'Blue', 'Black', 'White', 'Silver', 'Green']  # as offered by the GUI
+COUNTRIES = ["Egypt", "USA", "UK", "Germany", "France", "UAE", "Saudi Arabia", "Italy", "Spain", "Canada"]
+FIRST_NAMES = ["John", "Jane", "Ahmed", "Mona", "Omar", "Sara", "Ali", "Laila", "David", "Emma",
+               "Youssef", "Nour", "Karim", "Hana", "Michael", "Olivia", "Mostafa", "Farida"]
+LAST_NAMES = ["Doe", "Smith", "Hassan", "Ibrahim", "Mahmoud", "Brown", "Said", "Adel", "Wilson",
+              "Taylor", "Fathy", "Kamal", "Garcia", "Martin", "Salem", "Nabil"]
+PAYMENT_METHODS = ["credit_card", "debit_card", "cash", "bank_transfer"]
+
+# Demand by month (January first): summer and the December holidays are busiest.
+SEASON = [0.8, 0.75, 0.9, 1.0, 1.1, 1.3, 1.5, 1.5, 1.1, 0.95, 0.85, 1.25]
+
+ONE_WAY_SHARE = 0.15
+CANCELLED_SHARE = 0.05
+
+
+def rental_days(rng):
+    """Rental length in days: log-normal, median about three days, capped at 30."""
+    return max(1, min(30, round(rng.lognormvariate(1.1, 0.6))))
+
+
+def generate_offices(count, first_id=1):
+    """Yield ``(OfficeID, OfficeName, Address, Phone, Email)`` rows."""
+    for office_id in range(first_id, first_id + count):
+        yield (office_id, f"Branch {office_id}", f"{office_id} Main St, City {office_id % 97}, Country",
+               f"+1{office_id:010d}", f"branch{office_id}@carrentals.com")
+
+
+def generate_customers(count, rng, first_id=1):
+    """Yield ``(id, first, last, email, phone, address, birth, licence, licence expiry, country)``."""
+    today = date.today()
+    for customer_id in range(first_id, first_id + count):
+        first, last = rng.choice(FIRST_NAMES), rng.choice(LAST_NAMES)
+        birth = today - timedelta(days=rng.randint(18 * 365, 75 * 365))
+        expiry = today + timedelta(days=rng.randint(-180, 5 * 365))
+        yield (customer_id, first, last, f"{first.lower()}.{last.lower()}{customer_id}@example.com",
+               f"+2{customer_id:010d}", f"{rng.randint(1, 999)} {rng.choice(LAST_NAMES)} St",
+               birth, f"DL{customer_id:08d}", expiry, rng.choice(COUNTRIES))
+
+
+def generate_cars(count, office_ids, rng, first_id=1):
+    """Yield ``(id, model, year, plate, status, color, rate, office_id)``."""
+    this_year = date.today().year
+    for car_id in range(first_id, first_id + count):
+        model, rate = rng.choice(MODELS)
+        status = "out_of_service" if rng.random() < 0.03 else "active"
+        yield (car_id, model, rng.randint(this_year - 8, this_year), f"P{car_id:07d}", status,
+               rng.choice(COLORS), rate, rng.choice(office_ids))
+
+
+def generate_reservations(count, cars, customer_ids, office_ids, rng, first_id=1, history_days=730):
+    """Yield reservations as ``(id, customer, car, start, end, pickup, return, status, cost)``.
+
+    Each car gets an equal share of ``count`` laid end to end from
+    ``history_days`` ago, so past, ongoing and future bookings all exist.
+    """
+    now = datetime.now().replace(minute=0, second=0, microsecond=0)
+    origin = now - timedelta(days=history_days)
+    per_car, extra = divmod(count, len(cars))
+    reservation_id = first_id
+    for position, (car_id, _, _, _, _, _, rate, office_id) in enumerate(cars):
+        bookings = per_car + (1 if position < extra else 0)
+        if not bookings:
+            continue
+        # Average idle time between rentals so the bookings span the history window
+        mean_gap = max(0.5, history_days / bookings - 3.5)
+        moment = (origin + timedelta(days=rng.uniform(0, mean_gap))).replace(minute=0, second=0, microsecond=0)
+        for _ in range(bookings):
+            gap = rng.expovariate(SEASON[moment.month - 1] / mean_gap)
+            start = (moment + timedelta(days=gap)).replace(hour=rng.randint(8, 18), minute=0, second=0,
+                                                           microsecond=0)
+            start = max(start, moment)  # an earlier hour on the day the last booking ends would overlap it
+            days = rental_days(rng)
+            end = start + timedelta(days=days)
+            return_office = rng.choice(office_ids) if rng.random() < ONE_WAY_SHARE else office_id
+            if rng.random() < CANCELLED_SHARE:
+                status = "cancelled"
+            else:
+                status = "completed" if end < now else "confirmed"
+                moment = end  # cancelled bookings do not occupy the car
+            yield (reservation_id, rng.choice(customer_ids), car_id, start, end, office_id,
+                   return_office, status, round(days * rate, 2))
+            reservation_id += 1
+
+
+def generate_payments(reservations, rng, first_id=1):
+    """Yield ``(PaymentID, ReservationID, Amount, PaymentDate, PaymentMethod, Status)``."""
+    payment_id = first_id
+    for reservation_id, _, _, start, _, _, _, status, cost in reservations:
+        if status == "cancelled":
+            continue
+        if status == "completed":
+            payment_status = "failed" if rng.random() < 0.02 else "completed"
+        else:
+            payment_status = "pending"
+        yield (payment_id, reservation_id, cost, start - timedelta(days=rng.randint(0, 20)),
+               rng.choice(PAYMENT_METHODS), payment_status)
+        payment_id += 1
+
+
+def _chunks(rows, size=CHUNK_SIZE):
+    chunk = []
+    for row in rows:
+        chunk.append(row)
+        if len(chunk) == size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def _insert(conn, sql, rows, label):
+    """Insert rows in chunks, one transaction per chunk; returns the row count."""
+    started, total = time.perf_counter(), 0
+    cursor = conn.cursor()
+    for chunk in _chunks(rows):
+        cursor.executemany(sql, chunk)
+        conn.commit()
+        total += len(chunk)
+    elapsed = time.perf_counter() - started
+    print(f"  {label:<24}{total:>12,} rows {elapsed:8.1f}s ({total / elapsed if elapsed else 0:,.0f} rows/s)")
+    return total
+
+
+def _next_id(conn, table, column):
+    cursor = conn.cursor()
+    cursor.execute(f"SELECT COALESCE(MAX({column}), 0) FROM {table}")
+    return cursor.fetchone()[0] + 1
+
+
+def fill_app_schema(conn, customers, cars, reservations, seed=1):
+    """Append synthetic rows to the ``cars``/``customers``/``reservations`` tables."""
+    rng = random.Random(seed)
+    first_customer = _next_id(conn, "customers", "id")
+    first_car = _next_id(conn, "cars", "id")
+    first_reservation = _next_id(conn, "reservations", "id")
+
+    _insert(conn, "INSERT INTO customers (id, name, phone, email, country) VALUES (%s, %s, %s, %s, %s)",
+            ((row[0], f"{row[1]} {row[2]}", row[4], hashlib.md5(row[3].encode()).hexdigest(), row[9])
+             for row in generate_customers(customers, rng, first_customer)), "customers")
+    fleet = list(generate_cars(cars, [None], rng, first_car))
+    _insert(conn, "INSERT INTO cars (id, name, model_year, color, status) VALUES (%s, %s, %s, %s, %s)",
+            ((car[0], car[1], car[2], car[5], car[4]) for car in fleet), "cars")
+
+    customer_ids = range(first_customer, first_customer + customers) if customers else [1]
+    today = datetime.now()
+    ongoing = []
+
+    def app_rows():
+        for (reservation_id, customer_id, car_id, start, end, _, _, status, cost) in generate_reservations(
+                reservations, fleet, customer_ids, [None], rng, first_reservation):
+            if status == "cancelled":
+                continue  # the app table has no status column: a cancelled row would block the car
+            if status == "confirmed" and start <= today:
+                ongoing.append((car_id, customer_id, "rented", start.date().isoformat(), None))
+            yield (reservation_id, car_id, customer_id, (end - start).days,
+                   start.date().isoformat(), end.date().isoformat(), cost)
+
+    _insert(conn, "INSERT INTO reservations (id, car_id, customer_id, duration, pick_up, return_time, payment) "
+                  "VALUES (%s, %s, %s, %s, %s, %s, %s)", app_rows(), "reservations")
+    _insert(conn, "INSERT INTO car_reservation_status (car_id, customer_id, status, reservation_date, return_date) "
+                  "VALUES (%s, %s, %s, %s, %s)", ongoing, "car_reservation_status")
+
+
+def fill_rental_schema(conn, offices, customers, cars, reservations, seed=1):
+    """Append synthetic rows to the ``database.txt`` schema."""
+    rng = random.Random(seed)
+    first_office = _next_id(conn, "Office", "OfficeID")
+    first_customer = _next_id(conn, "Customer", "CustomerID")
+    first_car = _next_id(conn, "Car", "CarID")
+    first_reservation = _next_id(conn, "Reservation", "ReservationID")
+    first_payment = _next_id(conn, "Payment", "PaymentID")
+
+    _insert(conn, "INSERT INTO Office (OfficeID, OfficeName, Address, Phone, Email) VALUES (%s, %s, %s, %s, %s)",
+            generate_offices(offices, first_office), "Office")
+    _insert(conn, "INSERT INTO Customer (CustomerID, FirstName, LastName, Email, Phone, Address, DateOfBirth, "
+                  "LicenseNumber, LicenseExpirationDate) VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s)",
+            (row[:9] for row in generate_customers(customers, rng, first_customer)), "Customer")
+    office_ids = list(range(first_office, first_office + offices))
+    fleet = list(generate_cars(cars, office_ids, rng, first_car))
+    _insert(conn, "INSERT INTO Car (CarID, Model, Year, PlateID, Status, Color, DailyRentalRate, OfficeID) "
+                  "VALUES (%s, %s, %s, %s, %s, %s, %s, %s)", fleet, "Car")
+
+    customer_ids = range(first_customer, first_customer + customers) if customers else [1]
+    reservation_sql = ("INSERT INTO Reservation (ReservationID, CustomerID, CarID, StartDate, EndDate, "
+                       "PickupOfficeID, ReturnOfficeID, Status, TotalCost) "
+                       "VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s)")
+    payment_sql = ("INSERT INTO Payment (PaymentID, ReservationID, Amount, PaymentDate, PaymentMethod, Status) "
+                   "VALUES (%s, %s, %s, %s, %s, %s)")
+
+    # Each reservation chunk commits together with its payments, so memory stays
+    # flat and the Payment foreign key always finds its reservation.
+    started, booked, paid = time.perf_counter(), 0, 0
+    cursor = conn.cursor()
+    next_payment = first_payment
+    for chunk in _chunks(generate_reservations(reservations, fleet, customer_ids, office_ids,
+                                               rng, first_reservation)):
+        cursor.executemany(reservation_sql, chunk)
+        payments = list(generate_payments(chunk, rng, next_payment))
+        if payments:
+            cursor.executemany(payment_sql, payments)
+            next_payment = payments[-1][0] + 1
+        conn.commit()
+        booked += len(chunk)
+        paid += len(payments)
+    elapsed = time.perf_counter() - started
+    print(f"  {'Reservation + Payment':<24}{booked:>12,} + {paid:,} rows {elapsed:8.1f}s "
+          f"({(booked + paid) / elapsed if elapsed else 0:,.0f} rows/s)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Fill a car rental database with synthetic data.")
+    parser.add_argument("--target", choices=("sqlite", "mysql"), default="sqlite")
+    parser.add_argument("--db", help="SQLite file (required with --target sqlite)")
+    parser.add_argument("--schema", choices=("app", "rental"),
+                        help="tables to fill (default: app on SQLite, rental on MySQL)")
+    parser.add_argument("--offices", type=int, default=100)
+    parser.add_argument("--customers", type=int, default=100000)
+    parser.add_argument("--cars", type=int, default=10000)
+    parser.add_argument("--reservations", type=int, default=1000000)
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+    if args.target == "sqlite" and not args.db:
+        parser.error("--db is required with --target sqlite")
+    if args.cars < 1:
+        parser.error("--cars must be at least 1")
+    schema = args.schema or ("app" if args.target == "sqlite" else "rental")
+
+    if args.target == "sqlite":
+        conn = sqlite_connect(args.db)  # WAL and the other tuning come with the connection
+        conn.execute("PRAGMA synchronous=OFF")  # bulk load; a crash just means re-running
+    else:
+        conn = mysql_connect()
+    started = time.perf_counter()
+    try:
+        if args.target == "sqlite" or schema == "app":
+            create_schema(conn, schema, args.target)
+        print(f"Filling the {schema} schema on {args.target}:")
+        if schema == "app":
+            fill_app_schema(conn, args.customers, args.cars, args.reservations, args.seed)
+            from counters import reconcile
+            reconcile(conn)  # the overview counters must match the new rows
+        else:
+            fill_rental_schema(conn, args.offices, args.customers, args.cars, args.reservations, args.seed)
+        from migrations import migrate
+        migrate(conn, schema, pause=0)  # indexes are cheaper to build once the rows are in
+    finally:
+        conn.close()
+    print(f"Done in {time.perf_counter() - started:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,538 @@
+"""Shared, pooled data access for the car rental GUIs.
+
+Every screen used to open and tear down its own MySQL connection per query.
+This module keeps a small pool of live connections instead, so the TCP and
+authentication handshake is paid once per connection rather than once per
+click.  Connections handed out by the pool behave like normal connections;
+calling ``close()`` on them returns them to the pool.
+
+The pool can sit on either engine, MySQL or an embedded SQLite file; the
+app's SQL is written for MySQL and translated for SQLite on the fly.  The
+engine is picked with ``use_backend()`` or, by default, from the
+environment::
+
+    CAR_RENTAL_BACKEND=sqlite CAR_RENTAL_DB=branch.db python "Untitled-1.py"
+"""
+import os
+import re
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from functools import lru_cache
+
+import metrics
+
+
+DB_CONFIG = {
+    "host": "localhost",  # Update if phpMyAdmin runs on a different host
+    "user": "root",       # Replace with your MySQL username
+    "password": "",       # Replace with your MySQL password
+    "database": "CarRentalSystem",
+}
+
+DEFAULT_POOL_SIZE = 5
+DEFAULT_TIMEOUT = 10.0            # seconds to wait for a free connection
+DEFAULT_HEALTH_CHECK_INTERVAL = 30.0  # ping connections idle longer than this
+
+
+class PoolExhausted(Exception):
+    """Raised when no connection becomes free within the pool timeout."""
+
+
+def mysql_connect(**config):
+    """Open a raw MySQL connection using ``DB_CONFIG`` overridden by ``config``."""
+    import mysql.connector  # imported here so the pool module stays light
+
+    settings = dict(DB_CONFIG)
+    settings.update(config)
+    return mysql.connector.connect(**settings)
+
+
+@lru_cache(maxsize=256)
+def to_sqlite_sql(query):
+    """Translate the MySQL-flavoured SQL used across the app for SQLite.
+
+    Placeholders become ``?`` and row locks (``FOR UPDATE``) are dropped, as
+    SQLite locks the whole database for writing anyway.
+    """
+    return query.replace("%s", "?").replace(" FOR UPDATE", "")
+
+
+@lru_cache(maxsize=1)
+def database_errors():
+    """Exception classes raised by the drivers in use, for ``except`` clauses."""
+    import sqlite3
+
+    errors = [sqlite3.Error]
+    try:
+        from mysql.connector import Error
+    except ImportError:
+        pass
+    else:
+        errors.append(Error)
+    return tuple(errors)
+
+
+# MySQL error numbers worth retrying: lock wait timeout and deadlock
+TRANSIENT_ERRNOS = (1205, 1213)
+
+
+def is_transient(error):
+    """True for lock conflicts that a retry may get past (deadlock, busy SQLite file)."""
+    if getattr(error, "errno", None) in TRANSIENT_ERRNOS:
+        return True
+    message = str(error)
+    return "database is locked" in message or "database is busy" in message
+
+
+DUPLICATE_KEY_ERRNO = 1062
+_DUPLICATE_PATTERNS = (
+    re.compile(r"UNIQUE constraint failed: (\S+)"),          # sqlite3
+    re.compile(r"Duplicate entry .* for key '([^']+)'"),    # MySQL
+)
+
+
+def unique_violation(error):
+    """Column (or key) name of the unique constraint ``error`` broke, or ``None``.
+
+    SQLite names ``table.column``, MySQL the key - for a single-column
+    ``UNIQUE``, the column - prefixed by the table since 8.0.
+    """
+    message = str(error)
+    if "UNIQUE constraint failed" not in message and getattr(error, "errno", None) != DUPLICATE_KEY_ERRNO:
+        return None
+    for pattern in _DUPLICATE_PATTERNS:
+        match = pattern.search(message)
+        if match:
+            return match.group(1).split(",")[0].rsplit(".", 1)[-1]
+    return None
+
+
+class SQLiteCursor:
+    """Cursor accepting ``%s`` placeholders like mysql.connector's."""
+
+    def __init__(self, raw):
+        self._raw = raw
+
+    def execute(self, query, params=()):
+        self._raw.execute(to_sqlite_sql(query), params)
+        return self
+
+    def executemany(self, query, seq_of_params):
+        self._raw.executemany(to_sqlite_sql(query), seq_of_params)
+        return self
+
+    def __getattr__(self, name):
+        return getattr(self._raw, name)
+
+    def __iter__(self):
+        return iter(self._raw)
+
+
+class SQLiteConnection:
+    """sqlite3 connection whose cursors speak the app's MySQL-style SQL."""
+
+    def __init__(self, raw):
+        self._raw = raw
+
+    def cursor(self):
+        return SQLiteCursor(self._raw.cursor())
+
+    def __getattr__(self, name):
+        return getattr(self._raw, name)
+
+
+# WAL lets readers run beside the writer and turns a commit into an append to
+# the log; with synchronous=NORMAL the fsync waits for the next checkpoint, so
+# consecutive commits share one.  Reads go through the memory map.
+SQLITE_PRAGMAS = {
+    "journal_mode": "WAL",
+    "synchronous": "NORMAL",
+    "mmap_size": 256 * 1024 * 1024,
+    "cache_size": -64 * 1024,      # in KiB: a 64 MB page cache per connection
+    "temp_store": "MEMORY",
+    "wal_autocheckpoint": 4000,    # pages: fewer, larger checkpoints
+}
+SQLITE_STATEMENT_CACHE = 512  # prepared statements kept per connection (sqlite3's default is 128)
+
+
+class MySQLBackend:
+    """The MySQL server in ``DB_CONFIG``; keywords override single settings."""
+
+    name = "mysql"
+
+    def __init__(self, **config):
+        self.config = config
+
+    def connect(self):
+        return mysql_connect(**self.config)
+
+    def prepare(self, conn):
+        """Nothing to do: the server's tables are managed by its administrator."""
+
+    def __repr__(self):
+        return f"mysql:{self.config.get('database', DB_CONFIG['database'])}"
+
+
+class SQLiteBackend:
+    """An embedded SQLite file, tuned for throughput.
+
+    Pooled connections live as long as the pool, so the statements sqlite3
+    prepares are reused across calls; ``to_sqlite_sql`` hands back the same
+    translated text for the same query, which is what the cache is keyed by.
+    """
+
+    name = "sqlite"
+
+    def __init__(self, path="car_rental.db", pragmas=None, statement_cache=SQLITE_STATEMENT_CACHE):
+        self.path = path
+        self.pragmas = SQLITE_PRAGMAS if pragmas is None else pragmas
+        self.statement_cache = statement_cache
+
+    def connect(self):
+        import sqlite3
+
+        raw = sqlite3.connect(self.path, check_same_thread=False, timeout=30,
+                              cached_statements=self.statement_cache)
+        for name, value in self.pragmas.items():
+            raw.execute(f"PRAGMA {name}={value}")
+        return SQLiteConnection(raw)
+
+    def prepare(self, conn):
+        """Create the app's tables and apply pending migrations, so a branch office can start from an empty file."""
+        from migrations import migrate
+        from schema import ensure_app_schema
+
+        ensure_app_schema(conn)
+        migrate(conn, "app")
+
+    def __repr__(self):
+        return f"sqlite:{self.path}"
+
+
+BACKENDS = {"mysql": MySQLBackend, "sqlite": SQLiteBackend}
+
+
+def make_backend(name, path=None):
+    """Return the backend called ``name``; ``path`` is the SQLite file."""
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown backend {name!r} (expected one of: {', '.join(BACKENDS)})")
+    if name == "sqlite":
+        return SQLiteBackend(path or "car_rental.db")
+    return MySQLBackend()
+
+
+def backend_from_env():
+    """The backend named by ``CAR_RENTAL_BACKEND`` (MySQL unless set); ``CAR_RENTAL_DB`` is the SQLite file."""
+    return make_backend(os.environ.get("CAR_RENTAL_BACKEND", "mysql"), os.environ.get("CAR_RENTAL_DB"))
+
+
+def sqlite_connect(path="car_rental.db"):
+    """Open the embedded SQLite database, tuned and shareable across pool threads."""
+    return SQLiteBackend(path).connect()
+
+
+def begin_write(conn):
+    """Open a write transaction before the first read of a read-check-write.
+
+    SQLite only takes its write lock at the first write, so two connections
+    can read, both decide a booking is free and both insert; ``BEGIN
+    IMMEDIATE`` takes the lock up front.  MySQL needs nothing here: callers
+    lock the rows they depend on with ``SELECT ... FOR UPDATE``.
+
+    The ``BEGIN IMMEDIATE`` is timed into ``metrics``: it is where a SQLite
+    writer queues behind the others, so its latency is the lock wait.
+    """
+    raw = conn.raw if isinstance(conn, PooledConnection) else conn
+    if isinstance(raw, SQLiteConnection) and not raw.in_transaction:
+        started = time.perf_counter()
+        raw.execute("BEGIN IMMEDIATE")
+        metrics.get_metrics().observe_query("BEGIN IMMEDIATE", time.perf_counter() - started, dialect="sqlite")
+
+
+class PooledConnection:
+    """Thin wrapper around a pooled connection; ``close()`` gives it back."""
+
+    def __init__(self, pool, raw):
+        self._pool = pool
+        self._raw = raw
+
+    @property
+    def raw(self):
+        return self._raw
+
+    def cursor(self, *args, **kwargs):
+        """Return a cursor whose statements are timed by the ``metrics`` module."""
+        dialect = "sqlite" if isinstance(self._raw, SQLiteConnection) else "mysql"
+        return metrics.InstrumentedCursor(self._raw.cursor(*args, **kwargs), metrics.get_metrics(), dialect)
+
+    def close(self):
+        if self._raw is not None:
+            raw, self._raw = self._raw, None
+            self._pool.release(raw)
+
+    def __getattr__(self, name):
+        if self._raw is None:
+            raise AttributeError(f"connection already returned to pool: {name}")
+        return getattr(self._raw, name)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+
+class ConnectionPool:
+    """A fixed-size, thread-safe pool of database connections."""
+
+    def __init__(self, connect=mysql_connect, size=DEFAULT_POOL_SIZE, timeout=DEFAULT_TIMEOUT,
+                 health_check_interval=DEFAULT_HEALTH_CHECK_INTERVAL):
+        if size < 1:
+            raise ValueError("Pool size must be at least 1")
+        self._connect = connect
+        self.size = size
+        self.timeout = timeout
+        self.health_check_interval = health_check_interval
+        self._idle = deque()   # (raw connection, time it was returned)
+        self._open = 0         # connections currently alive (idle + checked out)
+        self._closed = False
+        self._cond = threading.Condition()
+        self._stats = {
+            "checkouts": 0,
+            "hits": 0,          # checkouts served by an idle connection
+            "misses": 0,        # checkouts that had to open a new connection
+            "waits": 0,         # checkouts that blocked because the pool was full
+            "wait_time": 0.0,
+            "timeouts": 0,
+            "health_checks": 0,
+            "health_check_failures": 0,
+        }
+
+    def acquire(self, timeout=None):
+        """Check out a connection, opening or waiting for one as needed."""
+        started = time.perf_counter()
+        try:
+            conn = self._acquire(timeout)
+        except Exception:
+            metrics.get_metrics().observe_acquire(time.perf_counter() - started, error=True)
+            raise
+        metrics.get_metrics().observe_acquire(time.perf_counter() - started)
+        return conn
+
+    def _acquire(self, timeout):
+        timeout = self.timeout if timeout is None else timeout
+        deadline = time.monotonic() + timeout
+        waited = False
+        with self._cond:
+            while True:
+                if self._closed:
+                    raise PoolExhausted("Connection pool has been closed")
+                if self._idle:
+                    raw, returned_at = self._idle.pop()
+                    break
+                if self._open < self.size:
+                    self._open += 1
+                    raw = None
+                    break
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    self._stats["timeouts"] += 1
+                    if waited:
+                        self._stats["wait_time"] += time.monotonic() - wait_start
+                    raise PoolExhausted(f"No database connection free after {timeout:.1f}s")
+                if not waited:
+                    waited = True
+                    self._stats["waits"] += 1
+                    wait_start = time.monotonic()
+                self._cond.wait(remaining)
+            self._stats["checkouts"] += 1
+            if waited:
+                self._stats["wait_time"] += time.monotonic() - wait_start
+
+        if raw is not None and time.monotonic() - returned_at > self.health_check_interval:
+            if not self._is_healthy(raw):
+                self._discard(raw, reopen=True)
+                raw = None
+        if raw is None:
+            raw = self._open_connection()
+        else:
+            with self._cond:
+                self._stats["hits"] += 1
+        return PooledConnection(self, raw)
+
+    def release(self, raw):
+        """Return a raw connection to the pool, dropping it if it is broken."""
+        try:
+            raw.rollback()  # never leak an unfinished transaction to the next user
+        except Exception:
+            self._discard(raw)
+            return
+        with self._cond:
+            if self._closed:
+                self._open -= 1
+                _quiet_close(raw)
+            else:
+                self._idle.append((raw, time.monotonic()))
+            self._cond.notify()
+
+    @contextmanager
+    def connection(self, timeout=None):
+        """Context manager yielding a pooled connection."""
+        conn = self.acquire(timeout)
+        try:
+            yield conn
+        finally:
+            conn.close()
+
+    def stats(self):
+        """Return a snapshot of the pool counters, including the hit rate."""
+        with self._cond:
+            snapshot = dict(self._stats)
+            snapshot["size"] = self.size
+            snapshot["open"] = self._open
+            snapshot["idle"] = len(self._idle)
+            snapshot["in_use"] = self._open - len(self._idle)
+        checkouts = snapshot["checkouts"]
+        snapshot["hit_rate"] = snapshot["hits"] / checkouts if checkouts else 0.0
+        return snapshot
+
+    def close(self):
+        """Close every idle connection; checked-out ones close on release."""
+        with self._cond:
+            self._closed = True
+            idle, self._idle = list(self._idle), deque()
+            self._open -= len(idle)
+            self._cond.notify_all()
+        for raw, _ in idle:
+            _quiet_close(raw)
+
+    def _open_connection(self):
+        try:
+            raw = self._connect()
+        except Exception:
+            with self._cond:
+                self._open -= 1
+                self._cond.notify()
+            raise
+        with self._cond:
+            self._stats["misses"] += 1
+        return raw
+
+    def _is_healthy(self, raw):
+        with self._cond:
+            self._stats["health_checks"] += 1
+        try:
+            cursor = raw.cursor()
+            try:
+                cursor.execute("SELECT 1")
+                cursor.fetchall()
+            finally:
+                cursor.close()
+            return True
+        except Exception:
+            with self._cond:
+                self._stats["health_check_failures"] += 1
+            return False
+
+    def _discard(self, raw, reopen=False):
+        """Forget a broken connection; with ``reopen`` its slot is kept for a new one."""
+        _quiet_close(raw)
+        if not reopen:
+            with self._cond:
+                self._open -= 1
+                self._cond.notify()
+
+
+def _quiet_close(raw):
+    try:
+        raw.close()
+    except Exception:
+        pass
+
+
+_pool = None
+_pool_lock = threading.Lock()
+_backend = None
+_default_lock = threading.Lock()
+_listeners = []
+
+
+def on_configure(callback):
+    """Call ``callback()`` whenever the shared pool is pointed at a new database.
+
+    Modules that keep per-database state in memory (indexes, caches)
+    register here so they reload from the new database.
+    """
+    _listeners.append(callback)
+    return callback
+
+
+def configure_pool(connect=mysql_connect, size=DEFAULT_POOL_SIZE, timeout=DEFAULT_TIMEOUT,
+                   health_check_interval=DEFAULT_HEALTH_CHECK_INTERVAL):
+    """Replace the shared pool, e.g. to change its size or point it elsewhere."""
+    global _pool, _backend
+    metrics.configure(explain_connect=connect)
+    with _pool_lock:
+        old, _pool = _pool, ConnectionPool(connect, size, timeout, health_check_interval)
+        _backend = getattr(connect, "__self__", None)  # set when given a backend's connect
+    if old is not None:
+        old.close()
+    for callback in _listeners:
+        callback()
+    return _pool
+
+
+def use_backend(backend, size=DEFAULT_POOL_SIZE, timeout=DEFAULT_TIMEOUT,
+                health_check_interval=DEFAULT_HEALTH_CHECK_INTERVAL, prepare=True):
+    """Point the shared pool at ``backend`` and, unless ``prepare`` is false, ready its tables."""
+    pool = configure_pool(backend.connect, size, timeout, health_check_interval)
+    if prepare:
+        with pool.connection() as conn:
+            backend.prepare(conn)
+    return pool
+
+
+def get_pool():
+    """Return the shared pool, creating it for ``backend_from_env()`` on first use."""
+    if _pool is None:
+        with _default_lock:
+            if _pool is None:
+                use_backend(backend_from_env())
+    return _pool
+
+
+def get_backend():
+    """Return the backend behind the shared pool (``None`` for a bare ``connect`` function)."""
+    get_pool()
+    return _backend
+
+
+def connection(timeout=None):
+    """Context manager yielding a connection from the shared pool."""
+    return get_pool().connection(timeout)
+
+
+def warm_up():
+    """Open a pooled connection ahead of the first query, paying the driver import and handshake."""
+    with connection():
+        pass
+
+
+def pool_stats():
+    """Return the shared pool's statistics."""
+    return get_pool().stats()
+
+
+def fetch_all(query, params=()):
+    """Run a query on a pooled connection and return every row."""
+    with connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute(query, params)
+        return cursor.fetchall()
+
+
+def write_metrics(path):
+    """Save query metrics and pool statistics to ``path`` (``.json`` or ``.prom``)."""
+    metrics.write_snapshot(path, pool_stats())
@@ -0,0 +1,226 @@
+"""Streaming export of reservations to CSV or JSON Lines.
+
+Finance's monthly dumps join every reservation with its customer and car
+(and, on the rental schema, its offices and payment).  Rows are read in
+``fetchmany`` batches from a cursor that streams them - mysql.connector's
+unbuffered cursor leaves the result on the server until it is read, and
+sqlite3 steps through it lazily - and written out straight away, so memory
+use does not grow with the size of the export.
+
+The output format follows the file name: ``.csv`` or ``.jsonl``, either
+optionally ending in ``.gz``; ``-`` writes CSV to standard output.  The
+date range is on the pick-up date, ``--to`` being exclusive.  Archived
+reservations are included (see ``archive.py``).
+
+    python exporter.py march.csv.gz --from 2024-03-01 --to 2024-04-01
+    python exporter.py all.jsonl --target mysql --schema rental
+"""
+import argparse
+import csv
+import gzip
+import json
+import sys
+import time
+from datetime import date, datetime
+from decimal import Decimal
+
+import db
+from migrations import migrate
+
+EXPORT_BATCH = 5000  # rows per fetchmany
+PROGRESS_EVERY = 5.0  # seconds between progress lines of the command
+
+EXPORT_QUERIES = {
+    "app": ("""
+        SELECT r.id AS reservation_id, r.pick_up, r.return_time, r.duration, r.payment,
+               cu.id AS customer_id, cu.name AS customer_name, cu.email AS customer_email,
+               cu.phone AS customer_phone, cu.country AS customer_country,
+               ca.id AS car_id, ca.name AS car_name, ca.model_year AS car_model_year,
+               ca.color AS car_color
+        FROM all_reservations r
+        JOIN customers cu ON cu.id = r.customer_id
+        JOIN cars ca ON ca.id = r.car_id
+        WHERE {where}
+        ORDER BY r.id
+    """, "r.pick_up"),
+    "rental": ("""
+        SELECT r.ReservationID, r.StartDate, r.EndDate, r.Status, r.TotalCost, r.ReservationDate,
+               cu.CustomerID, cu.FirstName, cu.LastName, cu.Email, cu.Phone, cu.LicenseNumber,
+               ca.CarID, ca.PlateID, ca.Model, ca.Year, ca.Color, ca.DailyRentalRate,
+               po.OfficeName AS PickupOffice, ro.OfficeName AS ReturnOffice,
+               p.PaymentID, p.Amount AS PaymentAmount, p.PaymentDate, p.PaymentMethod,
+               p.Status AS PaymentStatus
+        FROM AllReservations r
+        JOIN Customer cu ON cu.CustomerID = r.CustomerID
+        JOIN Car ca ON ca.CarID = r.CarID
+        JOIN Office po ON po.OfficeID = r.PickupOfficeID
+        JOIN Office ro ON ro.OfficeID = r.ReturnOfficeID
+        LEFT JOIN AllPayments p ON p.ReservationID = r.ReservationID
+        WHERE {where}
+        ORDER BY r.ReservationID
+    """, "r.StartDate"),
+}
+
+
+class ExportReport:
+    """Outcome of one export: rows written and how fast."""
+
+    def __init__(self, path):
+        self.path = path
+        self.rows = 0
+        self.started = time.perf_counter()
+        self.elapsed = 0.0
+
+    def finish(self):
+        self.elapsed = time.perf_counter() - self.started
+        return self
+
+    @property
+    def rows_per_s(self):
+        elapsed = self.elapsed or time.perf_counter() - self.started
+        return self.rows / elapsed if elapsed else 0.0
+
+    def summary(self):
+        return f"{self.path}: {self.rows:,} rows in {self.elapsed:.1f}s ({self.rows_per_s:,.0f} rows/s)"
+
+
+def build_query(schema="app", start=None, end=None):
+    """Return the export SQL and parameters for pick-ups in ``[start, end)``."""
+    query, column = EXPORT_QUERIES[schema]
+    conditions, params = [], []
+    if start is not None:
+        conditions.append(f"{column} >= %s")
+        params.append(start.isoformat())
+    if end is not None:
+        conditions.append(f"{column} < %s")
+        params.append(end.isoformat())
+    return query.format(where=" AND ".join(conditions) or "1 = 1"), tuple(params)
+
+
+def stream_rows(query, params=(), batch_size=EXPORT_BATCH):
+    """Yield the column names, then the rows of ``query`` in batches.
+
+    One pooled connection is held until the generator is exhausted or
+    closed; an abandoned MySQL stream is dropped by the pool on release.
+    """
+    with db.connection() as conn:
+        if isinstance(conn.raw, db.SQLiteConnection):
+            cursor = conn.cursor()  # sqlite3 always steps through results lazily
+        else:
+            cursor = conn.cursor(buffered=False)  # explicit: a buffered cursor reads everything at execute
+        try:
+            cursor.execute(query, params)
+            yield [column[0] for column in cursor.description]
+            while True:
+                rows = cursor.fetchmany(batch_size)
+                if not rows:
+                    break
+                yield rows
+        finally:
+            cursor.close()
+
+
+def _json_value(value):
+    if isinstance(value, (date, datetime)):
+        return value.isoformat()
+    if isinstance(value, Decimal):
+        return str(value)  # keep the cents exact
+    raise TypeError(f"cannot export {type(value).__name__}")
+
+
+def _write_csv(handle, columns, batches, report, progress):
+    writer = csv.writer(handle)
+    writer.writerow(columns)
+    for rows in batches:
+        writer.writerows(rows)
+        report.rows += len(rows)
+        if progress:
+            progress(report)
+
+
+def _write_jsonl(handle, columns, batches, report, progress):
+    encode = json.JSONEncoder(default=_json_value, ensure_ascii=False).encode
+    for rows in batches:
+        handle.write("".join(encode(dict(zip(columns, row))) + "\n" for row in rows))
+        report.rows += len(rows)
+        if progress:
+            progress(report)
+
+
+WRITERS = {"csv": _write_csv, "jsonl": _write_jsonl}
+
+
+def output_format(path):
+    """``csv`` or ``jsonl``, from the file name (``-`` is CSV)."""
+    name = path[:-3] if path.endswith(".gz") else path
+    if name == "-" or name.endswith(".csv"):
+        return "csv"
+    if name.endswith(".jsonl"):
+        return "jsonl"
+    raise ValueError(f"Unsupported export file {path!r}: use .csv or .jsonl, optionally .gz")
+
+
+def open_output(path):
+    """Open ``path`` for text writing, gzip-compressed when it ends in ``.gz``."""
+    if path == "-":
+        return sys.stdout
+    if path.endswith(".gz"):
+        return gzip.open(path, "wt", newline="", encoding="utf-8", compresslevel=6)
+    return open(path, "w", newline="", encoding="utf-8")
+
+
+def export_reservations(path, schema="app", start=None, end=None, batch_size=EXPORT_BATCH, progress=None):
+    """Export reservations with pick-up in ``[start, end)`` to ``path``; return an ``ExportReport``.
+
+    ``progress(report)`` is called after every batch written.
+    """
+    write = WRITERS[output_format(path)]
+    query, params = build_query(schema, start, end)
+    report = ExportReport(path)
+    batches = stream_rows(query, params, batch_size)
+    try:
+        columns = next(batches)
+        handle = open_output(path)
+        try:
+            write(handle, columns, batches, report, progress)
+        finally:
+            if handle is not sys.stdout:
+                handle.close()
+    finally:
+        batches.close()
+    return report.finish()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Export reservations with their customers and cars.")
+    parser.add_argument("path", help=".csv or .jsonl file, optionally .gz; - for CSV on standard output")
+    parser.add_argument("--from", dest="start", type=date.fromisoformat, help="first pick-up date (YYYY-MM-DD)")
+    parser.add_argument("--to", dest="end", type=date.fromisoformat, help="pick-up date to stop before")
+    parser.add_argument("--target", choices=("sqlite", "mysql"), default="sqlite")
+    parser.add_argument("--db", default="car_rental.db", help="SQLite file (ignored for MySQL)")
+    parser.add_argument("--schema", choices=("app", "rental"),
+                        help="tables to export from (default: app on SQLite, rental on MySQL)")
+    parser.add_argument("--batch-size", type=int, default=EXPORT_BATCH, help="rows per fetch")
+    args = parser.parse_args()
+    schema = args.schema or ("app" if args.target == "sqlite" else "rental")
+    try:
+        output_format(args.path)
+    except ValueError as e:
+        parser.error(str(e))
+
+    db.use_backend(db.make_backend(args.target, args.db), size=1, prepare=False)
+    with db.connection() as conn:
+        migrate(conn, schema)  # the views over hot and archived reservations
+    last = [time.perf_counter()]
+
+    def progress(report):
+        if time.perf_counter() - last[0] >= PROGRESS_EVERY:
+            last[0] = time.perf_counter()
+            print(f"  {report.rows:,} rows ({report.rows_per_s:,.0f} rows/s)", file=sys.stderr)
+
+    report = export_reservations(args.path, schema, args.start, args.end, args.batch_size, progress)
+    print(report.summary(), file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
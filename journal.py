@@ -0,0 +1,203 @@
+"""Change journal: what the write paths changed, in sequence order.
+
+Each write that the dashboard shows appends ``(table, row id, op)`` to
+``change_journal`` in the same transaction as the change itself.  The
+journal's auto-increment ``seq`` orders the entries, so a screen only has
+to ask for what happened after the last ``seq`` it saw and patch those
+rows, instead of reloading whole tables.  Bulk writes (imports, archival)
+journal one entry with no row id: readers reload that table.
+
+The journal only needs to cover the time between two polls; keep it short
+with::
+
+    python journal.py prune            # keep the newest JOURNAL_KEEP entries
+    python journal.py tail --since 0   # print entries
+"""
+import argparse
+import threading
+import time
+
+from db import connection, fetch_all, make_backend, on_configure, use_backend
+
+JOURNAL_KEEP = 100000  # entries kept by ``prune``
+POLL_LIMIT = 1000      # entries read per poll; more than that and readers reload
+GAP_TIMEOUT = 10.0     # seconds a missing seq is waited for (an uncommitted write)
+
+CREATE_TABLE = {
+    "sqlite": """
+        CREATE TABLE IF NOT EXISTS change_journal (
+            seq INTEGER PRIMARY KEY AUTOINCREMENT,
+            table_name TEXT NOT NULL,
+            row_id INTEGER,
+            op TEXT NOT NULL
+        )
+    """,
+    "mysql": """
+        CREATE TABLE IF NOT EXISTS change_journal (
+            seq BIGINT PRIMARY KEY AUTO_INCREMENT,
+            table_name VARCHAR(64) NOT NULL,
+            row_id BIGINT,
+            op VARCHAR(10) NOT NULL
+        )
+    """,
+}
+
+_ready = False
+_ready_lock = threading.Lock()
+
+
+def ensure_journal(conn):
+    """Create the journal table once per process.
+
+    Run this before a write transaction starts: the DDL commits implicitly
+    on MySQL.
+    """
+    global _ready
+    if _ready:
+        return
+    with _ready_lock:
+        if _ready:
+            return
+        from migrations import engine_of
+
+        conn.cursor().execute(CREATE_TABLE[engine_of(conn)])
+        conn.commit()
+        _ready = True
+
+
+@on_configure
+def _forget_ready():
+    """Another database may not have the table yet."""
+    global _ready
+    _ready = False
+
+
+def record_change(cursor, table, row_id, op):
+    """Journal a change inside the caller's transaction; ``row_id=None`` for a bulk change.
+
+    ``op`` is ``"insert"``, ``"update"``, ``"delete"`` or ``"bulk"``.  Call it
+    last, just before the commit, so the entry's seq is taken as late as
+    possible.
+    """
+    cursor.execute("INSERT INTO change_journal (table_name, row_id, op) VALUES (%s, %s, %s)",
+                   (table, row_id, op))
+
+
+def latest_seq():
+    """The seq of the newest entry (0 when the journal is empty)."""
+    with connection() as conn:
+        ensure_journal(conn)
+        cursor = conn.cursor()
+        cursor.execute("SELECT MAX(seq) FROM change_journal")
+        return cursor.fetchone()[0] or 0
+
+
+class Changes:
+    """Entries read by one poll; ``reload`` means the reader lost track and must reload."""
+
+    def __init__(self, entries, reload=False):
+        self.entries = entries
+        self.reload = reload
+
+    def __bool__(self):
+        return bool(self.entries) or self.reload
+
+    def tables(self):
+        return {table for _, table, _, _ in self.entries}
+
+    def row_ids(self, table):
+        """Ids of the ``table`` rows that changed, or ``None`` if the whole table must be reread."""
+        ids = set()
+        for _, name, row_id, _ in self.entries:
+            if name == table:
+                if row_id is None:
+                    return None
+                ids.add(row_id)
+        return ids
+
+
+class JournalReader:
+    """Follows the journal from ``seq`` on (default: from now).
+
+    On MySQL, concurrent transactions can commit out of seq order, so a seq
+    skipped by a poll is kept as a gap and looked for again by the next
+    polls, for ``GAP_TIMEOUT`` seconds (rolled-back writes leave gaps that
+    never fill).  Not thread-safe: poll from one thread at a time.
+    """
+
+    def __init__(self, seq=None, limit=POLL_LIMIT, gap_timeout=GAP_TIMEOUT):
+        self.seq = seq
+        self.limit = limit
+        self.gap_timeout = gap_timeout
+        self.gaps = {}  # missing seq -> when it was first missed
+
+    def poll(self):
+        """Return the ``Changes`` committed since the last poll."""
+        if self.seq is None:
+            self.seq = latest_seq()
+            return Changes([])
+        rows = fetch_all("SELECT seq, table_name, row_id, op FROM change_journal "
+                         "WHERE seq > %s ORDER BY seq LIMIT %s", (self.seq, self.limit))
+        now = time.monotonic()
+        late = []
+        if self.gaps:
+            gaps = sorted(self.gaps)
+            late = fetch_all("SELECT seq, table_name, row_id, op FROM change_journal WHERE seq IN ({})"
+                             .format(", ".join(["%s"] * len(gaps))), gaps)
+            for row in late:
+                del self.gaps[row[0]]
+            self.gaps = {seq: seen for seq, seen in self.gaps.items() if now - seen < self.gap_timeout}
+
+        expected = self.seq + 1
+        for row in rows:
+            if row[0] - expected > self.limit:
+                return self._lost()  # pruned while we were away
+            for missing in range(expected, row[0]):
+                self.gaps[missing] = now
+            expected = row[0] + 1
+        if len(rows) == self.limit:
+            return self._lost()  # too much to patch row by row
+        if rows:
+            self.seq = rows[-1][0]
+        return Changes(late + rows)
+
+    def _lost(self):
+        self.seq = latest_seq()
+        self.gaps.clear()
+        return Changes([], reload=True)
+
+
+def prune(keep=JOURNAL_KEEP):
+    """Delete all but the newest ``keep`` entries; return how many went."""
+    with connection() as conn:
+        ensure_journal(conn)
+        cursor = conn.cursor()
+        cursor.execute("SELECT MAX(seq) FROM change_journal")
+        newest = cursor.fetchone()[0] or 0
+        cursor.execute("DELETE FROM change_journal WHERE seq <= %s", (newest - keep,))
+        deleted = cursor.rowcount
+        conn.commit()
+        return deleted
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Inspect or prune the change journal.")
+    parser.add_argument("command", choices=("prune", "tail"))
+    parser.add_argument("--keep", type=int, default=JOURNAL_KEEP, help="entries kept by prune")
+    parser.add_argument("--since", type=int, help="tail: entries after this seq (default: the last 20)")
+    parser.add_argument("--target", choices=("sqlite", "mysql"), default="sqlite")
+    parser.add_argument("--db", default="car_rental.db", help="SQLite file (ignored for MySQL)")
+    args = parser.parse_args()
+
+    use_backend(make_backend(args.target, args.db), size=1, prepare=False)
+    if args.command == "prune":
+        print(f"Pruned {prune(args.keep):,} entries")
+        return
+    since = args.since if args.since is not None else max(0, latest_seq() - 20)
+    for seq, table, row_id, op in fetch_all("SELECT seq, table_name, row_id, op FROM change_journal "
+                                            "WHERE seq > %s ORDER BY seq", (since,)):
+        print(f"{seq:>10} {op:<7} {table} {'*' if row_id is None else row_id}")
+
+
+if __name__ == "__main__":
+    main()
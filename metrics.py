@@ -0,0 +1,317 @@
+"""Query timing, row counts and slow-query plans for the data-access layer.
+
+Every cursor handed out by the connection pool reports here, so each
+statement gets a latency histogram, a row count and an error count without
+touching the call sites.  Statements slower than ``SLOW_QUERY_MS`` are
+logged (logger ``car_rental.slow_query``) together with their EXPLAIN plan.
+
+``write_snapshot(path)`` saves everything as JSON or, for ``.prom`` files,
+in the Prometheus text format, so the numbers can be read after the fact
+without a live service.  Set ``CAR_RENTAL_METRICS_FILE`` to have a
+snapshot written when the program exits.
+"""
+import atexit
+import json
+import logging
+import os
+import threading
+import time
+from collections import deque
+from datetime import datetime
+
+SLOW_QUERY_MS = 200.0
+MAX_SLOW_QUERIES = 100  # most recent slow statements kept for the snapshot
+
+# Histogram bucket upper bounds, in seconds
+BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+slow_log = logging.getLogger("car_rental.slow_query")
+
+
+def normalize(sql):
+    """Collapse whitespace so the same statement always maps to one entry."""
+    return " ".join(sql.split())
+
+
+class Histogram:
+    """Cumulative-bucket latency histogram."""
+
+    __slots__ = ("counts", "count", "sum")
+
+    def __init__(self):
+        self.counts = [0] * (len(BUCKETS) + 1)  # last slot is +Inf
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, seconds):
+        for i, bound in enumerate(BUCKETS):
+            if seconds <= bound:
+                self.counts[i] += 1
+                break
+        else:
+            self.counts[-1] += 1
+        self.count += 1
+        self.sum += seconds
+
+    def cumulative(self):
+        """Return ``[(upper bound label, cumulative count)]`` including +Inf."""
+        total, result = 0, []
+        for bound, count in zip(BUCKETS + (float("inf"),), self.counts):
+            total += count
+            result.append(("+Inf" if bound == float("inf") else repr(bound), total))
+        return result
+
+    def as_dict(self):
+        return {"count": self.count, "sum_seconds": self.sum, "buckets": dict(self.cumulative())}
+
+
+class StatementStats:
+    __slots__ = ("latency", "rows", "errors")
+
+    def __init__(self):
+        self.latency = Histogram()
+        self.rows = 0
+        self.errors = 0
+
+
+class Metrics:
+    """Thread-safe registry of query and connection metrics."""
+
+    def __init__(self, slow_query_ms=SLOW_QUERY_MS):
+        self.slow_query_ms = slow_query_ms
+        self.explain_connect = None   # factory for a side connection used to EXPLAIN
+        self._explain_conn = None
+        self._statements = {}
+        self._acquire = Histogram()
+        self._acquire_errors = 0
+        self._slow = deque(maxlen=MAX_SLOW_QUERIES)
+        self._lock = threading.Lock()
+        self._explain_lock = threading.Lock()
+        self.started_at = time.time()
+
+    def observe_query(self, sql, seconds, rows=0, error=False, params=None, dialect="mysql"):
+        key = normalize(sql)
+        with self._lock:
+            stats = self._statements.get(key)
+            if stats is None:
+                stats = self._statements[key] = StatementStats()
+            stats.latency.observe(seconds)
+            stats.rows += max(rows, 0)
+            if error:
+                stats.errors += 1
+        if not error and seconds * 1000 >= self.slow_query_ms:
+            self._record_slow(key, seconds, params, dialect)
+        return stats
+
+    def add_rows(self, stats, rows):
+        """Count rows fetched after the statement was timed."""
+        with self._lock:
+            stats.rows += rows
+
+    def observe_acquire(self, seconds, error=False):
+        with self._lock:
+            if error:
+                self._acquire_errors += 1
+            else:
+                self._acquire.observe(seconds)
+
+    def _record_slow(self, sql, seconds, params, dialect):
+        plan = self.explain(sql, params, dialect)
+        entry = {
+            "at": datetime.now().isoformat(timespec="seconds"),
+            "ms": round(seconds * 1000, 3),
+            "sql": sql,
+            "plan": plan,
+        }
+        with self._lock:
+            self._slow.append(entry)
+        slow_log.warning("slow query (%.1f ms): %s\nplan:\n%s", entry["ms"], sql,
+                         "\n".join(str(row) for row in plan) if plan else "unavailable")
+
+    def explain(self, sql, params=None, dialect="mysql"):
+        """Return the EXPLAIN rows for ``sql`` from a side connection, or ``None``.
+
+        A separate connection is used because the caller's cursor may still
+        hold unread results.
+        """
+        if self.explain_connect is None or not sql.lstrip().upper().startswith(("SELECT", "UPDATE", "DELETE", "INSERT")):
+            return None
+        prefix = "EXPLAIN QUERY PLAN " if dialect == "sqlite" else "EXPLAIN "
+        with self._explain_lock:
+            try:
+                if self._explain_conn is None:
+                    self._explain_conn = self.explain_connect()
+                cursor = self._explain_conn.cursor()
+                try:
+                    cursor.execute(prefix + sql, params or ())
+                    return [list(row) for row in cursor.fetchall()]
+                finally:
+                    cursor.close()
+            except Exception as e:
+                self._explain_conn = None
+                return [f"EXPLAIN failed: {e}"]
+
+    def snapshot(self, pool_stats=None):
+        """Return every metric as plain data (latencies in seconds)."""
+        with self._lock:
+            statements = {
+                sql: {"latency": stats.latency.as_dict(), "rows": stats.rows, "errors": stats.errors}
+                for sql, stats in self._statements.items()
+            }
+            snapshot = {
+                "generated_at": datetime.now().isoformat(timespec="seconds"),
+                "uptime_seconds": time.time() - self.started_at,
+                "slow_query_ms": self.slow_query_ms,
+                "statements": statements,
+                "connection_acquire": self._acquire.as_dict(),
+                "connection_acquire_errors": self._acquire_errors,
+                "slow_queries": list(self._slow),
+            }
+        if pool_stats is not None:
+            snapshot["pool"] = pool_stats
+        return snapshot
+
+    def to_prometheus(self, pool_stats=None):
+        """Render the metrics in the Prometheus text exposition format."""
+        snap = self.snapshot(pool_stats)
+        lines = [
+            "# HELP car_rental_query_duration_seconds Statement execution time.",
+            "# TYPE car_rental_query_duration_seconds histogram",
+        ]
+        for sql, stats in snap["statements"].items():
+            label = f'statement="{_escape(sql)}"'
+            for bound, count in stats["latency"]["buckets"].items():
+                lines.append(f'car_rental_query_duration_seconds_bucket{{{label},le="{bound}"}} {count}')
+            lines.append(f"car_rental_query_duration_seconds_sum{{{label}}} {stats['latency']['sum_seconds']}")
+            lines.append(f"car_rental_query_duration_seconds_count{{{label}}} {stats['latency']['count']}")
+        lines += ["# HELP car_rental_query_rows_total Rows returned or affected.",
+                  "# TYPE car_rental_query_rows_total counter"]
+        lines += [f'car_rental_query_rows_total{{statement="{_escape(sql)}"}} {stats["rows"]}'
+                  for sql, stats in snap["statements"].items()]
+        lines += ["# HELP car_rental_query_errors_total Statements that raised.",
+                  "# TYPE car_rental_query_errors_total counter"]
+        lines += [f'car_rental_query_errors_total{{statement="{_escape(sql)}"}} {stats["errors"]}'
+                  for sql, stats in snap["statements"].items()]
+        lines += ["# HELP car_rental_connection_acquire_seconds Time to check a connection out of the pool.",
+                  "# TYPE car_rental_connection_acquire_seconds histogram"]
+        acquire = snap["connection_acquire"]
+        for bound, count in acquire["buckets"].items():
+            lines.append(f'car_rental_connection_acquire_seconds_bucket{{le="{bound}"}} {count}')
+        lines.append(f"car_rental_connection_acquire_seconds_sum {acquire['sum_seconds']}")
+        lines.append(f"car_rental_connection_acquire_seconds_count {acquire['count']}")
+        lines += ["# TYPE car_rental_connection_acquire_errors_total counter",
+                  f"car_rental_connection_acquire_errors_total {snap['connection_acquire_errors']}",
+                  "# TYPE car_rental_slow_queries gauge",
+                  f"car_rental_slow_queries {len(snap['slow_queries'])}"]
+        for name, value in (pool_stats or {}).items():
+            lines.append(f"# TYPE car_rental_pool_{name} gauge")
+            lines.append(f"car_rental_pool_{name} {value}")
+        return "\n".join(lines) + "\n"
+
+    def reset(self):
+        with self._lock:
+            self._statements.clear()
+            self._acquire = Histogram()
+            self._acquire_errors = 0
+            self._slow.clear()
+            self.started_at = time.time()
+
+
+def _escape(value):
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+class InstrumentedCursor:
+    """Cursor wrapper timing ``execute``/``executemany`` and counting rows."""
+
+    def __init__(self, raw, registry, dialect):
+        self._raw = raw
+        self._registry = registry
+        self._dialect = dialect
+        self._stats = None  # stats of the statement whose rows are being fetched
+
+    def execute(self, query, params=()):
+        return self._timed(self._raw.execute, query, params, params)
+
+    def executemany(self, query, seq_of_params):
+        return self._timed(self._raw.executemany, query, seq_of_params, None)
+
+    def _timed(self, method, query, arg, explain_params):
+        started = time.perf_counter()
+        try:
+            result = method(query, arg)
+        except Exception:
+            self._registry.observe_query(query, time.perf_counter() - started, error=True)
+            self._stats = None
+            raise
+        elapsed = time.perf_counter() - started
+        # Writes report affected rows now; reads count rows as they are fetched.
+        rows = self._raw.rowcount if self._raw.description is None else 0
+        self._stats = self._registry.observe_query(query, elapsed, rows or 0, params=explain_params,
+                                                   dialect=self._dialect)
+        return result
+
+    def fetchone(self):
+        row = self._raw.fetchone()
+        if row is not None and self._stats is not None:
+            self._registry.add_rows(self._stats, 1)
+        return row
+
+    def fetchmany(self, *args, **kwargs):
+        rows = self._raw.fetchmany(*args, **kwargs)
+        if self._stats is not None:
+            self._registry.add_rows(self._stats, len(rows))
+        return rows
+
+    def fetchall(self):
+        rows = self._raw.fetchall()
+        if self._stats is not None:
+            self._registry.add_rows(self._stats, len(rows))
+        return rows
+
+    def __iter__(self):
+        return iter(self.fetchone, None)
+
+    def __getattr__(self, name):
+        return getattr(self._raw, name)
+
+
+_registry = Metrics()
+
+
+def get_metrics():
+    """Return the process-wide metrics registry."""
+    return _registry
+
+
+def configure(slow_query_ms=None, explain_connect=None):
+    """Change the slow-query threshold or the connection factory used for EXPLAIN."""
+    if slow_query_ms is not None:
+        _registry.slow_query_ms = slow_query_ms
+    if explain_connect is not None:
+        with _registry._explain_lock:
+            _registry.explain_connect = explain_connect
+            _registry._explain_conn = None
+
+
+def write_snapshot(path, pool_stats=None):
+    """Write the metrics to ``path``: Prometheus text for ``.prom``, JSON otherwise."""
+    if path.endswith(".prom"):
+        content = _registry.to_prometheus(pool_stats)
+    else:
+        content = json.dumps(_registry.snapshot(pool_stats), indent=2, default=str)
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w") as handle:
+        handle.write(content)
+    os.replace(tmp_path, path)  # readers never see a half-written file
+
+
+def _write_on_exit():
+    path = os.environ.get("CAR_RENTAL_METRICS_FILE")
+    if path:
+        from db import pool_stats
+
+        write_snapshot(path, pool_stats())
+
+
+atexit.register(_write_on_exit)
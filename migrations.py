@@ -0,0 +1,551 @@
+"""Versioned schema migrations for the app and rental schemas.
+
+Every migration has a version number within its schema.  The
+``schema_migrations`` table records the ones a database has had, so
+``migrate()`` runs only the missing ones, in order.  Steps are idempotent,
+so a run that was interrupted, or two processes migrating at the same
+time, are harmless.
+
+Most migrations add the indexes the hot queries need.  Each one lists
+those queries as ``checks``, and every check is EXPLAINed before and after
+the migration runs.  A migration is reported as unverified when the
+planner still does not use its index.
+
+Changes are made online where the engine allows it:
+
+* MySQL adds indexes with ``ALGORITHM=INPLACE, LOCK=NONE``, so clerks
+  keep reading and writing.
+* MySQL turns ``pick_up``/``return_time`` into DATETIME by copying the
+  table in id batches behind triggers, then swapping the copy in with
+  one atomic ``RENAME TABLE``.  This needs the TRIGGER privilege.
+* SQLite has neither online DDL nor date types; ISO-8601 text is its
+  date format.  Index builds hold the write lock while they run
+  (seconds, even on millions of rows).  The date migration rewrites
+  stray formats to the canonical text in short batched transactions,
+  because text only sorts like dates when every row uses one form.
+
+    python migrations.py status --db car_rental.db
+    python migrations.py migrate --db car_rental.db
+    python migrations.py migrate --target mysql --schema rental --batch-size 2000
+"""
+import argparse
+import logging
+import sys
+import time
+from datetime import datetime
+
+import db
+from availability import date_text
+from paging import TABLE_VIEWS, build_page_query
+
+log = logging.getLogger("car_rental.migrations")
+
+MIGRATION_BATCH = 5000  # rows per transaction when migrating data
+BATCH_PAUSE = 0.01      # seconds between batches, so the clerks' writes get the lock
+MYSQL_LOCK_TIMEOUT = 600
+
+VERSION_TABLE = {
+    "sqlite": """CREATE TABLE IF NOT EXISTS schema_migrations (
+        schema_name TEXT NOT NULL,
+        version INTEGER NOT NULL,
+        name TEXT NOT NULL,
+        applied_at TEXT NOT NULL,
+        PRIMARY KEY (schema_name, version)
+    )""",
+    "mysql": """CREATE TABLE IF NOT EXISTS schema_migrations (
+        schema_name VARCHAR(20) NOT NULL,
+        version INT NOT NULL,
+        name VARCHAR(100) NOT NULL,
+        applied_at DATETIME NOT NULL,
+        PRIMARY KEY (schema_name, version)
+    )""",
+}
+
+
+class MigrationError(Exception):
+    """A migration cannot be applied; the database is left as it was before it."""
+
+
+class Migration:
+    """One versioned change: ``steps`` run in order.
+
+    A step is called as ``step(conn, engine, batch_size, pause)`` and must
+    be safe to run again.  ``checks`` are ``(sql, params, index)``: after
+    the steps, the plan of ``sql`` should use ``index`` (``None`` when any
+    plan will do).
+    """
+
+    def __init__(self, version, name, steps, checks=()):
+        self.version = version
+        self.name = name
+        self.steps = steps
+        self.checks = checks
+
+    def describe(self):
+        return "; ".join(step.__doc__ or step.__name__ for step in self.steps)
+
+
+def engine_of(conn):
+    """``"sqlite"`` or ``"mysql"``, for a raw or pooled connection."""
+    raw = conn.raw if isinstance(conn, db.PooledConnection) else conn
+    return "sqlite" if isinstance(raw, db.SQLiteConnection) else "mysql"
+
+
+def _index_exists(cursor, engine, table, name):
+    if engine == "sqlite":
+        cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'index' AND name = %s", (name,))
+    else:
+        cursor.execute("SELECT 1 FROM information_schema.STATISTICS "
+                       "WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s AND INDEX_NAME = %s LIMIT 1",
+                       (table, name))
+    return bool(cursor.fetchall())
+
+
+def add_index(table, name, columns):
+    def step(conn, engine, batch_size, pause):
+        cursor = conn.cursor()
+        if _index_exists(cursor, engine, table, name):
+            return
+        if engine == "sqlite":
+            cursor.execute(f"CREATE INDEX IF NOT EXISTS {name} ON {table} ({columns})")  # another process may race us
+        else:
+            cursor.execute(f"ALTER TABLE {table} ADD INDEX {name} ({columns}), ALGORITHM=INPLACE, LOCK=NONE")
+        conn.commit()
+
+    step.__doc__ = f"add index {name} on {table} ({columns})"
+    return step
+
+
+def drop_index(table, name):
+    def step(conn, engine, batch_size, pause):
+        cursor = conn.cursor()
+        if not _index_exists(cursor, engine, table, name):
+            return
+        if engine == "sqlite":
+            cursor.execute(f"DROP INDEX IF EXISTS {name}")
+        else:
+            cursor.execute(f"ALTER TABLE {table} DROP INDEX {name}, ALGORITHM=INPLACE, LOCK=NONE")
+        conn.commit()
+
+    step.__doc__ = f"drop index {name} on {table}"
+    return step
+
+
+def _column_exists(cursor, engine, table, name):
+    if engine == "sqlite":
+        cursor.execute(f"PRAGMA table_info({table})")
+        return name in {row[1] for row in cursor.fetchall()}
+    cursor.execute("SELECT 1 FROM information_schema.COLUMNS "
+                   "WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s AND COLUMN_NAME = %s LIMIT 1",
+                   (table, name))
+    return bool(cursor.fetchall())
+
+
+def add_column(table, name, definition):
+    """``definition`` must be valid on both engines (SQLite accepts MySQL's type names)."""
+    def step(conn, engine, batch_size, pause):
+        cursor = conn.cursor()
+        if _column_exists(cursor, engine, table, name):
+            return
+        online = "" if engine == "sqlite" else ", ALGORITHM=INPLACE, LOCK=NONE"
+        cursor.execute(f"ALTER TABLE {table} ADD COLUMN {name} {definition}{online}")
+        conn.commit()
+
+    step.__doc__ = f"add column {table}.{name}"
+    return step
+
+
+def _id_batches(cursor, table, key, batch_size):
+    """Yield ``(first, last)`` id ranges covering ``table``."""
+    cursor.execute(f"SELECT MIN({key}), MAX({key}) FROM {table}")
+    low, high = cursor.fetchall()[0]
+    if low is None:
+        return
+    for first in range(low, high + 1, batch_size):
+        yield first, first + batch_size - 1
+
+
+def _canonical_dates(conn, engine, batch_size, pause):
+    """rewrite reservation dates to canonical text, in batches (SQLite)"""
+    cursor = conn.cursor()
+    changed = unreadable = 0
+    for first, last in list(_id_batches(cursor, "reservations", "id", batch_size)):
+        db.begin_write(conn)  # the read and the rewrite of a batch see the same rows
+        cursor.execute("SELECT id, pick_up, return_time FROM reservations WHERE id BETWEEN %s AND %s",
+                       (first, last))
+        updates = []
+        for reservation_id, pick_up, return_time in cursor.fetchall():
+            try:
+                canonical = (date_text(pick_up), date_text(return_time))
+            except ValueError:
+                unreadable += 1  # left alone; the availability index skips it too
+                continue
+            if canonical != (pick_up, return_time):
+                updates.append((*canonical, reservation_id))
+        if updates:
+            cursor.executemany("UPDATE reservations SET pick_up = %s, return_time = %s WHERE id = %s", updates)
+        conn.commit()
+        changed += len(updates)
+        time.sleep(pause)
+    log.info("reservation dates: %d rewritten, %d unreadable", changed, unreadable)
+
+
+RESERVATION_COLUMNS = "id, car_id, customer_id, duration, pick_up, return_time, payment"
+RESERVATIONS_DATETIME_MYSQL = """
+CREATE TABLE reservations_new (
+    id INT PRIMARY KEY AUTO_INCREMENT,
+    car_id INT NOT NULL,
+    customer_id INT NOT NULL,
+    duration INT NOT NULL,
+    pick_up DATETIME NOT NULL,
+    return_time DATETIME NOT NULL,
+    payment DECIMAL(10,2) NOT NULL,
+    INDEX idx_reservations_car (car_id, pick_up),
+    FOREIGN KEY (car_id) REFERENCES cars(id),
+    FOREIGN KEY (customer_id) REFERENCES customers(id)
+)
+"""
+_NEW_ROW = "NEW.id, NEW.car_id, NEW.customer_id, NEW.duration, NEW.pick_up, NEW.return_time, NEW.payment"
+# Keep the copy in step with what the clerks write while old rows are copied.
+COPY_TRIGGERS = {
+    "reservations_copy_insert": f"AFTER INSERT ON reservations FOR EACH ROW "
+                                f"REPLACE INTO reservations_new ({RESERVATION_COLUMNS}) VALUES ({_NEW_ROW})",
+    "reservations_copy_update": f"AFTER UPDATE ON reservations FOR EACH ROW "
+                                f"REPLACE INTO reservations_new ({RESERVATION_COLUMNS}) VALUES ({_NEW_ROW})",
+    "reservations_copy_delete": "AFTER DELETE ON reservations FOR EACH ROW "
+                                "DELETE FROM reservations_new WHERE id = OLD.id",
+}
+
+
+def _drop_copy(cursor):
+    for name in COPY_TRIGGERS:
+        cursor.execute(f"DROP TRIGGER IF EXISTS {name}")
+    cursor.execute("DROP TABLE IF EXISTS reservations_new")
+
+
+def _datetime_dates(conn, engine, batch_size, pause):
+    """copy reservations into DATETIME columns in batches and swap the tables (MySQL)"""
+    cursor = conn.cursor()
+    cursor.execute("SELECT DATA_TYPE FROM information_schema.COLUMNS WHERE TABLE_SCHEMA = DATABASE() "
+                   "AND TABLE_NAME = 'reservations' AND COLUMN_NAME = 'pick_up'")
+    if cursor.fetchall()[0][0].lower() == "datetime":
+        return
+    _drop_copy(cursor)  # left over from an interrupted run
+    cursor.execute(RESERVATIONS_DATETIME_MYSQL)
+    for name, body in COPY_TRIGGERS.items():
+        cursor.execute(f"CREATE TRIGGER {name} {body}")
+    conn.commit()
+
+    # Rows the triggers already copied are newer than the table being read: keep them.
+    for first, last in list(_id_batches(cursor, "reservations", "id", batch_size)):
+        cursor.execute(f"INSERT IGNORE INTO reservations_new ({RESERVATION_COLUMNS}) "
+                       f"SELECT {RESERVATION_COLUMNS} FROM reservations WHERE id BETWEEN %s AND %s "
+                       f"LOCK IN SHARE MODE", (first, last))
+        conn.commit()
+        time.sleep(pause)
+
+    # INSERT IGNORE stores unreadable text as a zero date
+    cursor.execute("SELECT id FROM reservations_new WHERE pick_up < '1000-01-01' OR return_time < '1000-01-01' "
+                   "LIMIT 20")
+    unreadable = [row[0] for row in cursor.fetchall()]
+    if unreadable:
+        _drop_copy(cursor)
+        conn.commit()
+        raise MigrationError(f"Reservations with unreadable dates (fix them and migrate again): {unreadable}")
+    cursor.execute("RENAME TABLE reservations TO reservations_old, reservations_new TO reservations")
+    for name in COPY_TRIGGERS:
+        cursor.execute(f"DROP TRIGGER IF EXISTS {name}")
+    cursor.execute("DROP TABLE reservations_old")
+    conn.commit()
+
+
+def native_dates(conn, engine, batch_size, pause):
+    """store reservation dates in the engine's native date form"""
+    if engine == "sqlite":
+        _canonical_dates(conn, engine, batch_size, pause)
+    else:
+        _datetime_dates(conn, engine, batch_size, pause)
+
+
+def create_archive(table, archive, sqlite_indexes):
+    """Cold copy of ``table`` for ``archive.py``; on SQLite it gets ``sqlite_indexes`` ({name: columns})."""
+    def step(conn, engine, batch_size, pause):
+        cursor = conn.cursor()
+        if engine == "sqlite":
+            # Same columns, no constraints: archived rows are never written again.
+            cursor.execute(f"CREATE TABLE IF NOT EXISTS {archive} AS SELECT * FROM {table} WHERE 0")
+            for name, columns in sqlite_indexes.items():
+                cursor.execute(f"CREATE INDEX IF NOT EXISTS {name} ON {archive} ({columns})")
+        else:
+            cursor.execute(f"CREATE TABLE IF NOT EXISTS {archive} LIKE {table}")  # indexes, not foreign keys
+        conn.commit()
+
+    step.__doc__ = f"create archive table {archive} for {table}"
+    return step
+
+
+def create_union_view(view, table, archive):
+    """A view reading hot and archived rows alike, for reports."""
+    def step(conn, engine, batch_size, pause):
+        create = "CREATE VIEW IF NOT EXISTS" if engine == "sqlite" else "CREATE OR REPLACE VIEW"
+        conn.cursor().execute(f"{create} {view} AS SELECT * FROM {table} UNION ALL SELECT * FROM {archive}")
+        conn.commit()
+
+    step.__doc__ = f"create view {view} over {table} and {archive}"
+    return step
+
+
+def create_payments(conn, engine, batch_size, pause):
+    """create the payments table"""
+    from payments import CREATE_TABLE
+
+    conn.cursor().execute(CREATE_TABLE[engine])
+    conn.commit()
+
+
+def _schedule_pending_payments(conn, engine, batch_size, pause):
+    """schedule pending payments for settlement at their payment date"""
+    conn.cursor().execute("UPDATE Payment SET NextAttemptAt = PaymentDate "
+                          "WHERE Status = 'pending' AND NextAttemptAt IS NULL")
+    conn.commit()
+
+
+# Settlement columns, on the archive table too: archive.py copies them along.
+_PAYMENT_COLUMNS = (("Attempts", "INT NOT NULL DEFAULT 0"), ("NextAttemptAt", "DATETIME(3)"),
+                    ("SettledAt", "DATETIME(3)"), ("GatewayReference", "VARCHAR(64)"))
+
+_SORTED_CUSTOMERS = build_page_query(TABLE_VIEWS["customers"], sort_index=1)
+
+MIGRATIONS = {
+    "app": [
+        Migration(1, "cars_details_index", [add_index("cars", "idx_cars_details", "name, model_year, color")],
+                  [("SELECT id FROM cars WHERE name = %s AND model_year = %s AND color = %s ORDER BY id LIMIT 1",
+                    ("Toyota Camry", 2022, "Red"), "idx_cars_details")]),
+        Migration(2, "native_reservation_dates", [native_dates]),
+        # Covers the booking overlap check; replaces (car_id, pick_up).
+        Migration(3, "reservations_car_dates_index",
+                  [add_index("reservations", "idx_reservations_car_dates", "car_id, pick_up, return_time"),
+                   drop_index("reservations", "idx_reservations_car")],
+                  [("SELECT id, pick_up, return_time FROM reservations "
+                    "WHERE car_id = %s AND pick_up < %s AND return_time > %s",
+                    (1, "2025-02-01", "2025-01-01"), "idx_reservations_car_dates")]),
+        # Date-range exports and analytics
+        Migration(4, "reservations_pick_up_index",
+                  [add_index("reservations", "idx_reservations_pick_up", "pick_up")],
+                  [("SELECT id FROM reservations WHERE pick_up >= %s AND pick_up < %s",
+                    ("2025-01-01", "2025-02-01"), "idx_reservations_pick_up")]),
+        Migration(5, "reservation_status_index",
+                  [add_index("car_reservation_status", "idx_reservation_status_car", "car_id, customer_id")],
+                  [("SELECT id FROM car_reservation_status "
+                    "WHERE car_id = %s AND customer_id = %s AND status != 'returned'",
+                    (1, 1), "idx_reservation_status_car")]),
+        # The dashboard's customers page sorted by name
+        Migration(6, "customers_name_index", [add_index("customers", "idx_customers_name", "name")],
+                  [(*_SORTED_CUSTOMERS, "idx_customers_name")]),
+        Migration(7, "reservation_archive",
+                  [create_archive("reservations", "reservations_archive",
+                                  {"idx_reservations_archive_id": "id",
+                                   "idx_reservations_archive_pick_up": "pick_up"}),
+                   create_archive("car_reservation_status", "car_reservation_status_archive",
+                                  {"idx_car_reservation_status_archive_id": "id"}),
+                   create_union_view("all_reservations", "reservations", "reservations_archive")]),
+        Migration(8, "payments",
+                  [create_payments,
+                   create_archive("payments", "payments_archive",
+                                  {"idx_payments_archive_reservation": "reservation_id"})]),
+        # payments.py claims due payments in due order
+        Migration(9, "payments_due_index", [add_index("payments", "idx_payments_due", "status, next_attempt_at")],
+                  [("SELECT id FROM payments WHERE status = 'pending' AND next_attempt_at <= %s "
+                    "ORDER BY next_attempt_at LIMIT 100", ("2025-01-01 00:00:00",), "idx_payments_due")]),
+    ],
+    "rental": [
+        # Availability and the importer's overlap check
+        Migration(1, "reservation_car_dates_index",
+                  [add_index("Reservation", "idx_reservation_car_dates", "CarID, StartDate, EndDate")],
+                  [("SELECT ReservationID FROM Reservation WHERE CarID = %s AND StartDate < %s AND EndDate > %s",
+                    (1, "2025-02-01", "2025-01-01"), "idx_reservation_car_dates")]),
+        Migration(2, "reservation_start_index",
+                  [add_index("Reservation", "idx_reservation_start", "StartDate")],
+                  [("SELECT ReservationID FROM Reservation WHERE StartDate >= %s AND StartDate < %s",
+                    ("2025-01-01", "2025-02-01"), "idx_reservation_start")]),
+        # Email is UNIQUE, which already indexes it: the copy only slows every write.
+        Migration(3, "drop_duplicate_email_index", [drop_index("Customer", "idx_customer_email")],
+                  [("SELECT CustomerID FROM Customer WHERE Email = %s", ("someone@example.com",), None)]),
+        Migration(4, "reservation_archive",
+                  [create_archive("Reservation", "ReservationArchive",
+                                  {"idx_reservation_archive_id": "ReservationID",
+                                   "idx_reservation_archive_start": "StartDate"}),
+                   create_archive("Payment", "PaymentArchive",
+                                  {"idx_payment_archive_reservation": "ReservationID"}),
+                   create_union_view("AllReservations", "Reservation", "ReservationArchive"),
+                   create_union_view("AllPayments", "Payment", "PaymentArchive")]),
+        # Settlement state for payments.py
+        Migration(5, "payment_settlement",
+                  [*(add_column(table, name, definition)
+                     for table in ("Payment", "PaymentArchive") for name, definition in _PAYMENT_COLUMNS),
+                   _schedule_pending_payments,
+                   create_union_view("AllPayments", "Payment", "PaymentArchive")]),
+        # Due payments in due order; replaces the (Status) index.
+        Migration(6, "payment_due_index",
+                  [add_index("Payment", "idx_payment_due", "Status, NextAttemptAt"),
+                   drop_index("Payment", "idx_payment_status")],
+                  [("SELECT PaymentID FROM Payment WHERE Status = 'pending' AND NextAttemptAt <= %s "
+                    "ORDER BY NextAttemptAt LIMIT 100", ("2025-01-01 00:00:00",), "idx_payment_due")]),
+    ],
+}
+
+
+def _ensure_version_table(conn, engine):
+    cursor = conn.cursor()
+    cursor.execute(VERSION_TABLE[engine])
+    conn.commit()
+
+
+def applied_versions(conn, schema="app"):
+    """Versions of ``schema`` already applied to the database."""
+    _ensure_version_table(conn, engine_of(conn))
+    cursor = conn.cursor()
+    cursor.execute("SELECT version FROM schema_migrations WHERE schema_name = %s", (schema,))
+    return {row[0] for row in cursor.fetchall()}
+
+
+def pending(conn, schema="app"):
+    """Migrations of ``schema`` the database still lacks, in order."""
+    done = applied_versions(conn, schema)
+    return [migration for migration in MIGRATIONS[schema] if migration.version not in done]
+
+
+def explain(conn, engine, sql, params=()):
+    """Return the query plan of ``sql`` as one line of text per step."""
+    cursor = conn.cursor()
+    cursor.execute(("EXPLAIN QUERY PLAN " if engine == "sqlite" else "EXPLAIN ") + sql, params)
+    rows = cursor.fetchall()
+    if engine == "sqlite":
+        return [row[3] for row in rows]
+    names = [column[0] for column in cursor.description]
+    return [" ".join(f"{name}={value}" for name, value in zip(names, row)
+                     if name in ("table", "type", "key", "rows", "Extra")) for row in rows]
+
+
+def _timed_query(conn, sql, params, runs=3):
+    """Best of ``runs`` executions of ``sql``, in seconds."""
+    best = None
+    cursor = conn.cursor()
+    for _ in range(runs):
+        started = time.perf_counter()
+        cursor.execute(sql, params)
+        cursor.fetchall()
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+    conn.rollback()
+    return best
+
+
+def _record(conn, schema, migration):
+    cursor = conn.cursor()
+    try:
+        cursor.execute("INSERT INTO schema_migrations (schema_name, version, name, applied_at) "
+                       "VALUES (%s, %s, %s, %s)",
+                       (schema, migration.version, migration.name, datetime.now().isoformat(sep=" ", timespec="seconds")))
+        conn.commit()
+    except db.database_errors():
+        conn.rollback()
+        if migration.version not in applied_versions(conn, schema):
+            raise
+        # another process applied it at the same time
+
+
+def apply(conn, schema, migration, batch_size=MIGRATION_BATCH, pause=BATCH_PAUSE, measure=False):
+    """Run one migration with its EXPLAIN checks; return a result dict."""
+    engine = engine_of(conn)
+    checks = [{"sql": " ".join(sql.split()), "index": index,
+               "before": explain(conn, engine, sql, params),
+               "before_s": _timed_query(conn, sql, params) if measure else None}
+              for sql, params, index in migration.checks]
+    started = time.perf_counter()
+    for step in migration.steps:
+        log.info("%s v%d: %s", schema, migration.version, step.__doc__ or step.__name__)
+        step(conn, engine, batch_size, pause)
+    seconds = time.perf_counter() - started
+    for check, (sql, params, index) in zip(checks, migration.checks):
+        check["after"] = explain(conn, engine, sql, params)
+        check["after_s"] = _timed_query(conn, sql, params) if measure else None
+        check["verified"] = index is None or any(index in line for line in check["after"])
+        if not check["verified"]:
+            log.warning("%s v%d: the plan of %r does not use %s", schema, migration.version, check["sql"], index)
+    _record(conn, schema, migration)
+    return {"version": migration.version, "name": migration.name, "seconds": seconds, "checks": checks}
+
+
+def migrate(conn, schema="app", batch_size=MIGRATION_BATCH, pause=BATCH_PAUSE, measure=False):
+    """Apply the pending migrations of ``schema``; return their results, oldest first.
+
+    On MySQL a named lock keeps two processes from migrating at once.
+    """
+    engine = engine_of(conn)
+    cursor = conn.cursor()
+    if engine == "mysql":
+        cursor.execute("SELECT GET_LOCK('car_rental_migrations', %s)", (MYSQL_LOCK_TIMEOUT,))
+        if cursor.fetchall()[0][0] != 1:
+            raise MigrationError("Another process is migrating this database")
+    try:
+        results = [apply(conn, schema, migration, batch_size, pause, measure) for migration in pending(conn, schema)]
+        if results and engine == "sqlite":
+            cursor.execute("PRAGMA optimize")  # refresh the planner's statistics of the tables just changed
+            cursor.fetchall()
+            conn.commit()
+        return results
+    finally:
+        if engine == "mysql":
+            cursor.execute("SELECT RELEASE_LOCK('car_rental_migrations')")
+            cursor.fetchall()
+
+
+def _print_result(result):
+    print(f"v{result['version']} {result['name']}: {result['seconds']:.2f}s")
+    for check in result["checks"]:
+        status = "ok" if check["verified"] else f"NOT using {check['index']}"
+        print(f"  {check['sql'][:100]}")
+        timing = ""
+        if check["before_s"] is not None:
+            timing = f"  ({check['before_s'] * 1000:.2f} ms -> {check['after_s'] * 1000:.2f} ms)"
+        print(f"    before: {' | '.join(check['before'])}")
+        print(f"    after:  {' | '.join(check['after'])}  [{status}]{timing}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Apply or list schema migrations.")
+    parser.add_argument("command", choices=("status", "migrate"))
+    parser.add_argument("--target", choices=("sqlite", "mysql"), default="sqlite")
+    parser.add_argument("--db", default="car_rental.db", help="SQLite file (ignored for MySQL)")
+    parser.add_argument("--schema", choices=("app", "rental"),
+                        help="tables to migrate (default: app on SQLite, rental on MySQL)")
+    parser.add_argument("--batch-size", type=int, default=MIGRATION_BATCH, help="rows per transaction")
+    parser.add_argument("--pause", type=float, default=BATCH_PAUSE, help="seconds between batches")
+    parser.add_argument("--no-timing", action="store_true", help="skip timing the checked queries")
+    args = parser.parse_args()
+    schema = args.schema or ("app" if args.target == "sqlite" else "rental")
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+
+    db.use_backend(db.make_backend(args.target, args.db), size=1, prepare=False)
+    with db.connection() as conn:
+        if args.command == "status":
+            done = applied_versions(conn, schema)
+            for migration in MIGRATIONS[schema]:
+                state = "applied" if migration.version in done else "pending"
+                print(f"v{migration.version} {migration.name:<32}{state:<9}{migration.describe()}")
+            return
+        try:
+            results = migrate(conn, schema, args.batch_size, args.pause, measure=not args.no_timing)
+        except MigrationError as e:
+            sys.exit(str(e))
+    for result in results:
+        _print_result(result)
+    if not results:
+        print("Nothing to migrate.")
+    if not all(check["verified"] for result in results for check in result["checks"]):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+"""Keyset-paginated queries behind the dashboard tables.
+
+Kept free of Tk so the same queries can be benchmarked and reused headless.
+"""
+
+# Views the dashboard can page through.  "columns" are the SQL expressions
+# behind the ID/Name/Details headings; "key" is the unique column used for
+# keyset pagination and "search" the columns the filter box matches;
+# "table" is the table whose change-journal entries concern the view.
+TABLE_VIEWS = {
+    "cars": {
+        "select": "SELECT id, name, model_year FROM cars",
+        "columns": ("id", "name", "model_year"),
+        "key": "id",
+        "search": ("name",),
+        "table": "cars",
+    },
+    "customers": {
+        "select": "SELECT id, name, country FROM customers",
+        "columns": ("id", "name", "country"),
+        "key": "id",
+        "search": ("name", "country"),
+        "table": "customers",
+    },
+    "reservations": {
+        "select": """
+            SELECT r.id, c.name AS customer, car.name AS car 
+            FROM reservations r
+            JOIN customers c ON r.customer_id = c.id
+            JOIN cars car ON r.car_id = car.id
+        """,
+        "columns": ("r.id", "c.name", "car.name"),
+        "key": "r.id",
+        "search": ("c.name", "car.name"),
+        "table": "reservations",
+    },
+}
+
+PAGE_SIZE = 100        # rows fetched per round trip
+WINDOW_PAGES = 3       # pages kept in the Treeview at once (visible rows plus buffer)
+
+
+def build_page_query(view, sort_index=0, descending=False, text_filter="", after=None, before=None, limit=PAGE_SIZE):
+    """Build a keyset-paginated query for ``view`` and return ``(sql, params)``.
+
+    ``after``/``before`` are ``(sort value, key)`` pairs of the last/first row
+    already shown; rows strictly after/before them are returned, in display
+    order for ``after`` and reversed display order for ``before``.
+    """
+    key = view["key"]
+    sort = view["columns"][sort_index]
+    conditions, params = [], []
+
+    if text_filter:
+        _filter(view, text_filter, conditions, params)
+
+    # Walking backwards (before=...) flips both the comparison and the order.
+    forward = before is None
+    ascending = forward != descending
+    op = ">" if ascending else "<"
+    direction = "ASC" if ascending else "DESC"
+    boundary = after if forward else before
+    if boundary is not None:
+        sort_value, key_value = boundary
+        if sort == key:
+            conditions.append(f"{key} {op} %s")
+            params.append(key_value)
+        else:
+            conditions.append(f"({sort} {op} %s OR ({sort} = %s AND {key} {op} %s))")
+            params.extend([sort_value, sort_value, key_value])
+
+    sql = view["select"]
+    if conditions:
+        sql += " WHERE " + " AND ".join(conditions)
+    if sort == key:
+        sql += f" ORDER BY {key} {direction}"
+    else:
+        sql += f" ORDER BY {sort} {direction}, {key} {direction}"
+    sql += " LIMIT %s"
+    params.append(limit)
+    return sql, tuple(params)
+
+
+def _filter(view, text_filter, conditions, params):
+    conditions.append("(" + " OR ".join(f"{column} LIKE %s" for column in view["search"]) + ")")
+    params.extend([f"%{text_filter}%"] * len(view["search"]))
+
+
+def build_rows_query(view, keys, text_filter=""):
+    """Build a query for the rows of ``view`` with these keys that pass the filter; ``(sql, params)``."""
+    keys = sorted(keys)
+    conditions, params = [f"{view['key']} IN ({', '.join(['%s'] * len(keys))})"], list(keys)
+    if text_filter:
+        _filter(view, text_filter, conditions, params)
+    return view["select"] + " WHERE " + " AND ".join(conditions), tuple(params)
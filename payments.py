@@ -0,0 +1,425 @@
+"""Payment settlement: pending payments are charged in batches through a gateway.
+
+Every booking queues a ``pending`` payment in the same transaction as the
+reservation (``payments`` on the app schema; ``Payment`` on the rental
+schema, where ``enqueue`` queues the confirmed reservations that have
+none).  ``PaymentPipeline`` then settles them:
+
+* one dispatcher thread claims due payments in batches, leasing them
+  (``next_attempt_at`` moves ``LEASE_SECONDS`` ahead) so another settler
+  process leaves them alone;
+* a pool of worker threads sends the batches to the gateway concurrently;
+  nothing but the dispatcher touches the database;
+* outcomes are written back by the dispatcher, many batches per
+  transaction: ``completed``, ``failed`` when declined or out of attempts,
+  or still ``pending`` with an exponential backoff when the gateway was
+  unavailable or asked to try again.
+
+A payment id is the gateway's idempotency key, so a batch charged just
+before a crash is not charged twice when its lease runs out.
+
+    python payments.py settle --workers 8 --batch-size 200
+    python payments.py status
+    python payments.py enqueue --target mysql --schema rental
+"""
+import argparse
+import importlib
+import random
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import namedtuple
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from datetime import date, datetime, timedelta
+
+import db
+from availability import to_datetime
+
+SETTLE_BATCH = 100     # payments per gateway call
+SETTLE_WORKERS = 8     # gateway calls in flight
+MAX_ATTEMPTS = 5       # then the payment is marked failed
+RETRY_DELAY = 2.0      # seconds before the first retry; doubled per attempt, with jitter
+MAX_RETRY_DELAY = 600.0
+LEASE_SECONDS = 120    # a claimed payment is left alone by other settlers this long
+POLL_INTERVAL = 1.0    # seconds between looks for due payments when there are none
+DEFAULT_METHOD = "credit_card"
+
+CREATE_TABLE = {
+    "sqlite": """
+        CREATE TABLE IF NOT EXISTS payments (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            reservation_id INTEGER NOT NULL UNIQUE,
+            amount REAL NOT NULL,
+            payment_date TEXT NOT NULL,
+            payment_method TEXT NOT NULL,
+            status TEXT NOT NULL DEFAULT 'pending',
+            attempts INTEGER NOT NULL DEFAULT 0,
+            next_attempt_at TEXT NOT NULL,
+            settled_at TEXT,
+            gateway_reference TEXT
+        )
+    """,
+    "mysql": """
+        CREATE TABLE IF NOT EXISTS payments (
+            id INT PRIMARY KEY AUTO_INCREMENT,
+            reservation_id INT NOT NULL UNIQUE,
+            amount DECIMAL(10,2) NOT NULL,
+            payment_date DATETIME(3) NOT NULL,
+            payment_method VARCHAR(20) NOT NULL,
+            status VARCHAR(20) NOT NULL DEFAULT 'pending',
+            attempts INT NOT NULL DEFAULT 0,
+            next_attempt_at DATETIME(3) NOT NULL,
+            settled_at DATETIME(3),
+            gateway_reference VARCHAR(64)
+        )
+    """,
+}
+
+# Column names of the payment tables; the rental schema's come from database.txt
+# plus the settlement columns added by migration.
+PAYMENT_TABLES = {
+    "app": {"table": "payments", "key": "id", "reservation": "reservation_id", "amount": "amount",
+            "created": "payment_date", "method": "payment_method", "status": "status",
+            "attempts": "attempts", "due": "next_attempt_at", "settled": "settled_at",
+            "reference": "gateway_reference"},
+    "rental": {"table": "Payment", "key": "PaymentID", "reservation": "ReservationID", "amount": "Amount",
+               "created": "PaymentDate", "method": "PaymentMethod", "status": "Status",
+               "attempts": "Attempts", "due": "NextAttemptAt", "settled": "SettledAt",
+               "reference": "GatewayReference"},
+}
+# Bookings without a payment yet: upcoming app reservations, confirmed rental ones.
+UNPAID = {
+    "app": ("SELECT r.id, r.payment FROM reservations r LEFT JOIN payments p ON p.reservation_id = r.id "
+            "WHERE p.id IS NULL AND r.pick_up >= %s"),
+    "rental": ("SELECT r.ReservationID, r.TotalCost FROM Reservation r "
+               "LEFT JOIN Payment p ON p.ReservationID = r.ReservationID "
+               "WHERE p.PaymentID IS NULL AND r.Status = 'confirmed' AND r.StartDate >= %s"),
+}
+
+_ready = False
+_ready_lock = threading.Lock()
+
+
+def stamp(moment=None):
+    """Timestamp text with milliseconds; sorts like the moments it holds."""
+    return (moment or datetime.now()).isoformat(sep=" ", timespec="milliseconds")
+
+
+def ensure_payments(conn):
+    """Create the app's payments table once per process.
+
+    Run this before a write transaction starts: the DDL commits implicitly
+    on MySQL.
+    """
+    global _ready
+    if _ready:
+        return
+    with _ready_lock:
+        if _ready:
+            return
+        from migrations import engine_of
+
+        conn.cursor().execute(CREATE_TABLE[engine_of(conn)])
+        conn.commit()
+        _ready = True
+
+
+@db.on_configure
+def _forget_ready():
+    """Another database may not have the table yet."""
+    global _ready
+    _ready = False
+
+
+def enqueue_payment(cursor, reservation_id, amount, method=DEFAULT_METHOD):
+    """Queue a booking's payment inside the caller's transaction (app schema)."""
+    now = stamp()
+    cursor.execute("INSERT INTO payments (reservation_id, amount, payment_date, payment_method, status, "
+                   "next_attempt_at) VALUES (%s, %s, %s, %s, 'pending', %s)",
+                   (reservation_id, amount, now, method, now))
+
+
+def enqueue_unpaid(schema="app", since=None, method=DEFAULT_METHOD):
+    """Queue a payment for every booking from ``since`` (default today) that has none; return how many."""
+    names = PAYMENT_TABLES[schema]
+    with db.connection() as conn:
+        if schema == "app":
+            ensure_payments(conn)
+        db.begin_write(conn)
+        cursor = conn.cursor()
+        cursor.execute(UNPAID[schema], ((since or date.today()).isoformat(),))
+        now = stamp()
+        rows = [(reservation_id, amount, now, method, now) for reservation_id, amount in cursor.fetchall()]
+        if rows:
+            cursor.executemany("INSERT INTO {table} ({reservation}, {amount}, {created}, {method}, {status}, {due}) "
+                               "VALUES (%s, %s, %s, %s, 'pending', %s)".format(**names), rows)
+        conn.commit()
+        return len(rows)
+
+
+def settlement_status(schema="app"):
+    """``{status: count}`` plus the age in seconds of the oldest due pending payment."""
+    names = PAYMENT_TABLES[schema]
+    counts = dict(db.fetch_all("SELECT {status}, COUNT(*) FROM {table} GROUP BY {status}".format(**names)))
+    oldest = db.fetch_all("SELECT MIN({due}) FROM {table} WHERE {status} = 'pending' AND {due} <= %s"
+                          .format(**names), (stamp(),))[0][0]
+    counts["oldest_due_s"] = (datetime.now() - to_datetime(oldest)).total_seconds() if oldest else 0.0
+    return counts
+
+
+# -- gateways -----------------------------------------------------------------
+
+PaymentRequest = namedtuple("PaymentRequest", "payment_id reservation_id amount method attempts created")
+PaymentRequest.__doc__ = """A payment sent to the gateway; ``payment_id`` is its idempotency key."""
+
+
+class GatewayError(Exception):
+    """The gateway could not be reached or failed as a whole; the batch is retried later."""
+
+
+class Gateway(ABC):
+    """Settles batches of payments.
+
+    ``settle(requests)`` returns ``{payment_id: (status, reference)}`` where
+    status is ``"completed"`` (``reference`` identifies the charge),
+    ``"failed"`` (declined for good) or ``"pending"`` (try again later).
+    Payments missing from the answer are retried.  Raise ``GatewayError``
+    when the whole call failed.  Called from several threads at once.
+    """
+
+    @abstractmethod
+    def settle(self, requests):
+        """Charge ``requests`` and return their outcomes by payment id."""
+
+
+class SimulatedGateway(Gateway):
+    """Local stand-in for a card processor, for tests and benchmarks.
+
+    Each call waits ``latency`` plus ``per_payment`` for each payment, as a
+    network round trip would, fails as a whole with ``outage_rate`` and
+    declines payments for good or for now at the given rates.  Charges are
+    remembered by payment id, so a replayed payment gets its first answer.
+    """
+
+    def __init__(self, latency=0.05, per_payment=0.0002, decline_rate=0.02, soft_decline_rate=0.03,
+                 outage_rate=0.02, seed=None):
+        self.latency = latency
+        self.per_payment = per_payment
+        self.decline_rate = decline_rate
+        self.soft_decline_rate = soft_decline_rate
+        self.outage_rate = outage_rate
+        self.rng = random.Random(seed)
+        self.charged = {}  # payment id -> reference
+        self.calls = 0
+        self._lock = threading.Lock()
+
+    def settle(self, requests):
+        time.sleep(self.latency + self.per_payment * len(requests))
+        with self._lock:
+            self.calls += 1
+            if self.rng.random() < self.outage_rate:
+                raise GatewayError("simulated gateway timeout")
+            results = {}
+            for request in requests:
+                if request.payment_id in self.charged:
+                    results[request.payment_id] = ("completed", self.charged[request.payment_id])
+                    continue
+                draw = self.rng.random()
+                if draw < self.decline_rate:
+                    results[request.payment_id] = ("failed", None)
+                elif draw < self.decline_rate + self.soft_decline_rate:
+                    results[request.payment_id] = ("pending", None)
+                else:
+                    reference = f"sim-{request.payment_id}-{self.calls}"
+                    self.charged[request.payment_id] = reference
+                    results[request.payment_id] = ("completed", reference)
+            return results
+
+
+def load_gateway(spec):
+    """``"simulated"`` or ``"package.module:Class"`` -> a gateway instance."""
+    if spec == "simulated":
+        return SimulatedGateway()
+    module, _, name = spec.partition(":")
+    return getattr(importlib.import_module(module), name)()
+
+
+# -- settlement ---------------------------------------------------------------
+
+class SettlementStats:
+    """What a pipeline run did; ``lags`` are seconds from queueing to settlement."""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.completed = 0
+        self.failed = 0
+        self.retried = 0
+        self.gateway_errors = 0
+        self.batches = 0
+        self.writes = 0
+        self.lags = []
+
+    def summary(self):
+        elapsed = time.perf_counter() - self.started
+        lags = sorted(self.lags)
+
+        def lag(fraction):
+            return lags[min(len(lags) - 1, int(len(lags) * fraction))] if lags else 0.0
+
+        settled = self.completed + self.failed
+        return {
+            "completed": self.completed,
+            "failed": self.failed,
+            "retried": self.retried,
+            "gateway_errors": self.gateway_errors,
+            "batches": self.batches,
+            "writes": self.writes,
+            "seconds": elapsed,
+            "settled_per_minute": settled / elapsed * 60 if elapsed else 0.0,
+            "lag_p50_s": lag(0.50),
+            "lag_p95_s": lag(0.95),
+            "lag_p99_s": lag(0.99),
+        }
+
+
+def retry_at(attempts, now=None):
+    """When a payment that has had ``attempts`` tries is tried again."""
+    delay = min(MAX_RETRY_DELAY, RETRY_DELAY * 2 ** (attempts - 1))
+    return (now or datetime.now()) + timedelta(seconds=random.uniform(delay / 2, delay))
+
+
+class PaymentPipeline:
+    """Settles due payments of ``schema`` through ``gateway``.
+
+    ``run()`` returns once nothing is due and nothing is in flight, or
+    after ``seconds`` (letting the calls in flight finish).
+    """
+
+    def __init__(self, gateway, schema="app", batch_size=SETTLE_BATCH, workers=SETTLE_WORKERS,
+                 max_attempts=MAX_ATTEMPTS, lease=LEASE_SECONDS):
+        self.gateway = gateway
+        self.schema = schema
+        self.names = PAYMENT_TABLES[schema]
+        self.batch_size = batch_size
+        self.workers = workers
+        self.max_attempts = max_attempts
+        self.lease = lease
+        self.stats = SettlementStats()
+
+    def claim(self, limit):
+        """Lease up to ``limit`` due payments; return them as ``PaymentRequest``s."""
+        names = self.names
+        with db.connection() as conn:
+            if self.schema == "app":
+                ensure_payments(conn)
+            db.begin_write(conn)
+            cursor = conn.cursor()
+            now = datetime.now()
+            cursor.execute("SELECT {key}, {reservation}, {amount}, {method}, {attempts}, {created} FROM {table} "
+                           "WHERE {status} = 'pending' AND {due} <= %s ORDER BY {due} LIMIT %s FOR UPDATE"
+                           .format(**names), (stamp(now), limit))
+            requests = [PaymentRequest(*row) for row in cursor.fetchall()]
+            if requests:
+                cursor.executemany("UPDATE {table} SET {due} = %s WHERE {key} = %s".format(**names),
+                                   [(stamp(now + timedelta(seconds=self.lease)), request.payment_id)
+                                    for request in requests])
+            conn.commit()
+            return requests
+
+    def _settle(self, requests):
+        """Worker thread: one gateway call; return ``(requests, results or None)``."""
+        try:
+            return requests, self.gateway.settle(requests)
+        except GatewayError:
+            return requests, None
+
+    def record(self, outcomes):
+        """Write the outcomes of finished gateway calls in one transaction."""
+        now = datetime.now()
+        updates = []
+        for requests, results in outcomes:
+            self.stats.batches += 1
+            if results is None:
+                self.stats.gateway_errors += 1
+                results = {}
+            for request in requests:
+                status, reference = results.get(request.payment_id, ("pending", None))
+                attempts = request.attempts + 1
+                if status == "pending" and attempts >= self.max_attempts:
+                    status = "failed"
+                if status == "pending":
+                    self.stats.retried += 1
+                    updates.append((status, stamp(retry_at(attempts, now)), None, None, request.payment_id))
+                    continue
+                if status == "completed":
+                    self.stats.completed += 1
+                    self.stats.lags.append((now - to_datetime(request.created)).total_seconds())
+                else:
+                    self.stats.failed += 1
+                updates.append((status, stamp(now), stamp(now), reference, request.payment_id))
+        if not updates:
+            return
+        with db.connection() as conn:
+            db.begin_write(conn)
+            conn.cursor().executemany(
+                "UPDATE {table} SET {status} = %s, {attempts} = {attempts} + 1, {due} = %s, {settled} = %s, "
+                "{reference} = %s WHERE {key} = %s AND {status} = 'pending'".format(**self.names), updates)
+            conn.commit()
+        self.stats.writes += 1
+
+    def run(self, seconds=None):
+        """Settle until nothing is due (or ``seconds`` have passed); return the stats summary."""
+        deadline = None if seconds is None else time.monotonic() + seconds
+        in_flight = set()
+        with ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="payments") as executor:
+            while True:
+                accepting = deadline is None or time.monotonic() < deadline
+                claimed = []
+                free = self.workers - len(in_flight)
+                if accepting and free > 0:
+                    claimed = self.claim(free * self.batch_size)
+                    for first in range(0, len(claimed), self.batch_size):
+                        in_flight.add(executor.submit(self._settle, claimed[first:first + self.batch_size]))
+                if not in_flight:
+                    if deadline is None or not accepting:
+                        break
+                    time.sleep(POLL_INTERVAL)
+                    continue
+                done, in_flight = wait(in_flight, timeout=POLL_INTERVAL, return_when=FIRST_COMPLETED)
+                if done:
+                    self.record([future.result() for future in done])
+        return self.stats.summary()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Queue and settle payments.")
+    parser.add_argument("command", choices=("settle", "status", "enqueue"))
+    parser.add_argument("--gateway", default="simulated", help='"simulated" or "package.module:Class"')
+    parser.add_argument("--workers", type=int, default=SETTLE_WORKERS, help="gateway calls in flight")
+    parser.add_argument("--batch-size", type=int, default=SETTLE_BATCH, help="payments per gateway call")
+    parser.add_argument("--seconds", type=float, help="settle: keep polling this long (default: until idle)")
+    parser.add_argument("--target", choices=("sqlite", "mysql"), default="sqlite")
+    parser.add_argument("--db", default="car_rental.db", help="SQLite file (ignored for MySQL)")
+    parser.add_argument("--schema", choices=("app", "rental"),
+                        help="tables to use (default: app on SQLite, rental on MySQL)")
+    args = parser.parse_args()
+    schema = args.schema or ("app" if args.target == "sqlite" else "rental")
+
+    db.use_backend(db.make_backend(args.target, args.db), size=2, prepare=False)
+    from migrations import migrate
+
+    with db.connection() as conn:
+        migrate(conn, schema)  # the payment tables and columns come by migration
+    if args.command == "enqueue":
+        print(f"Queued {enqueue_unpaid(schema):,} payments")
+    elif args.command == "status":
+        for name, value in settlement_status(schema).items():
+            print(f"{name}: {value:,.0f}" if name == "oldest_due_s" else f"{name}: {value:,}")
+    else:
+        pipeline = PaymentPipeline(load_gateway(args.gateway), schema, args.batch_size, args.workers)
+        for name, value in pipeline.run(args.seconds).items():
+            print(f"{name}: {value:,.2f}" if isinstance(value, float) else f"{name}: {value:,}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,251 @@
+"""Reservation pricing: quotes from the daily rate, the season and one-way fees.
+
+A quote charges the car's daily rate times the sum of the day factors of
+the rented days, plus a surcharge when the car is returned to another
+office.  Day factors come from ``PricingRules``: one multiplier per month
+and, on top, dated periods such as the December holidays.
+
+Their running sums are precomputed a year at a time and memoized, so a
+rental of any length is priced with two lookups and a subtraction.
+``quote_many`` also shares the date work between all the cars of one
+search, and the fleet's rates are read in one query and cached.
+
+A rental is charged per started day: from 10:00 on the 1st to 12:00 on
+the 3rd is three days, starting on the 1st.
+
+    python pricing.py 2025-07-01 2025-07-08
+    python pricing.py 2025-07-01 2025-07-08 --target mysql --schema rental --office 3 --return-office 5
+"""
+import argparse
+import math
+import threading
+from collections import namedtuple
+from datetime import date, timedelta
+from itertools import accumulate
+
+import db
+from availability import get_index, load_rental_schema, to_datetime
+from cache import TTLCache
+
+DEFAULT_DAILY_RATE = 50.00
+# Daily rates of the app schema's cars, which only record the model's name.
+MODEL_RATES = {
+    "Toyota Camry": 50.00, "Honda Civic": 45.00, "Ford Mustang": 75.00,
+    "Hyundai Elantra": 40.00, "Kia Sportage": 55.00, "Nissan Sunny": 35.00,
+    "BMW 3 Series": 95.00, "Mercedes C-Class": 110.00, "Chevrolet Aveo": 32.00,
+    "Volkswagen Golf": 48.00, "Jeep Wrangler": 85.00, "Tesla Model 3": 120.00,
+}
+# Price multiplier by month (January first): dearer in summer, cheaper in winter.
+MONTHLY_FACTORS = (0.9, 0.85, 0.95, 1.0, 1.05, 1.15, 1.25, 1.25, 1.05, 1.0, 0.95, 1.1)
+# ((first month, day), (last month, day), multiplier), every year; may wrap around New Year.
+HOLIDAY_PERIODS = (((12, 20), (1, 3), 1.2),)
+ONE_WAY_FEE = 35.00
+RATE_TABLE_TTL = 300  # seconds; a car added meanwhile triggers a reload
+
+Quote = namedtuple("Quote", "car_id days base seasonal one_way total")
+Quote.__doc__ = """A priced rental: ``base`` is rate x days, ``seasonal`` what the season adds (or takes off)."""
+
+
+class PricingRules:
+    """Seasonal multipliers and one-way surcharges.
+
+    ``office_fees`` maps ``(pick-up office, return office)`` to a surcharge
+    replacing ``one_way_fee`` for that pair.
+    """
+
+    def __init__(self, monthly=MONTHLY_FACTORS, periods=HOLIDAY_PERIODS, one_way_fee=ONE_WAY_FEE,
+                 office_fees=None):
+        if len(monthly) != 12:
+            raise ValueError("Give one monthly factor per month")
+        self.monthly = tuple(monthly)
+        self.periods = tuple(periods)
+        self.one_way_fee = one_way_fee
+        self.office_fees = dict(office_fees or {})
+
+    def day_factor(self, day):
+        """Price multiplier of the calendar ``day``."""
+        factor = self.monthly[day.month - 1]
+        month_day = (day.month, day.day)
+        for first, last, multiplier in self.periods:
+            if first <= month_day <= last if first <= last else (month_day >= first or month_day <= last):
+                factor *= multiplier
+        return factor
+
+    def one_way(self, pickup_office, return_office):
+        """Surcharge for returning to another office (none when either is unknown)."""
+        if pickup_office is None or return_office is None or pickup_office == return_office:
+            return 0.0
+        return self.office_fees.get((pickup_office, return_office), self.one_way_fee)
+
+
+def model_rate(name):
+    """Daily rate of an app-schema car from its model name."""
+    return MODEL_RATES.get(name, DEFAULT_DAILY_RATE)
+
+
+def rental_span(pick_up, return_time):
+    """Return the first charged day and the number of days charged (at least one)."""
+    start, end = to_datetime(pick_up), to_datetime(return_time)
+    if end <= start:
+        raise ValueError("Return date must be after pick-up date")
+    return start.date(), max(1, math.ceil((end - start).total_seconds() / 86400))
+
+
+class PricingEngine:
+    """Prices rentals under ``rules``; safe to share between threads."""
+
+    def __init__(self, rules=None):
+        self.rules = rules or PricingRules()
+        self._years = {}  # year -> running sums of its day factors
+
+    def _running(self, year):
+        table = self._years.get(year)
+        if table is None:
+            first = date(year, 1, 1)
+            length = (date(year + 1, 1, 1) - first).days
+            factors = (self.rules.day_factor(first + timedelta(days=i)) for i in range(length))
+            table = self._years[year] = [0.0, *accumulate(factors)]  # a racing thread builds the same list
+        return table
+
+    def factor_sum(self, start, days):
+        """Sum of the day factors of ``days`` days from ``start``."""
+        end = start + timedelta(days=days)
+        total = 0.0
+        while start < end:
+            stop = min(end, date(start.year + 1, 1, 1))
+            table = self._running(start.year)
+            new_year = date(start.year, 1, 1)
+            total += table[(stop - new_year).days] - table[(start - new_year).days]
+            start = stop
+        return total
+
+    def quote(self, rate, pick_up, return_time, pickup_office=None, return_office=None, car_id=None):
+        """Price one rental at the daily ``rate``."""
+        return self.quote_many([(car_id, rate, pick_up, return_time, pickup_office, return_office)])[0]
+
+    def quote_many(self, requests):
+        """Price ``(car id, rate, pick-up, return, pick-up office, return office)`` requests.
+
+        Requests sharing their dates - every car of a search - share the
+        date arithmetic.
+        """
+        spans = {}
+        quotes = []
+        one_way = self.rules.one_way
+        for car_id, rate, pick_up, return_time, pickup_office, return_office in requests:
+            dates = (pick_up, return_time)
+            span = spans.get(dates)
+            if span is None:
+                start, days = rental_span(pick_up, return_time)
+                span = spans[dates] = (days, self.factor_sum(start, days))
+            days, factors = span
+            rate = float(rate)
+            base = round(rate * days, 2)
+            charged = round(rate * factors, 2)
+            fee = one_way(pickup_office, return_office) if pickup_office != return_office else 0.0
+            quotes.append(Quote(car_id, days, base, round(charged - base, 2), fee, round(charged + fee, 2)))
+        return quotes
+
+
+_engine = None
+_engine_lock = threading.Lock()
+
+
+def get_engine():
+    """Return the shared pricing engine."""
+    global _engine
+    if _engine is None:
+        with _engine_lock:
+            if _engine is None:
+                _engine = PricingEngine()
+    return _engine
+
+
+def configure_pricing(rules):
+    """Replace the shared engine's rules (its memoized tables go with it)."""
+    global _engine
+    with _engine_lock:
+        _engine = PricingEngine(rules)
+    return _engine
+
+
+def quote(rate, pick_up, return_time, pickup_office=None, return_office=None):
+    """Price one rental with the shared engine."""
+    return get_engine().quote(rate, pick_up, return_time, pickup_office, return_office)
+
+
+RATE_QUERIES = {
+    "app": "SELECT id, name, NULL FROM cars",
+    "rental": "SELECT CarID, DailyRentalRate, OfficeID FROM Car",
+}
+rate_tables = TTLCache(maxsize=4, ttl=RATE_TABLE_TTL)
+db.on_configure(rate_tables.clear)  # another database, other cars
+
+
+def load_rate_table(schema="app"):
+    """Return ``{car id: (daily rate, office id)}`` for the whole fleet, cached."""
+    def load():
+        rows = db.fetch_all(RATE_QUERIES[schema])
+        if schema == "app":
+            return {car_id: (model_rate(name), None) for car_id, name, _ in rows}
+        return {car_id: (float(rate), office_id) for car_id, rate, office_id in rows}
+
+    return rate_tables.get_or_load(schema, load)
+
+
+def quote_cars(car_ids, pick_up, return_time, return_office=None, schema="app"):
+    """Quote each of ``car_ids`` for the same dates, picked up at the car's own office.
+
+    Unknown cars are left out.  ``return_office=None`` means the same office.
+    """
+    rates = load_rate_table(schema)
+    if any(car_id not in rates for car_id in car_ids):
+        rate_tables.invalidate(schema)  # cars added since the table was cached
+        rates = load_rate_table(schema)
+    requests = []
+    for car_id in car_ids:
+        entry = rates.get(car_id)
+        if entry is not None:
+            rate, office_id = entry
+            requests.append((car_id, rate, pick_up, return_time, office_id,
+                             office_id if return_office is None else return_office))
+    return get_engine().quote_many(requests)
+
+
+def search_quotes(pick_up, return_time, office_id=None, return_office=None, schema="app", index=None):
+    """Quote every car free for the whole rental, cheapest first."""
+    index = index if index is not None else get_index()
+    quotes = quote_cars(index.free_cars(pick_up, return_time, office_id), pick_up, return_time,
+                        return_office, schema)
+    quotes.sort(key=lambda quote: (quote.total, quote.car_id))
+    return quotes
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Quote every car free between two dates.")
+    parser.add_argument("pick_up")
+    parser.add_argument("return_time")
+    parser.add_argument("--office", type=int, help="pick-up office (rental schema)")
+    parser.add_argument("--return-office", type=int)
+    parser.add_argument("--top", type=int, default=10)
+    parser.add_argument("--target", choices=("sqlite", "mysql"), default="sqlite")
+    parser.add_argument("--db", default="car_rental.db", help="SQLite file (ignored for MySQL)")
+    parser.add_argument("--schema", choices=("app", "rental"),
+                        help="tables to read (default: app on SQLite, rental on MySQL)")
+    args = parser.parse_args()
+    schema = args.schema or ("app" if args.target == "sqlite" else "rental")
+
+    db.use_backend(db.make_backend(args.target, args.db), size=1, prepare=False)
+    index = None
+    if schema == "rental":
+        with db.connection() as conn:
+            index = load_rental_schema(conn.cursor())
+    quotes = search_quotes(args.pick_up, args.return_time, args.office, args.return_office, schema, index)
+    print(f"{len(quotes):,} cars free")
+    for q in quotes[:args.top]:
+        print(f"car {q.car_id}: {q.days} days, base {q.base:.2f}, season {q.seasonal:+.2f}, "
+              f"one-way {q.one_way:.2f}, total {q.total:.2f}")
+
+
+if __name__ == "__main__":
+    main()
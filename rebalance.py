@@ -0,0 +1,223 @@
+"""Per-office stock projection and car transfer planning for the rental schema.
+
+One-way rentals take cars from their pick-up office and leave them at
+another, so some offices run dry while others fill up.  From the
+confirmed reservations this projects, for every office and every day of
+the horizon, how many cars will be on hand:
+
+    stock[office, day] = cars based there + cumulative(arrivals - departures)
+
+built with ``bincount`` over ``office * days + day`` and one ``cumsum``,
+so the whole network is a single array operation.  A car on rent today
+left at its pick-up office on day 0 and comes back to its return office on
+its end day.
+
+An office is short on any day its stock falls below ``min_stock``.  The
+planner moves cars in as late as it can (``lead`` days before the first
+shortage they cover), each from the office that can spare the most for
+the rest of the horizon.  It moves exactly as many cars as the shortages
+need, the fewest that can fix them, and reports what it could not cover
+when the whole network is short.
+
+    python rebalance.py --target mysql --days 90
+    python rebalance.py --db rental.db --min-stock 2 --lead 2
+"""
+import argparse
+import time
+from collections import namedtuple
+from datetime import date, timedelta
+
+import numpy as np
+
+import db
+
+REBALANCE_HORIZON = 90  # days planned ahead
+MIN_STOCK = 1           # cars every office should have on hand each day
+TRANSFER_LEAD = 1       # days a transfer arrives before the shortage it covers
+
+OFFICES = "SELECT OfficeID, OfficeName FROM Office ORDER BY OfficeID"
+FLEET = "SELECT OfficeID, COUNT(*) FROM Car WHERE Status <> 'out_of_service' GROUP BY OfficeID"
+FLOWS = ("SELECT PickupOfficeID, ReturnOfficeID, StartDate, EndDate FROM Reservation "
+         "WHERE Status = 'confirmed' AND StartDate < %s")
+
+Transfer = namedtuple("Transfer", "day from_office to_office cars")
+Transfer.__doc__ = """Move ``cars`` on ``day`` (offset from the plan's start); offices are positions."""
+Shortage = namedtuple("Shortage", "office first_day worst")
+Shortage.__doc__ = """An office below the minimum from ``first_day`` on, by ``worst`` cars at most."""
+
+
+class Network:
+    """Offices, the cars based at each and the rentals moving cars between them.
+
+    ``pickup``/``dropoff`` are office positions in ``office_ids`` and
+    ``start``/``end`` day offsets from ``origin``, one entry per rental.
+    """
+
+    def __init__(self, origin, days, office_ids, names, based, pickup, dropoff, start, end):
+        self.origin = origin
+        self.days = days
+        self.office_ids = office_ids
+        self.names = names
+        self.based = based
+        self.pickup = pickup
+        self.dropoff = dropoff
+        self.start = start
+        self.end = end
+
+    def __len__(self):
+        return len(self.pickup)
+
+
+def load_network(origin=None, days=REBALANCE_HORIZON):
+    """Read the rental schema into a ``Network`` starting at ``origin`` (default today)."""
+    origin = origin or date.today()
+    offices = db.fetch_all(OFFICES)
+    office_ids = np.array([row[0] for row in offices], dtype=np.int64)
+    names = [str(row[1]) for row in offices]
+    based = np.zeros(len(office_ids), dtype=np.int64)
+    fleet = db.fetch_all(FLEET)
+    if fleet:
+        ids, counts = (np.array(column, dtype=np.int64) for column in zip(*fleet))
+        based[np.searchsorted(office_ids, ids)] = counts
+
+    rows = db.fetch_all(FLOWS, ((origin + timedelta(days=days)).isoformat(),))
+    if rows:
+        pickup, dropoff, start, end = zip(*rows)
+        base = np.datetime64(origin, "D")
+        # datetime64[D] parses ISO text, dates and datetimes alike, dropping the time of day
+        start = (np.array(start, dtype="datetime64[D]") - base).astype(np.int64)
+        end = (np.array(end, dtype="datetime64[D]") - base).astype(np.int64)
+        pickup = np.searchsorted(office_ids, np.array(pickup, dtype=np.int64))
+        dropoff = np.searchsorted(office_ids, np.array(dropoff, dtype=np.int64))
+    else:
+        pickup = dropoff = start = end = np.zeros(0, dtype=np.int64)
+    return Network(origin, days, office_ids, names, based, pickup, dropoff, start, end)
+
+
+def project_stock(network):
+    """``stock[office, day]``: cars on hand at each office on each day of the horizon."""
+    offices, days = len(network.office_ids), network.days
+    cells = offices * days
+    # Rentals already under way left on day 0; returns after the horizon never arrive in it.
+    start = np.clip(network.start, 0, days)
+    end = np.clip(network.end, 0, days)
+    leaving = start < days
+    arriving = end < days
+    flow = (np.bincount(network.dropoff[arriving] * days + end[arriving], minlength=cells)
+            - np.bincount(network.pickup[leaving] * days + start[leaving], minlength=cells))
+    return network.based[:, None] + np.cumsum(flow.reshape(offices, days), axis=1)
+
+
+def _suffix_min(stock):
+    """Lowest stock from each day to the end of the horizon."""
+    return np.minimum.accumulate(stock[..., ::-1], axis=-1)[..., ::-1]
+
+
+def find_shortages(stock, min_stock=MIN_STOCK):
+    """Offices whose stock drops below ``min_stock``, by first shortage day."""
+    deficit = min_stock - stock
+    short = deficit > 0
+    offices = np.flatnonzero(short.any(axis=1))
+    first = short[offices].argmax(axis=1)
+    worst = deficit[offices].max(axis=1)
+    return sorted((Shortage(int(office), int(day), int(cars)) for office, day, cars in zip(offices, first, worst)),
+                  key=lambda shortage: (shortage.first_day, shortage.office))
+
+
+def plan_transfers(stock, min_stock=MIN_STOCK, lead=TRANSFER_LEAD):
+    """Return ``(transfers, stock after them, unresolved [(office, day, cars)])``.
+
+    An office needs as many cars by day ``d`` as its worst deficit up to
+    ``d``; each rise of that running maximum is a demand, met in day order
+    from the offices with the most to spare from the transfer day on.
+    """
+    stock = stock.copy()
+    needed = np.maximum.accumulate(np.maximum(min_stock - stock, 0), axis=1)
+    rises = np.diff(needed, axis=1, prepend=0)
+    offices, days = np.nonzero(rises)
+    order = np.argsort(days, kind="stable")
+    spare = _suffix_min(stock) - min_stock  # cars an office can give away from each day on
+
+    transfers, unresolved = [], []
+    for office, day in zip(offices[order].tolist(), days[order].tolist()):
+        wanted = int(rises[office, day])
+        when = max(0, day - lead)
+        while wanted:
+            offers = spare[:, when].copy()
+            offers[office] = 0
+            donor = int(offers.argmax())
+            cars = min(wanted, int(offers[donor]))
+            if cars <= 0:
+                unresolved.append((office, day, wanted))
+                break
+            stock[donor, when:] -= cars
+            stock[office, when:] += cars
+            for changed in (donor, office):
+                spare[changed] = _suffix_min(stock[changed]) - min_stock
+            transfers.append(Transfer(when, donor, office, cars))
+            wanted -= cars
+    return transfers, stock, unresolved
+
+
+class RebalancePlan:
+    """Projection before and after the transfers, with the shortages found."""
+
+    def __init__(self, network, stock, shortages, transfers, after, unresolved, seconds):
+        self.network = network
+        self.stock = stock
+        self.shortages = shortages
+        self.transfers = transfers
+        self.after = after
+        self.unresolved = unresolved
+        self.seconds = seconds
+
+    def moves(self):
+        return sum(transfer.cars for transfer in self.transfers)
+
+    def day(self, offset):
+        return self.network.origin + timedelta(days=offset)
+
+
+def plan(network, min_stock=MIN_STOCK, lead=TRANSFER_LEAD):
+    """Project the network's stock and plan the transfers that fix its shortages."""
+    started = time.perf_counter()
+    stock = project_stock(network)
+    shortages = find_shortages(stock, min_stock)
+    transfers, after, unresolved = plan_transfers(stock, min_stock, lead)
+    return RebalancePlan(network, stock, shortages, transfers, after, unresolved, time.perf_counter() - started)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Forecast office stock and plan car transfers.")
+    parser.add_argument("--days", type=int, default=REBALANCE_HORIZON, help="horizon")
+    parser.add_argument("--from", dest="start", type=date.fromisoformat, help="first day (default today)")
+    parser.add_argument("--min-stock", type=int, default=MIN_STOCK, help="cars each office keeps on hand")
+    parser.add_argument("--lead", type=int, default=TRANSFER_LEAD, help="days transfers arrive early")
+    parser.add_argument("--top", type=int, default=30, help="rows to print")
+    parser.add_argument("--target", choices=("sqlite", "mysql"), default="sqlite")
+    parser.add_argument("--db", default="car_rental.db", help="SQLite file with the rental schema")
+    args = parser.parse_args()
+
+    db.use_backend(db.make_backend(args.target, args.db), size=1, prepare=False)
+    started = time.perf_counter()
+    network = load_network(args.start, args.days)
+    loaded = time.perf_counter() - started
+    result = plan(network, args.min_stock, args.lead)
+    names = network.names
+    print(f"{len(network.office_ids):,} offices, {int(network.based.sum()):,} cars, {len(network):,} rentals; "
+          f"loaded in {loaded:.2f}s, planned in {result.seconds * 1000:.1f} ms")
+
+    print(f"\n{len(result.shortages)} offices short of {args.min_stock} car(s):")
+    for shortage in result.shortages[:args.top]:
+        print(f"  {names[shortage.office]:<30} from {result.day(shortage.first_day)}, "
+              f"down to {args.min_stock - shortage.worst}")
+    print(f"\n{result.moves()} cars to move in {len(result.transfers)} transfers:")
+    for transfer in result.transfers[:args.top]:
+        print(f"  {result.day(transfer.day)}  {transfer.cars:>3} x {names[transfer.from_office]} "
+              f"-> {names[transfer.to_office]}")
+    for office, day, cars in result.unresolved[:args.top]:
+        print(f"  not enough cars anywhere: {names[office]} still {cars} short on {result.day(day)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,531 @@
+"""Booking operations shared by the GUI screens, free of any Tk dialogs.
+
+Each function borrows a pooled connection, does its work and either returns
+a result or raises: ``RentalError`` for business-rule problems the clerk can
+fix, the driver's ``Error`` for database failures.  This keeps them safe to
+run on the background worker, with the screens showing the outcome.
+"""
+import hashlib
+import random
+import re
+import threading
+import time
+from datetime import datetime
+from decimal import ROUND_HALF_UP, Decimal, InvalidOperation
+
+from availability import date_text, get_index, record_cancellation, record_reservation, record_return, to_datetime
+from bloom import BloomFilter
+from cache import TTLCache
+from catalog import record_car
+from counters import bump, ensure_counters
+from customer_index import record_customer
+from db import begin_write, connection, database_errors, is_transient, on_configure, unique_violation
+from journal import ensure_journal, record_change
+from payments import enqueue_payment, ensure_payments
+from pricing import get_engine, model_rate
+from writebehind import ENDING_STATUSES, batch_applied, ensure_status_batches, get_status_buffer, mark_applied
+
+# The fleet catalogue changes rarely: ids by details live longer than statuses.
+CAR_CACHE_SIZE = 10000
+car_id_cache = TTLCache(maxsize=CAR_CACHE_SIZE, ttl=300)
+car_status_cache = TTLCache(maxsize=CAR_CACHE_SIZE, ttl=30)
+
+BOOKING_ATTEMPTS = 3  # tries for a write that hits a deadlock or lock timeout
+RETRY_DELAY = 0.02    # seconds; doubled per attempt, with jitter
+retry_stats = {"retries": 0}
+
+CENT = Decimal("0.01")          # payments are kept to the cent ...
+PAYMENT_LIMIT = Decimal("1e8")  # ... and below this, to fit DECIMAL(10,2)
+
+
+class RentalError(Exception):
+    """A booking request that cannot be carried out as entered."""
+
+    def __init__(self, message, title="Error"):
+        super().__init__(message)
+        self.title = title
+
+
+def with_retries(func, *args, attempts=BOOKING_ATTEMPTS):
+    """Call ``func(*args)``, retrying deadlocks and lock timeouts with jittered backoff."""
+    for attempt in range(1, attempts + 1):
+        try:
+            return func(*args)
+        except database_errors() as e:
+            if attempt == attempts or not is_transient(e):
+                raise
+            retry_stats["retries"] += 1
+            time.sleep(random.uniform(0, RETRY_DELAY * 2 ** attempt))
+
+
+def validate_and_hash_email(email):
+    """Return the MD5 hash stored for ``email``; ``ValueError`` if it is not an address."""
+    if re.match(r"[^@]+@[^@]+\.[^@]+", email):
+        return hashlib.md5(email.encode()).hexdigest()
+    raise ValueError("Invalid email address")
+
+
+def check_dates(pick_up, return_time):
+    """Raise ``ValueError`` unless both dates parse and return is after pick-up."""
+    if to_datetime(return_time) <= to_datetime(pick_up):
+        raise ValueError("Return date must be after pick-up date")
+
+
+def quote_payment(name, pick_up, return_time):
+    """Price of renting a car of model ``name`` for these dates."""
+    check_dates(pick_up, return_time)
+    return get_engine().quote(model_rate(name), pick_up, return_time).total
+
+
+def payment_amount(payment):
+    """``payment`` in whole cents; ValueError unless it is an amount from 0 up to ``PAYMENT_LIMIT``."""
+    try:
+        amount = Decimal(str(payment).strip())
+    except InvalidOperation:
+        amount = None
+    if amount is None or not amount.is_finite() or not 0 <= amount < PAYMENT_LIMIT:
+        raise ValueError(f"Invalid payment: {payment!r}")
+    return float(amount.quantize(CENT, ROUND_HALF_UP))  # the payment columns are REAL on SQLite
+
+
+def payment_or_quote(payment, name, pick_up, return_time):
+    """The amount the clerk entered, in whole cents, or the quote when the field was left empty."""
+    if payment is None or str(payment).strip() == "":
+        return quote_payment(name, pick_up, return_time)
+    try:
+        return payment_amount(payment)
+    except ValueError:
+        raise RentalError("Payment must be an amount such as 120.50, or empty for the quote.",
+                          "Invalid Input") from None
+
+
+CUSTOMER_FILTER_ERROR = 0.01  # share of new customers that still cost a lookup
+CUSTOMER_FILTER_MIN = 100000  # keys the filter has room for, at least
+DUPLICATE_MESSAGES = {
+    "email": "Email already exists. Please use a different email.",
+    "phone": "Phone number already exists. Please use a different phone number.",
+}
+_customer_filter = None
+_customer_filter_lock = threading.Lock()
+
+
+def _filter_key(column, value):
+    return f"{column}:{value}"
+
+
+def _load_customer_filter():
+    with connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute("SELECT COUNT(*) FROM customers")
+        count = cursor.fetchone()[0]
+        # Two keys per customer, and room for the table to double before a rebuild
+        bloom = BloomFilter(max(CUSTOMER_FILTER_MIN, 4 * count), CUSTOMER_FILTER_ERROR)
+        cursor.execute("SELECT email, phone FROM customers")
+        while True:
+            rows = cursor.fetchmany(10000)
+            if not rows:
+                break
+            for email, phone in rows:
+                bloom.add(_filter_key("email", email))
+                bloom.add(_filter_key("phone", phone))
+    return bloom
+
+
+def customer_filter():
+    """Return the Bloom filter of registered emails and phones, loading it on first use."""
+    global _customer_filter
+    bloom = _customer_filter
+    if bloom is not None and not bloom.full():
+        return bloom
+    with _customer_filter_lock:
+        if _customer_filter is None or _customer_filter.full():
+            _customer_filter = _load_customer_filter()
+        return _customer_filter
+
+
+@on_configure
+def _forget_customer_filter():
+    global _customer_filter
+    with _customer_filter_lock:
+        _customer_filter = None
+
+
+def remember_customer(phone=None, email_hash=None):
+    """Add a registered phone and/or email to the filter (if it is loaded)."""
+    bloom = _customer_filter
+    if bloom is not None:
+        if phone is not None:
+            bloom.add(_filter_key("phone", phone))
+        if email_hash is not None:
+            bloom.add(_filter_key("email", email_hash))
+
+
+def _suspects(phone, email_hash):
+    """The keys the filter has maybe seen: usually none, so nothing to look up."""
+    bloom = customer_filter()
+    return [(column, value) for column, value in (("email", email_hash), ("phone", phone))
+            if _filter_key(column, value) in bloom]
+
+
+def _find_duplicate(cursor, suspects):
+    for column, value in suspects:
+        cursor.execute(f"SELECT 1 FROM customers WHERE {column} = %s LIMIT 1", (value,))
+        if cursor.fetchall():
+            return column
+    return None
+
+
+def find_duplicate(phone, email_hash):
+    """Return ``"email"`` or ``"phone"`` if a customer already has it, else ``None``.
+
+    The filter answers for almost every new customer without a query; only
+    its "maybe" is looked up.  Customers registered by other processes since
+    the filter was loaded are missed here and caught by the unique keys.
+    """
+    suspects = _suspects(phone, email_hash)
+    if not suspects:
+        return None
+    with connection() as conn:
+        return _find_duplicate(conn.cursor(), suspects)
+
+
+def add_customer(name, phone, email_hash, country):
+    """Insert a customer and return the new id.
+
+    The unique keys on email and phone have the final say: the row is
+    inserted straight away and a violation becomes a ``RentalError``.  Keys
+    the filter may have seen are looked up first, so known duplicates do
+    not cost a failed insert.
+    """
+    suspects = _suspects(phone, email_hash)
+    with connection() as conn:
+        ensure_counters(conn)
+        ensure_journal(conn)
+        cursor = conn.cursor()
+        duplicate = _find_duplicate(cursor, suspects)
+        if duplicate:
+            raise RentalError(DUPLICATE_MESSAGES[duplicate], "Already Registered")
+        try:
+            cursor.execute(
+                'INSERT INTO customers (name, phone, email, country) VALUES (%s, %s, %s, %s)',
+                (name, phone, email_hash, country)
+            )
+        except database_errors() as e:
+            column = unique_violation(e)
+            if column not in DUPLICATE_MESSAGES:
+                raise
+            conn.rollback()
+            if column == "phone":
+                remember_customer(phone=phone)
+            else:
+                remember_customer(email_hash=email_hash)
+            raise RentalError(DUPLICATE_MESSAGES[column], "Already Registered") from None
+        customer_id = cursor.lastrowid
+        bump(cursor, "customers")
+        record_change(cursor, "customers", customer_id, "insert")
+        conn.commit()
+    remember_customer(phone, email_hash)
+    record_customer(customer_id, name, phone)  # findable in the lookup box straight away
+    return customer_id
+
+
+def car_key(name, model_year, color):
+    """Cache key for a car's details; the GUI passes the year as text."""
+    return (name, str(model_year), color)
+
+
+def _select_car_id(cursor, name, model_year, color):
+    cursor.execute('SELECT id FROM cars WHERE name = %s AND model_year = %s AND color = %s '
+                   'ORDER BY id LIMIT 1', (name, model_year, color))
+    row = cursor.fetchone()
+    return row[0] if row else None
+
+
+def lookup_car_id(name, model_year, color, cursor=None):
+    """Return the id of the car with these details (cached), or ``None``."""
+    def load():
+        if cursor is not None:
+            return _select_car_id(cursor, name, model_year, color)
+        with connection() as conn:
+            return _select_car_id(conn.cursor(), name, model_year, color)
+
+    return car_id_cache.get_or_load(car_key(name, model_year, color), load)
+
+
+def find_car(name, model_year, color):
+    """Return ``(car_id, status)`` for the car with these details, or ``None``."""
+    car_id = lookup_car_id(name, model_year, color)
+    if car_id is None:
+        return None
+    return car_id, get_car_status(car_id)
+
+
+def get_car_status(car_id):
+    """Return the status of a car (cached), or ``None`` if there is no such car."""
+    def load():
+        with connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute('SELECT status FROM cars WHERE id = %s', (car_id,))
+            row = cursor.fetchone()
+            return row[0] if row else None
+
+    return car_status_cache.get_or_load(car_id, load)
+
+
+def invalidate_car(car_id=None, name=None, model_year=None, color=None):
+    """Drop cached entries for a car whose row or status just changed."""
+    if car_id is not None:
+        car_status_cache.invalidate(car_id)
+    if name is not None:
+        car_id_cache.invalidate(car_key(name, model_year, color))
+
+
+@on_configure
+def _clear_caches():
+    """Ids and statuses cached from one database mean nothing in another."""
+    car_id_cache.clear()
+    car_status_cache.clear()
+
+
+def cache_stats():
+    """Hit/miss counters of the car caches, for sizing them."""
+    return {"car_ids": car_id_cache.stats(), "car_statuses": car_status_cache.stats()}
+
+
+def add_car_with_reservation(name, model_year, color, duration, pick_up, return_time, payment, customer_id):
+    """Insert a new car and its first reservation; return ``(car_id, reservation_id)``."""
+    payment = payment_or_quote(payment, name, pick_up, return_time)
+    pick_up, return_time = date_text(pick_up), date_text(return_time)
+    with connection() as conn:
+        ensure_counters(conn)
+        ensure_journal(conn)
+        ensure_payments(conn)
+        cursor = conn.cursor()
+        cursor.execute(
+            'INSERT INTO cars (name, model_year, color) VALUES (%s, %s, %s)',
+            (name, model_year, color)
+        )
+        car_id = cursor.lastrowid
+        cursor.execute(
+            '''INSERT INTO reservations 
+               (car_id, customer_id, duration, pick_up, return_time, payment) 
+               VALUES (%s, %s, %s, %s, %s, %s)''',
+            (car_id, customer_id, duration, pick_up, return_time, payment)
+        )
+        reservation_id = cursor.lastrowid
+        enqueue_payment(cursor, reservation_id, payment)
+        bump(cursor, "cars")
+        bump(cursor, "reservations")
+        record_change(cursor, "cars", car_id, "insert")
+        record_change(cursor, "reservations", reservation_id, "insert")
+        conn.commit()
+    invalidate_car(car_id, name, model_year, color)  # a cached "not found" may now be wrong
+    record_reservation(car_id, pick_up, return_time, reservation_id)  # Keep availability index current
+    record_car(car_id, name, model_year, color)  # ... and the search catalog
+    return car_id, reservation_id
+
+
+def reserve_car(name, model_year, color, duration, pick_up, return_time, payment, customer_id):
+    """Reserve an existing car if it is free; return ``(car_id, reservation_id)``.
+
+    Safe against clerks booking the same car at once, from this process or
+    another: the car's row is locked for the check and the insert, so only
+    bookings of the same car wait on each other.
+    """
+    payment = payment_or_quote(payment, name, pick_up, return_time)
+    pick_up, return_time = date_text(pick_up), date_text(return_time)
+    return with_retries(_reserve_car, name, model_year, color, duration, pick_up, return_time,
+                        payment, customer_id)
+
+
+def _reserve_car(name, model_year, color, duration, pick_up, return_time, payment, customer_id):
+    with connection() as conn:
+        ensure_counters(conn)
+        ensure_journal(conn)
+        ensure_payments(conn)
+        begin_write(conn)
+        cursor = conn.cursor()
+        car_id = lookup_car_id(name, model_year, color, cursor)
+        if car_id is None:
+            raise RentalError("Car details are invalid. Please enter valid car details.", "Invalid Input")
+
+        # Cheap rejection from memory before taking any lock
+        index = get_index(cursor)
+        if not index.is_free(car_id, pick_up, return_time):
+            raise RentalError("This car is already reserved for the selected dates.", "Not Available")
+
+        cursor.execute('SELECT id FROM cars WHERE id = %s FOR UPDATE', (car_id,))
+        cursor.fetchall()
+        # Under the lock, the database has the final say on rows this process has
+        # not seen (booked elsewhere); rows it has seen are judged by the index,
+        # which also knows about early returns.  Query first, then check the index:
+        # a booking committed meanwhile is either unknown here or already indexed.
+        cursor.execute('SELECT id, pick_up, return_time FROM reservations '
+                       'WHERE car_id = %s AND pick_up < %s AND return_time > %s AND return_time > pick_up '
+                       'FOR UPDATE',
+                       (car_id, return_time, pick_up))
+        foreign = [row for row in cursor.fetchall() if not index.knows(row[0])]
+        for reservation_id, start, end in foreign:
+            try:
+                record_reservation(car_id, start, end, reservation_id)
+            except ValueError:
+                pass  # unparseable legacy dates; still counts as a conflict
+        if foreign or not index.is_free(car_id, pick_up, return_time):
+            raise RentalError("This car is already reserved for the selected dates.", "Not Available")
+
+        cursor.execute(
+            '''INSERT INTO reservations 
+               (car_id, customer_id, duration, pick_up, return_time, payment) 
+               VALUES (%s, %s, %s, %s, %s, %s)''',
+            (car_id, customer_id, duration, pick_up, return_time, payment)
+        )
+        reservation_id = cursor.lastrowid
+        enqueue_payment(cursor, reservation_id, payment)
+        bump(cursor, "reservations")
+        record_change(cursor, "reservations", reservation_id, "insert")
+        conn.commit()
+    record_reservation(car_id, pick_up, return_time, reservation_id)
+    return car_id, reservation_id
+
+
+def set_reservation_status(car_id, customer_id, new_status, return_date=None):
+    """Update the open status row of a rental, or start one; True if a row was updated.
+
+    The car's row is locked first, so two clerks updating the same rental
+    cannot both miss the open row and insert a second one.  With write-behind
+    on (see ``writebehind``) the change is only spooled and buffered, and
+    ``None`` is returned: whether a row was open is known at the flush.
+    """
+    buffer = get_status_buffer(apply_status_changes)
+    if buffer is not None:
+        if return_date is None and new_status in ENDING_STATUSES:
+            # Ends the booking when the clerk recorded it, not whenever the spool is flushed or replayed
+            return_date = datetime.now().replace(microsecond=0)
+        buffer.submit(car_id, customer_id, new_status, date_text(return_date) if return_date else None)
+        return None
+    return with_retries(_set_reservation_status, car_id, customer_id, new_status, return_date)
+
+
+def _set_reservation_status(car_id, customer_id, new_status, return_date):
+    with connection() as conn:
+        ensure_counters(conn)
+        ensure_journal(conn)
+        ensure_payments(conn)
+        begin_write(conn)
+        cursor = conn.cursor()
+        updated, ended = _write_status(cursor, car_id, customer_id, new_status, return_date)
+        conn.commit()
+    _status_written(car_id, ended)
+    return updated
+
+
+def _write_status(cursor, car_id, customer_id, new_status, return_date):
+    """Write a status change; return whether an open row was updated, and the booking it ended."""
+    cursor.execute('SELECT id FROM cars WHERE id = %s FOR UPDATE', (car_id,))
+    cursor.fetchall()
+
+    # Check if the reservation exists
+    cursor.execute('''SELECT id FROM car_reservation_status 
+                      WHERE car_id = %s AND customer_id = %s AND status != 'returned' 
+                      ORDER BY reservation_date DESC LIMIT 1''',
+                   (car_id, customer_id))
+    reservation = cursor.fetchone()
+
+    if reservation:
+        cursor.execute('''UPDATE car_reservation_status
+                          SET status = %s, return_date = %s 
+                          WHERE id = %s''',
+                       (new_status, return_date, reservation[0]))
+    else:
+        cursor.execute('''INSERT INTO car_reservation_status 
+                          (car_id, customer_id, status, reservation_date, return_date) 
+                          VALUES (%s, %s, %s, CURRENT_DATE, %s)''',
+                       (car_id, customer_id, new_status, return_date))
+    status_id = reservation[0] if reservation else cursor.lastrowid
+
+    # Rows found above are open; they close when marked returned
+    if reservation and new_status == "returned":
+        bump(cursor, "open_rentals", -1)
+    elif not reservation and new_status != "returned":
+        bump(cursor, "open_rentals")
+    record_change(cursor, "car_reservation_status", status_id, "update" if reservation else "insert")
+    ended = _end_booking(cursor, car_id, customer_id, new_status, return_date)
+    return reservation is not None, ended
+
+
+def _end_booking(cursor, car_id, customer_id, new_status, return_date):
+    """Free the car in ``reservations`` after a return or cancellation.
+
+    A return ends the customer's booking of the car that covers the return
+    moment (the return date, or now) at that moment.  A cancellation
+    empties the customer's next booking of the car not over by then,
+    setting its return time to its pick-up (the row stays, as history, and
+    an empty booking blocks nothing), and fails its pending payment; a
+    booking already under way ends then instead, like a return.
+    Returns ``(reservation_id, pick_up, returned_at)`` for the booking
+    changed (``returned_at`` is ``None`` if it was cancelled), else ``None``.
+    """
+    if new_status not in ENDING_STATUSES:
+        return None
+    returned_at = to_datetime(return_date) if return_date else datetime.now().replace(microsecond=0)
+    if new_status == "returned":
+        cursor.execute('''SELECT id, pick_up FROM reservations
+                          WHERE car_id = %s AND customer_id = %s AND pick_up <= %s AND return_time > %s
+                          ORDER BY pick_up DESC LIMIT 1''',
+                       (car_id, customer_id, date_text(returned_at), date_text(returned_at)))
+    else:
+        cursor.execute('''SELECT id, pick_up FROM reservations
+                          WHERE car_id = %s AND customer_id = %s AND return_time > %s
+                          ORDER BY pick_up LIMIT 1''',
+                       (car_id, customer_id, date_text(returned_at)))
+    booking = cursor.fetchone()
+    if booking is None:
+        return None
+    reservation_id, pick_up = booking
+    if to_datetime(pick_up) < returned_at:
+        cursor.execute('UPDATE reservations SET return_time = %s WHERE id = %s',
+                       (date_text(returned_at), reservation_id))
+        record_change(cursor, "reservations", reservation_id, "update")
+        return reservation_id, pick_up, returned_at
+    if new_status == "returned":
+        return None  # returned the moment it was picked up: nothing left to free
+    cursor.execute('UPDATE reservations SET return_time = pick_up WHERE id = %s', (reservation_id,))
+    cursor.execute("UPDATE payments SET status = 'failed' WHERE reservation_id = %s AND status = 'pending'",
+                   (reservation_id,))  # never to be charged
+    record_change(cursor, "reservations", reservation_id, "update")
+    return reservation_id, pick_up, None
+
+
+def _status_written(car_id, ended):
+    invalidate_car(car_id)
+    if ended is not None:
+        reservation_id, pick_up, returned_at = ended
+        if returned_at is None:
+            record_cancellation(reservation_id)
+        else:
+            record_return(reservation_id, car_id, pick_up, returned_at)  # free again from the return
+
+
+def apply_status_changes(changes, batch):
+    """Write a write-behind batch of status changes in one transaction; False if it was written before."""
+    return with_retries(_apply_status_changes, changes, batch)
+
+
+def _apply_status_changes(changes, batch):
+    with connection() as conn:
+        ensure_counters(conn)
+        ensure_journal(conn)
+        ensure_payments(conn)
+        ensure_status_batches(conn)
+        begin_write(conn)
+        cursor = conn.cursor()
+        if batch_applied(cursor, batch):  # a crash came between the commit and the spool's removal
+            conn.rollback()
+            return False
+        ended = [_write_status(cursor, change.car_id, change.customer_id, change.status, change.return_date)[1]
+                 for change in changes]
+        mark_applied(cursor, batch, len(changes))
+        conn.commit()
+    for change, booking in zip(changes, ended):
+        _status_written(change.car_id, booking)
+    return True
@@ -0,0 +1,167 @@
+"""Table definitions for both schemas the project uses, on both engines.
+
+* ``app``    - the ``cars``/``customers``/``reservations`` tables the GUI
+               works on (``car_rental.db`` and its MySQL twin);
+* ``rental`` - the ``Office``/``Customer``/``Car``/``Reservation``/``Payment``
+               schema of ``database.txt`` (the MySQL ``CarRentalSystem``).
+
+Indexes for the hot queries, and later changes to these tables, are
+versioned migrations in ``migrations.py``.
+"""
+
+APP_SCHEMA_SQLITE = """
+CREATE TABLE IF NOT EXISTS customers (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    name TEXT NOT NULL,
+    phone TEXT NOT NULL UNIQUE,
+    email TEXT NOT NULL UNIQUE,
+    country TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS cars (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    name TEXT NOT NULL,
+    model_year INTEGER NOT NULL,
+    color TEXT NOT NULL,
+    status TEXT NOT NULL DEFAULT 'active'
+);
+CREATE TABLE IF NOT EXISTS reservations (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    car_id INTEGER NOT NULL,
+    customer_id INTEGER NOT NULL,
+    duration INTEGER NOT NULL,
+    pick_up TEXT NOT NULL,
+    return_time TEXT NOT NULL,
+    payment REAL NOT NULL,
+    FOREIGN KEY (car_id) REFERENCES cars(id),
+    FOREIGN KEY (customer_id) REFERENCES customers(id)
+);
+CREATE TABLE IF NOT EXISTS car_reservation_status (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    car_id INTEGER NOT NULL,
+    customer_id INTEGER NOT NULL,
+    status TEXT NOT NULL,
+    reservation_date TEXT NOT NULL,
+    return_date TEXT
+);
+"""
+
+APP_SCHEMA_MYSQL = """
+CREATE TABLE IF NOT EXISTS customers (
+    id INT PRIMARY KEY AUTO_INCREMENT,
+    name VARCHAR(100) NOT NULL,
+    phone VARCHAR(20) NOT NULL UNIQUE,
+    email VARCHAR(64) NOT NULL UNIQUE,
+    country VARCHAR(60) NOT NULL
+);
+CREATE TABLE IF NOT EXISTS cars (
+    id INT PRIMARY KEY AUTO_INCREMENT,
+    name VARCHAR(50) NOT NULL,
+    model_year INT NOT NULL,
+    color VARCHAR(30) NOT NULL,
+    status VARCHAR(20) NOT NULL DEFAULT 'active'
+);
+CREATE TABLE IF NOT EXISTS reservations (
+    id INT PRIMARY KEY AUTO_INCREMENT,
+    car_id INT NOT NULL,
+    customer_id INT NOT NULL,
+    duration INT NOT NULL,
+    pick_up DATETIME NOT NULL,
+    return_time DATETIME NOT NULL,
+    payment DECIMAL(10,2) NOT NULL,
+    INDEX idx_reservations_car_dates (car_id, pick_up, return_time),
+    FOREIGN KEY (car_id) REFERENCES cars(id),
+    FOREIGN KEY (customer_id) REFERENCES customers(id)
+);
+CREATE TABLE IF NOT EXISTS car_reservation_status (
+    id INT PRIMARY KEY AUTO_INCREMENT,
+    car_id INT NOT NULL,
+    customer_id INT NOT NULL,
+    status VARCHAR(20) NOT NULL,
+    reservation_date DATE NOT NULL,
+    return_date DATE
+);
+"""
+
+# database.txt translated for SQLite (ENUMs become CHECK constraints).
+RENTAL_SCHEMA_SQLITE = """
+CREATE TABLE IF NOT EXISTS Office (
+    OfficeID INTEGER PRIMARY KEY AUTOINCREMENT,
+    OfficeName TEXT NOT NULL,
+    Address TEXT NOT NULL,
+    Phone TEXT NOT NULL,
+    Email TEXT UNIQUE NOT NULL
+);
+CREATE TABLE IF NOT EXISTS Customer (
+    CustomerID INTEGER PRIMARY KEY AUTOINCREMENT,
+    FirstName TEXT NOT NULL,
+    LastName TEXT NOT NULL,
+    Email TEXT UNIQUE NOT NULL,
+    Phone TEXT NOT NULL,
+    Address TEXT NOT NULL,
+    DateOfBirth DATE NOT NULL,
+    LicenseNumber TEXT UNIQUE NOT NULL,
+    LicenseExpirationDate DATE NOT NULL,
+    RegistrationDate TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+CREATE TABLE IF NOT EXISTS Car (
+    CarID INTEGER PRIMARY KEY AUTOINCREMENT,
+    Model TEXT NOT NULL,
+    Year INTEGER NOT NULL,
+    PlateID TEXT UNIQUE NOT NULL,
+    Status TEXT NOT NULL DEFAULT 'active' CHECK (Status IN ('active', 'out_of_service', 'rented')),
+    Color TEXT NOT NULL,
+    DailyRentalRate DECIMAL(10,2) NOT NULL,
+    OfficeID INTEGER NOT NULL REFERENCES Office(OfficeID)
+);
+CREATE TABLE IF NOT EXISTS Reservation (
+    ReservationID INTEGER PRIMARY KEY AUTOINCREMENT,
+    CustomerID INTEGER NOT NULL REFERENCES Customer(CustomerID),
+    CarID INTEGER NOT NULL REFERENCES Car(CarID),
+    StartDate DATETIME NOT NULL,
+    EndDate DATETIME NOT NULL,
+    PickupOfficeID INTEGER NOT NULL REFERENCES Office(OfficeID),
+    ReturnOfficeID INTEGER NOT NULL REFERENCES Office(OfficeID),
+    Status TEXT NOT NULL DEFAULT 'confirmed' CHECK (Status IN ('confirmed', 'completed', 'cancelled')),
+    TotalCost DECIMAL(10,2) NOT NULL,
+    ReservationDate TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+CREATE TABLE IF NOT EXISTS Payment (
+    PaymentID INTEGER PRIMARY KEY AUTOINCREMENT,
+    ReservationID INTEGER UNIQUE NOT NULL REFERENCES Reservation(ReservationID),
+    Amount DECIMAL(10,2) NOT NULL,
+    PaymentDate TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    PaymentMethod TEXT NOT NULL CHECK (PaymentMethod IN ('credit_card', 'debit_card', 'cash', 'bank_transfer')),
+    Status TEXT NOT NULL DEFAULT 'pending' CHECK (Status IN ('completed', 'pending', 'failed'))
+);
+CREATE INDEX IF NOT EXISTS idx_car_status ON Car(Status);
+CREATE INDEX IF NOT EXISTS idx_reservation_status ON Reservation(Status);
+CREATE INDEX IF NOT EXISTS idx_customer_email ON Customer(Email);
+CREATE INDEX IF NOT EXISTS idx_payment_status ON Payment(Status);
+"""
+
+
+def create_schema(conn, schema, engine):
+    """Create the tables of ``schema`` if they do not exist yet."""
+    if schema == "rental" and engine == "mysql":
+        raise ValueError("Create the rental schema on MySQL by running database.txt first.")
+    script = {("app", "sqlite"): APP_SCHEMA_SQLITE, ("app", "mysql"): APP_SCHEMA_MYSQL,
+              ("rental", "sqlite"): RENTAL_SCHEMA_SQLITE}[schema, engine]
+    cursor = conn.cursor()
+    for statement in script.split(";"):
+        if statement.strip():
+            cursor.execute(statement)
+    conn.commit()
+
+
+def ensure_app_schema(conn):
+    """Bring an embedded (SQLite) database up to the app schema.
+
+    Creates missing tables and adds ``cars.status``, which files made by
+    the first version of the GUI lack.
+    """
+    create_schema(conn, "app", "sqlite")
+    cursor = conn.cursor()
+    cursor.execute("PRAGMA table_info(cars)")
+    if "status" not in {row[1] for row in cursor.fetchall()}:
+        cursor.execute("ALTER TABLE cars ADD COLUMN status TEXT NOT NULL DEFAULT 'active'")
+        conn.commit()
@@ -0,0 +1,124 @@
+"""Quick start for the kiosk screens: cached welcome image and early connect.
+
+The welcome page used to decode a full-size JPEG and scale it with Pillow
+on every launch, after importing Pillow and the MySQL driver up front.
+Now the part of the scaled image the window actually shows is cached on
+disk as a PNG, which Tk loads by itself, so Pillow is only imported when
+the cache is cold.  The first database connection is opened on the
+background worker while the welcome page is on screen.
+
+The cache lives in ``CAR_RENTAL_CACHE_DIR`` (default ``~/.cache/car_rental``)
+and is keyed by the source file, its modification time and both sizes, so
+replacing the picture or changing the layout simply misses the cache.
+"""
+import hashlib
+import logging
+import os
+from tkinter import Label, PhotoImage, TclError
+
+from db import warm_up
+
+log = logging.getLogger("car_rental.startup")
+
+CACHE_DIR = os.environ.get("CAR_RENTAL_CACHE_DIR",
+                           os.path.join(os.path.expanduser("~"), ".cache", "car_rental"))
+
+
+def find_image(*candidates):
+    """Return the first of ``candidates`` that exists, or ``None``."""
+    for path in candidates:
+        if path and os.path.isfile(path):
+            return path
+    return None
+
+
+def cache_path(source, scale_to, view, cache_dir=None):
+    """Where the prepared copy of ``source`` is (or would be) cached."""
+    stat = os.stat(source)
+    key = f"{os.path.abspath(source)}|{stat.st_mtime_ns}|{stat.st_size}|{scale_to}|{view}"
+    digest = hashlib.sha1(key.encode()).hexdigest()[:16]
+    stem = os.path.splitext(os.path.basename(source))[0]
+    return os.path.join(cache_dir or CACHE_DIR, f"{stem}-{view[0]}x{view[1]}-{digest}.png")
+
+
+def cached_image(source, scale_to, view, cache_dir=None):
+    """Return the cached PNG for ``source`` if it is ready, else ``None``."""
+    path = cache_path(source, scale_to, view, cache_dir)
+    return path if os.path.isfile(path) else None
+
+
+def prepare_image(source, scale_to, view, cache_dir=None):
+    """Scale ``source`` to ``scale_to``, keep the centred ``view`` and cache it as PNG.
+
+    The screens scale their picture beyond the window and show its centre,
+    so only that part is stored: the welcome page looks the same, and the
+    file Tk reads at start-up is a fraction of the original.  Returns the
+    cached file's path; safe to call from a worker thread.
+    """
+    path = cache_path(source, scale_to, view, cache_dir)
+    if os.path.isfile(path):
+        return path
+    from PIL import Image  # only needed when the cache is cold
+
+    width, height = scale_to
+    left, top = max(0, (width - view[0]) // 2), max(0, (height - view[1]) // 2)
+    with Image.open(source) as image:
+        scaled = image.convert("RGB").resize(scale_to)
+    visible = scaled.crop((left, top, left + min(view[0], width), top + min(view[1], height)))
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    visible.save(tmp_path, "PNG")
+    os.replace(tmp_path, path)  # another launcher never reads a half-written file
+    return path
+
+
+def set_background(root, source, scale_to, view, worker=None):
+    """Fill ``root`` with the prepared image, building the cache off the Tk thread if needed.
+
+    Returns the background label (its image arrives later on a cold cache),
+    or ``None`` when ``source`` is missing.
+    """
+    if source is None:
+        return None
+    label = Label(root, bg=root.cget("bg"))
+    label.place(relwidth=1, relheight=1)
+    label.lower()  # stay behind the welcome text and button
+
+    def show(path):
+        try:
+            label.image = PhotoImage(master=label, file=path)  # keep a reference against garbage collection
+            label.configure(image=label.image)
+        except TclError:
+            pass  # the window closed while the image was being prepared
+
+    path = cached_image(source, scale_to, view)
+    if path is not None:
+        show(path)
+    elif worker is not None:
+        worker.submit(prepare_image, source, scale_to, view, on_success=show,
+                      on_error=lambda e: log.warning("Could not prepare %s: %s", source, e))
+    else:
+        show(prepare_image(source, scale_to, view))
+    return label
+
+
+def connect_early(worker):
+    """Open the first pooled connection on ``worker`` while the user reads the welcome page.
+
+    The filter of registered customers, the customer lookup index and the
+    fleet search catalog are loaded alongside, ready for the registration
+    form and the dashboard's search boxes.  With write-behind on, status
+    changes a crash left in the spool are written out.  Failures are only
+    logged: the first real query reports them properly.
+    """
+    from catalog import get_catalog
+    from customer_index import get_customer_index
+    from rentals import apply_status_changes, customer_filter
+    from writebehind import get_status_buffer
+
+    worker.submit(customer_filter, on_error=lambda e: log.warning("Loading the customer filter failed: %s", e))
+    worker.submit(get_catalog, on_error=lambda e: log.warning("Loading the fleet catalog failed: %s", e))
+    worker.submit(get_customer_index, on_error=lambda e: log.warning("Loading the customer index failed: %s", e))
+    worker.submit(get_status_buffer, apply_status_changes,
+                  on_error=lambda e: log.warning("Opening the status spool failed: %s", e))
+    return worker.submit(warm_up, on_error=lambda e: log.warning("Early database connect failed: %s", e))
@@ -0,0 +1,184 @@
+"""Background execution of database work for the Tkinter screens.
+
+Tk widgets may only be touched from the thread running ``mainloop``, so
+queries run on a small thread pool and their results are handed back
+through a queue that the Tk loop drains with ``after()``.  Requests can be
+tagged with a channel: submitting a new request on the same channel makes
+the previous one stale, so an impatient double click only ever shows the
+latest answer.
+"""
+import queue
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from tkinter import TclError
+from tkinter.messagebox import showerror
+
+DEFAULT_WORKERS = 4
+POLL_MS = 20  # how often the Tk loop checks for finished work
+
+
+def show_error(exc):
+    """Default error callback: a message box, titled by the error when it has one."""
+    title = getattr(exc, "title", "Database Error")
+    message = str(exc) if hasattr(exc, "title") else f"An error occurred: {exc}"
+    showerror(title, message)
+
+
+class Ticket:
+    """Handle for one submitted request; ``cancel()`` discards its result."""
+
+    __slots__ = ("channel", "submitted_at", "future", "cancelled")
+
+    def __init__(self, channel):
+        self.channel = channel
+        self.submitted_at = time.monotonic()
+        self.future = None
+        self.cancelled = False
+
+    def cancel(self):
+        self.cancelled = True
+        if self.future is not None:
+            self.future.cancel()  # only succeeds if it has not started yet
+
+
+class DBWorker:
+    """Thread pool whose results are delivered on the Tk main loop."""
+
+    def __init__(self, max_workers=DEFAULT_WORKERS, poll_ms=POLL_MS):
+        self.poll_ms = poll_ms
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="db-worker")
+        self._results = queue.Queue()
+        self._channels = {}   # channel -> latest Ticket
+        self._widget = None
+        self._generation = 0  # bumps on attach so only one poll loop runs
+        self._lock = threading.Lock()
+        self._stats = {
+            "submitted": 0,
+            "started": 0,
+            "completed": 0,
+            "failed": 0,
+            "cancelled": 0,       # dropped before running or before delivery
+            "skipped": 0,         # cancelled before they ever started
+            "wait_time": 0.0,     # submit -> start, summed
+            "run_time": 0.0,      # start -> finish, summed
+            "max_wait": 0.0,
+            "max_run": 0.0,
+            "last_latency": 0.0,  # submit -> delivered on the UI thread
+        }
+
+    def attach(self, widget):
+        """Deliver results through ``widget``'s event loop (call once per window)."""
+        with self._lock:
+            self._widget = widget
+            self._generation += 1
+            generation = self._generation
+        widget.after(self.poll_ms, self._poll, generation)
+
+    def submit(self, func, *args, on_success=None, on_error=show_error, channel=None, **kwargs):
+        """Run ``func(*args, **kwargs)`` in the background.
+
+        ``on_success(result)`` or ``on_error(exception)`` is later called on the
+        Tk thread.  A newer request on the same ``channel`` cancels this one.
+        """
+        ticket = Ticket(channel)
+        with self._lock:
+            if channel is not None:
+                previous = self._channels.get(channel)
+                if previous is not None:
+                    previous.cancel()
+                self._channels[channel] = ticket
+            self._stats["submitted"] += 1
+        ticket.future = self._executor.submit(self._run, ticket, func, args, kwargs, on_success, on_error)
+        ticket.future.add_done_callback(self._on_done)
+        if ticket.cancelled:  # cancelled by a newer request before the future existed
+            ticket.future.cancel()
+        return ticket
+
+    def cancel(self, channel):
+        """Cancel whatever is outstanding on ``channel``."""
+        with self._lock:
+            ticket = self._channels.pop(channel, None)
+        if ticket is not None:
+            ticket.cancel()
+
+    def stats(self):
+        """Return queue depth, in-flight count and latency figures (seconds)."""
+        with self._lock:
+            snapshot = dict(self._stats)
+        started = snapshot["started"]
+        finished = snapshot["completed"] + snapshot["failed"]
+        snapshot["queue_depth"] = snapshot["submitted"] - started - snapshot["skipped"]
+        snapshot["in_flight"] = started - finished
+        snapshot["avg_wait"] = snapshot["wait_time"] / started if started else 0.0
+        snapshot["avg_run"] = snapshot["run_time"] / finished if finished else 0.0
+        return snapshot
+
+    def shutdown(self, wait=False):
+        self._executor.shutdown(wait=wait, cancel_futures=True)
+
+    def _on_done(self, future):
+        if future.cancelled():
+            with self._lock:
+                self._stats["skipped"] += 1
+                self._stats["cancelled"] += 1
+
+    def _run(self, ticket, func, args, kwargs, on_success, on_error):
+        started_at = time.monotonic()
+        wait = started_at - ticket.submitted_at
+        with self._lock:
+            if ticket.cancelled:
+                self._stats["skipped"] += 1
+                self._stats["cancelled"] += 1
+                return
+            self._stats["started"] += 1
+            self._stats["wait_time"] += wait
+            self._stats["max_wait"] = max(self._stats["max_wait"], wait)
+        try:
+            result = func(*args, **kwargs)
+            outcome = (on_success, result, "completed")
+        except Exception as exc:
+            outcome = (on_error, exc, "failed")
+        run = time.monotonic() - started_at
+        with self._lock:
+            self._stats[outcome[2]] += 1
+            self._stats["run_time"] += run
+            self._stats["max_run"] = max(self._stats["max_run"], run)
+        self._results.put((ticket, outcome[0], outcome[1]))
+
+    def _poll(self, generation):
+        # Reschedule first so a failing callback cannot stop result delivery.
+        with self._lock:
+            widget = self._widget if generation == self._generation else None
+        if widget is not None:
+            try:
+                widget.after(self.poll_ms, self._poll, generation)
+            except TclError:
+                pass  # window destroyed; the next screen re-attaches
+        while True:
+            try:
+                ticket, callback, value = self._results.get_nowait()
+            except queue.Empty:
+                break
+            with self._lock:
+                if self._channels.get(ticket.channel) is ticket:
+                    del self._channels[ticket.channel]
+                if ticket.cancelled:
+                    self._stats["cancelled"] += 1
+                    continue
+                self._stats["last_latency"] = time.monotonic() - ticket.submitted_at
+            if callback is not None:
+                callback(value)
+
+
+_worker = None
+_worker_lock = threading.Lock()
+
+
+def get_worker():
+    """Return the shared background worker."""
+    global _worker
+    with _worker_lock:
+        if _worker is None:
+            _worker = DBWorker()
+        return _worker
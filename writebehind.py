@@ -0,0 +1,342 @@
+"""Write-behind buffer for reservation status changes.
+
+With write-behind on (``CAR_RENTAL_STATUS_SPOOL`` names a spool file),
+``rentals.set_reservation_status`` no longer runs a transaction per change.
+A change is appended to the spool, fsynced, and kept in memory, where
+repeated changes to the same car and customer coalesce into one.  A
+background thread writes everything buffered in one transaction every
+``FLUSH_INTERVAL`` seconds, or as soon as ``FLUSH_SIZE`` changes are waiting.
+
+A return or cancellation is never merged, with the change before it or
+the one after: besides closing the open status row it ends a booking in
+``reservations``, which must happen once and in order.  Any other run of
+changes to a pair ends as the last of them.
+
+Crash safety comes from the spool.  Every spool file starts with a batch
+id.  To flush, the file is renamed aside and a fresh one started.  The
+batch is written together with its id in ``status_batches``, and the file
+is deleted only after that commit.  On start-up, a file left aside is
+written again unless its id is already recorded, and the live spool is
+loaded back into the buffer.
+
+    CAR_RENTAL_STATUS_SPOOL=status.spool python "Untitled-1.py"
+    python writebehind.py status.spool      # write out a spool left by a crash
+"""
+import argparse
+import atexit
+import json
+import logging
+import os
+import threading
+import time
+import uuid
+from collections import namedtuple
+from datetime import datetime, timedelta
+
+import db
+from metrics import Histogram, get_metrics
+
+FLUSH_SIZE = 500        # buffered changes that trigger a flush straight away
+FLUSH_INTERVAL = 1.0    # seconds between flushes otherwise
+BATCH_KEEP_DAYS = 7     # flushed batch ids remembered this long, to skip replays
+SPOOL_ENV = "CAR_RENTAL_STATUS_SPOOL"
+ENDING_STATUSES = ("returned", "cancelled")  # statuses that end a booking in ``reservations``
+
+CREATE_TABLE = {
+    "sqlite": """
+        CREATE TABLE IF NOT EXISTS status_batches (
+            batch TEXT PRIMARY KEY,
+            changes INTEGER NOT NULL,
+            flushed_at TEXT NOT NULL
+        )
+    """,
+    "mysql": """
+        CREATE TABLE IF NOT EXISTS status_batches (
+            batch CHAR(32) PRIMARY KEY,
+            changes INT NOT NULL,
+            flushed_at DATETIME NOT NULL
+        )
+    """,
+}
+
+log = logging.getLogger("car_rental.writebehind")
+
+Change = namedtuple("Change", "car_id customer_id status return_date first_at updates")
+Change.__doc__ = """A buffered status change: ``updates`` submissions coalesced, the first at ``first_at``."""
+
+_ready = False
+_ready_lock = threading.Lock()
+
+
+def ensure_status_batches(conn):
+    """Create the table of flushed batch ids once per process, and forget old ids.
+
+    Run this before a write transaction starts: the DDL commits implicitly
+    on MySQL.
+    """
+    global _ready
+    if _ready:
+        return
+    with _ready_lock:
+        if _ready:
+            return
+        from migrations import engine_of
+
+        cursor = conn.cursor()
+        cursor.execute(CREATE_TABLE[engine_of(conn)])
+        cutoff = datetime.now() - timedelta(days=BATCH_KEEP_DAYS)
+        cursor.execute("DELETE FROM status_batches WHERE flushed_at < %s", (cutoff.isoformat(sep=" "),))
+        conn.commit()
+        _ready = True
+
+
+@db.on_configure
+def _forget_ready():
+    """Another database may not have the table yet."""
+    global _ready
+    _ready = False
+
+
+def batch_applied(cursor, batch):
+    cursor.execute("SELECT 1 FROM status_batches WHERE batch = %s", (batch,))
+    return bool(cursor.fetchall())
+
+
+def mark_applied(cursor, batch, changes):
+    cursor.execute("INSERT INTO status_batches (batch, changes, flushed_at) VALUES (%s, %s, %s)",
+                   (batch, changes, datetime.now().isoformat(sep=" ", timespec="seconds")))
+
+
+def read_spool(path):
+    """``(batch id, [change records])`` of a spool file; a torn last line is dropped."""
+    batch, records = None, []
+    with open(path, encoding="utf-8") as spool:
+        for line in spool:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                break  # written by a submit that never returned
+            if batch is None:
+                batch = record["batch"]
+            else:
+                records.append(record)
+    return batch, records
+
+
+def coalesce(pending, car_id, customer_id, status, return_date, at):
+    """Fold a change into ``pending``; True if it starts a new change rather than merging."""
+    chain = pending.setdefault((car_id, customer_id), [])
+    if chain and chain[-1][0] not in ENDING_STATUSES and status not in ENDING_STATUSES:
+        last = chain[-1]
+        last[0], last[1] = status, return_date
+        last[3] += 1
+        return False
+    chain.append([status, return_date, at, 1])
+    return True
+
+
+def pending_changes(pending):
+    """The changes in ``pending``, by car so batches lock cars in one order; per pair in submit order."""
+    changes = [Change(car_id, customer_id, status, return_date, first_at, updates)
+               for (car_id, customer_id), chain in pending.items()
+               for status, return_date, first_at, updates in chain]
+    changes.sort(key=lambda change: change.car_id)
+    return changes
+
+
+def spooled_changes(records):
+    pending = {}
+    for record in records:
+        coalesce(pending, record["car_id"], record["customer_id"], record["status"], record["return_date"],
+                 record["at"])
+    return pending
+
+
+class StatusBuffer:
+    """Spooled, coalescing buffer flushed by a background thread.
+
+    ``writer(changes, batch)`` writes a batch in one transaction, recording
+    ``batch`` with ``mark_applied`` and skipping a batch already recorded.
+    """
+
+    def __init__(self, spool_path, writer, flush_size=FLUSH_SIZE, flush_interval=FLUSH_INTERVAL, sync=True):
+        self.spool_path = spool_path
+        self.flushing_path = spool_path + ".flushing"
+        self.writer = writer
+        self.flush_size = flush_size
+        self.flush_interval = flush_interval
+        self.sync = sync
+        self._pending = {}     # (car_id, customer_id) -> [[status, return_date, first_at, updates], ...]
+        self._buffered = 0     # changes in _pending, after coalescing
+        self._retry = None     # (batch, changes) renamed aside but not yet written
+        self._appended = 0     # changes written to the spool ...
+        self._synced = 0       # ... and how many of them are known to be on disk
+        self._lock = threading.Lock()
+        self._sync_lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self.stats = {"submitted": 0, "coalesced": 0, "flushes": 0, "flushed": 0, "failed_flushes": 0,
+                      "replayed": 0, "largest_flush": 0}
+        self.lag = Histogram()  # first submit of a change to the commit that wrote it
+
+        if os.path.exists(self.flushing_path):
+            batch, records = read_spool(self.flushing_path)
+            self._retry = (batch, pending_changes(spooled_changes(records)))
+            self.stats["replayed"] += len(records)
+        records = read_spool(spool_path)[1] if os.path.exists(spool_path) else []
+        self._pending = spooled_changes(records)
+        self._buffered = sum(len(chain) for chain in self._pending.values())
+        self.stats["replayed"] += len(records)
+        self._start_spool(records)  # rewritten whole: a torn last line must not precede new ones
+        self._thread = threading.Thread(target=self._run, name="status-write-behind", daemon=True)
+        self._thread.start()
+
+    def _start_spool(self, records=()):
+        """Start a spool file with a new batch id, holding ``records`` already."""
+        self._batch = uuid.uuid4().hex
+        partial = self.spool_path + ".new"
+        with open(partial, "w", encoding="utf-8") as spool:
+            for record in ({"batch": self._batch}, *records):
+                spool.write(json.dumps(record) + "\n")
+            spool.flush()
+            if self.sync:
+                os.fsync(spool.fileno())
+        os.replace(partial, self.spool_path)
+        self._spool = open(self.spool_path, "a", encoding="utf-8")
+
+    def _sync_spool(self, appended):
+        """fsync the spool up to append number ``appended``; one fsync covers every append before it."""
+        with self._sync_lock:
+            if self._synced >= appended:
+                return
+            appended = self._appended
+            os.fsync(self._spool.fileno())
+            self._synced = appended
+
+    def submit(self, car_id, customer_id, status, return_date=None):
+        """Record a status change durably and buffer it; it reaches the database on the next flush."""
+        at = time.time()
+        with self._lock:
+            self._spool.write(json.dumps({"car_id": car_id, "customer_id": customer_id, "status": status,
+                                          "return_date": return_date, "at": at}) + "\n")
+            self._spool.flush()
+            self._appended += 1
+            appended = self._appended
+            self.stats["submitted"] += 1
+            if coalesce(self._pending, car_id, customer_id, status, return_date, at):
+                self._buffered += 1
+            else:
+                self.stats["coalesced"] += 1
+            if self._buffered >= self.flush_size:
+                self._wake.set()
+        if self.sync:
+            self._sync_spool(appended)  # outside the lock: submits that arrive meanwhile share the fsync
+
+    def pending(self):
+        with self._lock:
+            return self._buffered + (len(self._retry[1]) if self._retry else 0)
+
+    def flush(self):
+        """Write any batch left from a failed flush, then what is buffered; return the changes written."""
+        with self._flush_lock:
+            written = self._write_retry() if self._retry is not None else 0
+            with self._lock:
+                if not self._pending:
+                    return written
+                changes = pending_changes(self._pending)
+                self._pending, self._buffered = {}, 0
+                with self._sync_lock:
+                    if self.sync:
+                        os.fsync(self._spool.fileno())
+                    self._synced = self._appended
+                    self._spool.close()
+                os.replace(self.spool_path, self.flushing_path)
+                self._retry = (self._batch, changes)
+                self._start_spool()
+            return written + self._write_retry()
+
+    def _write_retry(self):
+        """Write the batch set aside in the ``.flushing`` file, then delete the file."""
+        batch, changes = self._retry
+        started = time.perf_counter()
+        try:
+            self.writer(changes, batch)
+        except Exception:
+            self.stats["failed_flushes"] += 1
+            raise
+        get_metrics().observe_query("write-behind flush", time.perf_counter() - started, rows=len(changes))
+        os.remove(self.flushing_path)
+        self._retry = None
+        now = time.time()
+        for change in changes:
+            self.lag.observe(now - change.first_at)
+        self.stats["flushes"] += 1
+        self.stats["flushed"] += len(changes)
+        self.stats["largest_flush"] = max(self.stats["largest_flush"], len(changes))
+        return len(changes)
+
+    def _run(self):
+        while not self._stop.is_set():
+            self._wake.wait(self.flush_interval)
+            self._wake.clear()
+            if self._stop.is_set():
+                break  # close() writes the rest
+            try:
+                self.flush()
+            except Exception as e:
+                log.warning("Write-behind flush failed, kept for the next one: %s", e)
+
+    def close(self):
+        """Stop the flusher and write out what is left (kept in the spool if that fails)."""
+        self._stop.set()
+        self._wake.set()
+        self._thread.join()
+        try:
+            self.flush()
+        finally:
+            self._spool.close()
+
+    def snapshot(self):
+        """Counters, flush sizes and lag, as plain data."""
+        snapshot = dict(self.stats, pending=self.pending(), lag=self.lag.as_dict())
+        flushes = snapshot["flushes"]
+        snapshot["mean_flush"] = snapshot["flushed"] / flushes if flushes else 0.0
+        return snapshot
+
+
+_buffer = None
+_buffer_lock = threading.Lock()
+
+
+def get_status_buffer(writer):
+    """The shared buffer when ``CAR_RENTAL_STATUS_SPOOL`` is set, else ``None``."""
+    global _buffer
+    path = os.environ.get(SPOOL_ENV)
+    if not path:
+        return None
+    with _buffer_lock:
+        if _buffer is None:
+            _buffer = StatusBuffer(path, writer)
+            atexit.register(_buffer.close)
+        return _buffer
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Write out a status spool left behind by a crash.")
+    parser.add_argument("spool", help="spool file (its .flushing companion is written first)")
+    parser.add_argument("--target", choices=("sqlite", "mysql"), default="sqlite")
+    parser.add_argument("--db", default="car_rental.db", help="SQLite file (ignored for MySQL)")
+    args = parser.parse_args()
+
+    from rentals import apply_status_changes
+
+    db.use_backend(db.make_backend(args.target, args.db), size=1)
+    buffer = StatusBuffer(args.spool, apply_status_changes)
+    waiting = buffer.pending()
+    buffer.close()
+    print(f"{waiting} changes written ({buffer.stats['replayed']} spooled submissions)")
+
+
+if __name__ == "__main__":
+    main()